@@ -0,0 +1,158 @@
+"""
+Async I/O path for the feature pipeline.
+
+Uses pymongo's native async client so inference can run on the event loop
+instead of FastAPI's threadpool. The activity and quiz-result queries are
+independent and run concurrently; the pandas feature logic is reused as is
+from Prepare.
+"""
+import asyncio
+import contextvars
+
+import pandas as pd
+from pymongo import AsyncMongoClient
+
+from feature_window import FEATURE_WINDOW_MODULES, activity_query, quiz_result_query, window_start, windowed_pipeline
+from instrumentation import async_aggregate_documents, async_find_documents
+from prepare_data import (
+    MONGO_DB,
+    MONGO_MAX_POOL_SIZE,
+    MONGO_URI,
+    Prepare,
+    normalize_activity,
+    quiz_result_freshness_pipeline,
+)
+
+_client = None
+
+
+def get_async_db():
+    """Database handle on a lazily created AsyncMongoClient."""
+    global _client
+    if _client is None:
+        _client = AsyncMongoClient(MONGO_URI, maxPoolSize=MONGO_MAX_POOL_SIZE)
+    return _client[MONGO_DB]
+
+
+async def close_async_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
+
+
+class AsyncFetchData:
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.round_trips = 0
+
+    async def _find(self, collection: str, query: dict, projection: dict = None) -> list:
+        self.round_trips += 1
+        return await async_find_documents(get_async_db()[collection], query, projection)
+
+    async def _find_windowed(self, collection: str, query: dict, projection: dict,
+                             user_field: str, module_field: str, time_field: str) -> list:
+        if FEATURE_WINDOW_MODULES <= 0:
+            return await self._find(collection, query, projection)
+        self.round_trips += 1
+        pipeline = windowed_pipeline(query, projection, user_field, module_field, time_field)
+        return await async_aggregate_documents(get_async_db()[collection], pipeline, stage_name=f"fetch.{collection}")
+
+    async def fetch_activity_minimal(self) -> pd.DataFrame:
+        activity = await self._find_windowed(
+            "activities",
+            activity_query(self.user_id),
+            {"user": 1, "module": 1, "type": 1, "occurredAt": 1},
+            "user", "module", "occurredAt",
+        )
+        return normalize_activity(pd.DataFrame(activity))
+
+    async def fetch_quiz_results(self) -> pd.DataFrame:
+        quiz_result = await self._find_windowed(
+            "quizresults",
+            quiz_result_query(self.user_id),
+            {"userId": 1, "moduleId": 1, "score": 1, "passed": 1, "duration": 1},
+            "userId", "moduleId", "timestamp",
+        )
+        return pd.DataFrame(quiz_result)
+
+    async def fetch_quizzes(self, module_ids) -> pd.DataFrame:
+        if not module_ids:
+            return pd.DataFrame()
+        quiz = await self._find(
+            "quizzes",
+            {"moduleId": {"$in": module_ids}},
+            {"_id": 1, "moduleId": 1, "maximumDuration": 1},
+        )
+        return pd.DataFrame(quiz)
+
+    async def fetch_freshness_token(self) -> tuple:
+        """Async FetchData.fetch_freshness_token; both lookups run concurrently."""
+        self.round_trips += 2
+        database = get_async_db()
+        activity, quiz_results = await asyncio.gather(
+            async_find_documents(
+                database.activities, {"user": self.user_id}, {"occurredAt": 1},
+                sort=[("occurredAt", -1)], limit=1, stage_name="fetch.freshness",
+            ),
+            async_aggregate_documents(
+                database.quizresults, quiz_result_freshness_pipeline(self.user_id), stage_name="fetch.freshness",
+            ),
+        )
+        activity = activity[0] if activity else None
+        quiz_results = quiz_results[0] if quiz_results else {}
+        return (
+            activity.get("occurredAt") if activity else None,
+            quiz_results.get("count", 0),
+            quiz_results.get("createdAt"),
+            window_start(),
+        )
+
+
+class PrefetchedData:
+    """FetchData stand-in that serves frames fetched ahead of time."""
+
+    def __init__(self, activity: pd.DataFrame, quiz_results: pd.DataFrame, quizzes: pd.DataFrame):
+        self.activity = activity
+        self.quiz_results = quiz_results
+        self.quizzes = quizzes
+        self.round_trips = 0
+
+    def fetch_activity_minimal(self) -> pd.DataFrame:
+        return self.activity
+
+    def fetch_quiz_results(self) -> pd.DataFrame:
+        return self.quiz_results
+
+    def fetch_quizzes(self, module_ids) -> pd.DataFrame:
+        return self.quizzes
+
+
+class AsyncPrepare:
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.fetch = AsyncFetchData(user_id)
+
+    @property
+    def round_trips(self) -> int:
+        return self.fetch.round_trips
+
+    async def prepare_features(self) -> pd.DataFrame:
+        """
+        Async Prepare.prepare_features: fetch concurrently, then compute in
+        pandas on the default executor so the CPU-bound part does not block
+        the event loop (the request's stage timings are kept via its context).
+        """
+        activity, quiz_results = await asyncio.gather(
+            self.fetch.fetch_activity_minimal(),
+            self.fetch.fetch_quiz_results(),
+        )
+        quizzes = pd.DataFrame()
+        if not quiz_results.empty and "moduleId" in quiz_results.columns:
+            module_ids = quiz_results["moduleId"].dropna().unique().tolist()
+            quizzes = await self.fetch.fetch_quizzes(module_ids)
+
+        prepare = Prepare(self.user_id)
+        prepare.fetch = PrefetchedData(activity, quiz_results, quizzes)
+        context = contextvars.copy_context()
+        return await asyncio.get_running_loop().run_in_executor(None, context.run, prepare.prepare_features)
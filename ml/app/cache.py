@@ -0,0 +1,57 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class InferenceCache:
+    """
+    Bounded LRU + TTL cache for inference results.
+    Entries are stored per user together with the freshness token they were
+    computed for; a lookup only hits when the token still matches, so a user
+    keeps at most one entry and stale results are dropped on sight.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, evictions=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        # optional Prometheus counter labelled by eviction reason
+        self.evictions = evictions
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _evict(self, key, reason: str) -> None:
+        del self._entries[key]
+        if self.evictions is not None:
+            self.evictions.labels(reason=reason).inc()
+
+    def get(self, key, token):
+        """Cached value for `key` computed at `token`, or None."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            entry_token, value, expires_at = entry
+            if expires_at <= now:
+                self._evict(key, "ttl")
+                return None
+            if entry_token != token:
+                self._evict(key, "stale")
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, token, value) -> None:
+        expires_at = time.monotonic() + self.ttl_seconds
+        with self._lock:
+            self._entries[key] = (token, value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._evict(next(iter(self._entries)), "lru")
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
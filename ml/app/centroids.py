@@ -0,0 +1,140 @@
+"""
+KMeans + StandardScaler folded into plain NumPy arrays.
+
+sklearn's per-call input validation costs more than the math for single-row
+requests, so the service precomputes the scaler mean/scale and the cluster
+centres once and assigns clusters with a direct distance-to-all-centroids
+computation. That also yields the distance to every cluster (soft assignment).
+
+The folded arrays can be exported to an uncompressed `.npz` next to the
+pickles; loading that needs neither joblib nor sklearn, which keeps service
+cold starts short. The export records a digest of the pickles it was folded
+from, so a stale export can be detected after the pickles are retrained.
+
+Run this module to check parity against the sklearn artifacts in ml/models,
+or to check and export them:
+
+    python centroids.py
+    python centroids.py export
+"""
+import argparse
+import hashlib
+from pathlib import Path
+
+import numpy as np
+
+MODELS_DIR = Path(__file__).resolve().parent.parent / "models"
+# KMeans model -> scaler it was trained with
+KMEANS_ARTIFACTS = {
+    "kmeans_model_37_3n.pkl": "kmeans_scaler.pkl",
+    "kmeans_model_37_3n_2.pkl": "kmeans_scaler_1.pkl",
+}
+
+
+def source_digest(*paths: Path) -> str:
+    """sha256 over the bytes of the sklearn artifacts a model is folded from."""
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(Path(path).read_bytes())
+    return digest.hexdigest()
+
+
+class CentroidModel:
+    def __init__(self, mean: np.ndarray, scale: np.ndarray, centers: np.ndarray, feature_names=None,
+                 source_digest: str = None):
+        self.mean = np.ascontiguousarray(mean, dtype=np.float64)
+        self.scale = np.ascontiguousarray(scale, dtype=np.float64)
+        self.centers = np.ascontiguousarray(centers, dtype=np.float64)
+        self.feature_names = list(feature_names) if feature_names is not None else None
+        # source_digest() of the model+scaler pickles, when known
+        self.source_digest = source_digest
+
+    @classmethod
+    def from_sklearn(cls, model, scaler) -> "CentroidModel":
+        n_features = model.cluster_centers_.shape[1]
+        mean = scaler.mean_ if getattr(scaler, "mean_", None) is not None else np.zeros(n_features)
+        scale = scaler.scale_ if getattr(scaler, "scale_", None) is not None else np.ones(n_features)
+        return cls(mean, scale, model.cluster_centers_, getattr(scaler, "feature_names_in_", None))
+
+    @classmethod
+    def load(cls, path: Path) -> "CentroidModel":
+        """Load arrays written by save()."""
+        with np.load(path, allow_pickle=False) as params:
+            feature_names = params["feature_names"].tolist() if "feature_names" in params else None
+            digest = str(params["source_digest"]) if "source_digest" in params else None
+            return cls(params["mean"], params["scale"], params["centers"], feature_names, digest)
+
+    def save(self, path: Path) -> None:
+        arrays = {"mean": self.mean, "scale": self.scale, "centers": self.centers}
+        if self.feature_names is not None:
+            arrays["feature_names"] = np.array(self.feature_names, dtype=str)
+        if self.source_digest is not None:
+            arrays["source_digest"] = np.array(self.source_digest)
+        np.savez(path, **arrays)
+
+    def transform(self, features: np.ndarray) -> np.ndarray:
+        """StandardScaler.transform."""
+        return (np.asarray(features, dtype=np.float64) - self.mean) / self.scale
+
+    def distances(self, scaled: np.ndarray) -> np.ndarray:
+        """Euclidean distance of every row to every centroid, shape (n, k)."""
+        diff = scaled[:, None, :] - self.centers[None, :, :]
+        return np.sqrt(np.einsum("nkd,nkd->nk", diff, diff))
+
+    def predict(self, features: np.ndarray):
+        """Returns (clusters, distances to all centroids) for raw feature rows."""
+        distances = self.distances(self.transform(features))
+        return distances.argmin(axis=1), distances
+
+
+def check_parity(centroids: CentroidModel, model, scaler, n_samples: int = 1000, seed: int = 0) -> float:
+    """
+    Compare against sklearn on random feature rows around the training data.
+    Raises ValueError on any cluster disagreement; returns the largest
+    distance difference.
+    """
+    rng = np.random.default_rng(seed)
+    n_features = centroids.centers.shape[1]
+    samples = centroids.mean + rng.normal(0, 2, size=(n_samples, n_features)) * centroids.scale
+    samples = np.vstack([samples, centroids.centers * centroids.scale + centroids.mean])
+
+    scaled = scaler.transform(samples)
+    expected_clusters = model.predict(scaled)
+    expected_distances = np.linalg.norm(scaled - model.cluster_centers_[expected_clusters], axis=1)
+
+    clusters, distances = centroids.predict(samples)
+    if not np.array_equal(clusters, expected_clusters):
+        mismatched = int((clusters != expected_clusters).sum())
+        raise ValueError(f"Centroid model disagrees with sklearn on {mismatched}/{len(samples)} rows")
+    return float(np.abs(distances[np.arange(len(samples)), clusters] - expected_distances).max())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check (and export) centroid models.")
+    parser.add_argument("command", nargs="?", choices=["check", "export"], default="check")
+    args = parser.parse_args()
+
+    # sklearn is only needed to unpickle the training artifacts
+    import joblib
+
+    for model_name, scaler_name in KMEANS_ARTIFACTS.items():
+        model = joblib.load(MODELS_DIR / model_name)
+        scaler = joblib.load(MODELS_DIR / scaler_name)
+        centroids = CentroidModel.from_sklearn(model, scaler)
+        centroids.source_digest = source_digest(MODELS_DIR / model_name, MODELS_DIR / scaler_name)
+        max_diff = check_parity(centroids, model, scaler)
+        print(f"[ok] {model_name} + {scaler_name}: clusters match, max distance diff {max_diff:.3e}")
+        if args.command == "export":
+            params_path = MODELS_DIR / f"{Path(model_name).stem}.npz"
+            centroids.save(params_path)
+            loaded = CentroidModel.load(params_path)
+            if not all(
+                np.array_equal(getattr(loaded, name), getattr(centroids, name))
+                for name in ("mean", "scale", "centers")
+            ) or loaded.source_digest != centroids.source_digest:
+                raise ValueError(f"{params_path.name} does not round-trip")
+            print(f"[ok] exported {params_path.name}")
+
+
+if __name__ == "__main__":
+    main()
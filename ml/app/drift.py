@@ -0,0 +1,379 @@
+"""
+Streaming drift monitor for the features and cluster assignments served.
+
+Every scored row updates constant-memory statistics for the active model
+version:
+
+- per features_final input: an exponentially weighted mean/variance (West's
+  weighted Welford update) and a histogram over the training deciles, which
+  doubles as a quantile sketch;
+- the share of rows assigned to each cluster;
+- the same mean/variance and decile histogram for the distance to the
+  assigned centroid.
+
+Old rows fade with a half-life of DRIFT_HALF_LIFE rows, so the statistics
+describe recent traffic. Decay is applied by growing the weight of new rows
+instead of shrinking every accumulator, which keeps an update to a handful of
+float operations and bisects in plain Python (a few microseconds).
+
+They are compared against the training-time baseline stored next to the
+model (<version>.baseline.json, or the version's "baseline" in the registry
+manifest) and published as Prometheus gauges every DRIFT_REFRESH_SECONDS:
+population stability index (PSI) per feature, for the cluster shares and for
+the distance, plus the standardized mean shift, current quantiles and cluster
+shares. Versions without a baseline are not monitored. Build one from the
+training data with:
+
+    python drift.py baseline --version kmeans_model_37_3n_2
+    python drift.py baseline --version kmeans_model_37_3n_2 --features features.parquet
+"""
+import argparse
+import json
+import logging
+import math
+import os
+import threading
+import time
+from bisect import bisect_right
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+from prometheus_client import Gauge
+
+DRIFT_ENABLED = os.getenv("DRIFT_ENABLED", "true").lower() == "true"
+DRIFT_HALF_LIFE = float(os.getenv("DRIFT_HALF_LIFE", "10000"))
+DRIFT_REFRESH_SECONDS = float(os.getenv("DRIFT_REFRESH_SECONDS", "15"))
+# weighted rows needed before scores are published
+DRIFT_MIN_OBSERVATIONS = float(os.getenv("DRIFT_MIN_OBSERVATIONS", "100"))
+
+TRAINING_DATA = Path(__file__).resolve().parent.parent / "dataset" / "final_datsest_v0-2.csv"
+QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+# decile edges: 10 bins per histogram
+EDGE_QUANTILES = tuple(q / 10 for q in range(1, 10))
+# floor for empty bins in the PSI
+PSI_EPSILON = 1e-4
+# rescale the accumulators once the row weight grows past this
+MAX_WEIGHT = 1e100
+
+FEATURE_PSI = Gauge(
+    "cluster_drift_feature_psi",
+    "Population stability index of a feature vs the training baseline",
+    ["version", "feature"],
+    multiprocess_mode="max",
+)
+FEATURE_MEAN_SHIFT = Gauge(
+    "cluster_drift_feature_mean_shift",
+    "Recent feature mean minus the baseline mean, in baseline standard deviations",
+    ["version", "feature"],
+    multiprocess_mode="liveall",
+)
+FEATURE_STD_RATIO = Gauge(
+    "cluster_drift_feature_std_ratio",
+    "Recent feature standard deviation over the baseline standard deviation",
+    ["version", "feature"],
+    multiprocess_mode="liveall",
+)
+FEATURE_QUANTILE = Gauge(
+    "cluster_drift_feature_quantile",
+    "Approximate recent feature quantile",
+    ["version", "feature", "quantile"],
+    multiprocess_mode="liveall",
+)
+CLUSTER_SHARE = Gauge(
+    "cluster_drift_cluster_share",
+    "Recent share of rows assigned to each cluster",
+    ["version", "cluster"],
+    multiprocess_mode="liveall",
+)
+CLUSTER_PSI = Gauge(
+    "cluster_drift_cluster_psi",
+    "Population stability index of the cluster shares vs the training baseline",
+    ["version"],
+    multiprocess_mode="max",
+)
+DISTANCE_PSI = Gauge(
+    "cluster_drift_distance_psi",
+    "Population stability index of the distance to the assigned centroid",
+    ["version"],
+    multiprocess_mode="max",
+)
+DISTANCE_QUANTILE = Gauge(
+    "cluster_drift_distance_quantile",
+    "Approximate recent quantile of the distance to the assigned centroid",
+    ["version", "quantile"],
+    multiprocess_mode="liveall",
+)
+DRIFT_OBSERVATIONS = Gauge(
+    "cluster_drift_effective_observations",
+    "Decay-weighted number of rows behind the drift statistics",
+    ["version"],
+    multiprocess_mode="liveall",
+)
+
+logger = logging.getLogger("uvicorn.error")
+
+
+def psi(shares, expected) -> float:
+    """Population stability index between two share vectors."""
+    total = 0.0
+    for p, q in zip(shares, expected):
+        p, q = max(p, PSI_EPSILON), max(q, PSI_EPSILON)
+        total += (p - q) * math.log(p / q)
+    return total
+
+
+def _distribution(values: np.ndarray) -> dict:
+    """Baseline summary of one variable: moments, decile edges and bin shares."""
+    values = np.asarray(values, dtype=np.float64)
+    values = values[np.isfinite(values)]
+    edges = np.unique(np.quantile(values, EDGE_QUANTILES))
+    bins = np.searchsorted(edges, values, side="right")
+    return {
+        "mean": float(values.mean()),
+        "std": float(values.std()),
+        "min": float(values.min()),
+        "max": float(values.max()),
+        "edges": edges.tolist(),
+        "shares": (np.bincount(bins, minlength=len(edges) + 1) / len(values)).tolist(),
+    }
+
+
+def build_baseline(version, features: np.ndarray) -> dict:
+    """Training-time baseline of `version` from its raw training feature rows."""
+    clusters, distances = version.centroids.predict(features)
+    chosen = distances[np.arange(len(features)), clusters]
+    return {
+        "version": version.name,
+        "rows": int(len(features)),
+        "features": {
+            name: _distribution(features[:, j]) for j, name in enumerate(version.feature_names)
+        },
+        "clusters": (np.bincount(clusters, minlength=version.n_clusters) / len(features)).tolist(),
+        "distance": _distribution(chosen),
+    }
+
+
+class _Stream:
+    """Decay-weighted mean/variance and a histogram over fixed baseline edges."""
+
+    __slots__ = ("edges", "bins", "total", "mean", "m2")
+
+    def __init__(self, edges: list):
+        self.edges = edges
+        self.bins = [0.0] * (len(edges) + 1)
+        self.total = 0.0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def add(self, x: float, weight: float) -> None:
+        self.total += weight
+        delta = x - self.mean
+        self.mean += delta * weight / self.total
+        self.m2 += weight * delta * (x - self.mean)
+        self.bins[bisect_right(self.edges, x)] += weight
+
+    def rescale(self, factor: float) -> None:
+        self.total *= factor
+        self.m2 *= factor
+        self.bins = [count * factor for count in self.bins]
+
+    @property
+    def variance(self) -> float:
+        return self.m2 / self.total if self.total else 0.0
+
+    def shares(self) -> list:
+        return [count / self.total for count in self.bins] if self.total else list(self.bins)
+
+    def quantile(self, q: float, low: float, high: float) -> float:
+        """Linear interpolation inside the histogram bin holding quantile q."""
+        edges = [low, *self.edges, high]
+        target = q * sum(self.bins)
+        seen = 0.0
+        for i, count in enumerate(self.bins):
+            if count and seen + count >= target:
+                lo, hi = edges[i], max(edges[i + 1], edges[i])
+                return lo + (hi - lo) * (target - seen) / count
+            seen += count
+        return high
+
+
+class DriftMonitor:
+    """Drift statistics for one model version against its baseline."""
+
+    def __init__(self, version_name: str, baseline: dict, feature_names: list,
+                 half_life: float = DRIFT_HALF_LIFE, refresh_seconds: float = DRIFT_REFRESH_SECONDS):
+        self.version_name = version_name
+        self.baseline = baseline
+        self.feature_names = list(feature_names)
+        self.refresh_seconds = refresh_seconds
+        self.growth = 2 ** (1 / half_life)
+        self.features = [_Stream(baseline["features"][name]["edges"]) for name in self.feature_names]
+        self.distance = _Stream(baseline["distance"]["edges"])
+        self.clusters = [0.0] * len(baseline["clusters"])
+        self.weight = 1.0
+        self._next_refresh = time.monotonic() + refresh_seconds
+        self._lock = threading.Lock()
+
+    def _rescale(self) -> None:
+        factor = 1 / self.weight
+        for stream in self.features:
+            stream.rescale(factor)
+        self.distance.rescale(factor)
+        self.clusters = [count * factor for count in self.clusters]
+        self.weight = 1.0
+
+    def observe(self, row, cluster: int, distance: float) -> None:
+        """Add one scored row: raw features (feature_names order), cluster, distance."""
+        with self._lock:
+            self.weight *= self.growth
+            if self.weight > MAX_WEIGHT:
+                self._rescale()
+            weight = self.weight
+            for stream, x in zip(self.features, row):
+                if x == x:  # skip NaN
+                    stream.add(x, weight)
+            self.distance.add(distance, weight)
+            self.clusters[cluster] += weight
+            refresh = time.monotonic() >= self._next_refresh
+            if refresh:
+                self._next_refresh = time.monotonic() + self.refresh_seconds
+        if refresh:
+            self.publish()
+
+    def observe_many(self, features: np.ndarray, clusters: np.ndarray, distances: np.ndarray) -> None:
+        """observe() for scored rows; `distances` is the (n, k) distance-to-centroid matrix."""
+        # plain Python floats: per-element NumPy access costs more than the math
+        for row, cluster, row_distances in zip(features.tolist(), clusters.tolist(), distances.tolist()):
+            self.observe(row, cluster, row_distances[cluster])
+
+    @property
+    def effective_observations(self) -> float:
+        """Decay-weighted row count, in units of the newest row."""
+        return self.distance.total / self.weight
+
+    def scores(self) -> dict:
+        with self._lock:
+            features = {}
+            for name, stream in zip(self.feature_names, self.features):
+                base = self.baseline["features"][name]
+                features[name] = {
+                    "psi": psi(stream.shares(), base["shares"]),
+                    "mean": stream.mean,
+                    "mean_shift": (stream.mean - base["mean"]) / base["std"] if base["std"] else 0.0,
+                    "std_ratio": math.sqrt(stream.variance) / base["std"] if base["std"] else 0.0,
+                    "quantiles": {q: stream.quantile(q, base["min"], base["max"]) for q in QUANTILES},
+                }
+            total_clusters = sum(self.clusters)
+            shares = [count / total_clusters for count in self.clusters] if total_clusters else self.clusters
+            base = self.baseline["distance"]
+            return {
+                "version": self.version_name,
+                "observations": self.effective_observations,
+                "features": features,
+                "cluster_shares": shares,
+                "cluster_psi": psi(shares, self.baseline["clusters"]),
+                "distance_psi": psi(self.distance.shares(), base["shares"]),
+                "distance_quantiles": {
+                    q: self.distance.quantile(q, base["min"], base["max"]) for q in QUANTILES
+                },
+            }
+
+    def publish(self) -> None:
+        """Set the Prometheus gauges from the current scores."""
+        if self.effective_observations < DRIFT_MIN_OBSERVATIONS:
+            return
+        scores = self.scores()
+        version = self.version_name
+        DRIFT_OBSERVATIONS.labels(version).set(scores["observations"])
+        for name, stats in scores["features"].items():
+            FEATURE_PSI.labels(version, name).set(stats["psi"])
+            FEATURE_MEAN_SHIFT.labels(version, name).set(stats["mean_shift"])
+            FEATURE_STD_RATIO.labels(version, name).set(stats["std_ratio"])
+            for q, value in stats["quantiles"].items():
+                FEATURE_QUANTILE.labels(version, name, str(q)).set(value)
+        for cluster, share in enumerate(scores["cluster_shares"]):
+            CLUSTER_SHARE.labels(version, str(cluster)).set(share)
+        CLUSTER_PSI.labels(version).set(scores["cluster_psi"])
+        DISTANCE_PSI.labels(version).set(scores["distance_psi"])
+        for q, value in scores["distance_quantiles"].items():
+            DISTANCE_QUANTILE.labels(version, str(q)).set(value)
+
+
+class DriftTracker:
+    """Routes scored rows to the monitor of the version that scored them."""
+
+    def __init__(self, enabled: bool = DRIFT_ENABLED):
+        self.enabled = enabled
+        self._monitor: Optional[DriftMonitor] = None
+        self._unmonitored = set()
+
+    def monitor(self, version) -> Optional[DriftMonitor]:
+        monitor = self._monitor
+        if monitor is not None and monitor.version_name == version.name:
+            return monitor
+        if version.baseline is None:
+            if version.name not in self._unmonitored:
+                self._unmonitored.add(version.name)
+                logger.warning("drift: no baseline for model %s, not monitored", version.name)
+            return None
+        # a new active version starts from empty statistics
+        monitor = DriftMonitor(version.name, version.baseline, version.feature_names)
+        self._monitor = monitor
+        return monitor
+
+    def observe_many(self, version, features: np.ndarray, clusters: np.ndarray, distances: np.ndarray) -> None:
+        """Record rows scored by `version`; `distances` is the (n, k) distance matrix."""
+        if not self.enabled:
+            return
+        monitor = self.monitor(version)
+        if monitor is not None:
+            monitor.observe_many(features, clusters, distances)
+
+
+def training_features(path: Path, feature_names: list) -> np.ndarray:
+    """
+    Raw training rows: a `snapshot.py features` parquet file, or the notebook's
+    training CSV with its derived columns (pass_rate, study duration in minutes).
+    """
+    import pandas as pd
+
+    path = Path(path)
+    if path.suffix == ".parquet":
+        df = pd.read_parquet(path)
+    else:
+        df = pd.read_csv(path, index_col=0)
+        df["pass_rate"] = df["is_passed"] / df["total_attemps"]
+        df["avg_study_duration"] = df["avg_study_duration"] / 60
+    return df[feature_names].to_numpy(dtype=np.float64)
+
+
+def main():
+    from registry import ModelRegistry
+
+    parser = argparse.ArgumentParser(description="Build drift baselines for model versions.")
+    parser.add_argument("command", choices=["baseline"])
+    parser.add_argument("--version", help="model version (default: the active one)")
+    parser.add_argument("--features", type=Path, default=TRAINING_DATA, help="training CSV or features parquet")
+    parser.add_argument("--force", action="store_true", help="write even if the data does not match the scaler")
+    args = parser.parse_args()
+
+    registry = ModelRegistry()
+    version = registry.load(args.version) if args.version else registry.active
+    features = training_features(args.features, version.feature_names)
+    mean = features.mean(axis=0)
+    if not np.allclose(mean, version.centroids.mean, rtol=1e-6) and not args.force:
+        # a baseline from other data would report drift from day one
+        raise SystemExit(
+            f"[error] {args.features} mean {mean} differs from the {version.name} scaler mean "
+            f"{version.centroids.mean}; pass the data it was trained on (or --force)"
+        )
+
+    baseline = build_baseline(version, features)
+    path = registry.models_dir / registry.versions[version.name].get("baseline", f"{version.name}.baseline.json")
+    path.write_text(json.dumps(baseline, indent=2))
+    print(f"[ok] wrote {path} from {baseline['rows']} rows")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""
+Pandas-free feature engine.
+
+Computes the same five features as Prepare.prepare_features straight from the
+pymongo result lists with dicts and NumPy, skipping the per-operation overhead
+of building, pivoting and merging small DataFrames. Means are taken with NumPy
+over values in the same order pandas would see them, so results match the
+pandas engine exactly.
+"""
+import numpy as np
+import pandas as pd
+
+from feature_store import MODULE_STATUS, to_datetime, to_number
+from instrumentation import stage
+from prepare_data import FEATURES_FINAL, BatchFetchData, FetchData
+
+QUIZ_PROJECTION = {"_id": 1, "moduleId": 1, "maximumDuration": 1}
+
+
+def _mean(values: list) -> float:
+    return float(np.mean(np.array(values, dtype=float))) if values else 0.0
+
+
+def activity_features(activities: list) -> dict:
+    """avg_study_duration (hours) and consistency_ratio from raw activity docs."""
+    weekday_counts = [0] * 7
+    modules = {}
+    for doc in activities:
+        status = MODULE_STATUS.get(doc.get("type"))
+        if status is None:
+            continue
+        ts = to_datetime(doc.get("occurredAt"))
+        if ts is None:
+            continue
+        weekday_counts[ts.weekday()] += 1
+        module = doc.get("module")
+        if module is None:
+            continue
+        entry = modules.setdefault(module, {})
+        if status not in entry or ts < entry[status]:
+            entry[status] = ts
+
+    # pivot_table orders modules by id; keep that order for the mean
+    seconds = []
+    for module in sorted(modules):
+        entry = modules[module]
+        if "started" in entry and "completed" in entry:
+            duration = (entry["completed"] - entry["started"]).total_seconds()
+            if duration > 0:
+                seconds.append(duration)
+
+    total = sum(weekday_counts)
+    return {
+        "avg_study_duration": _mean(seconds) / 60 / 60,
+        "consistency_ratio": max(weekday_counts) / total if total else 0.0,
+    }
+
+
+def quiz_features(quiz_results: list, quizzes_by_module: dict) -> dict:
+    """
+    avg_time_utilization, average_score and pass_rate from raw quiz results.
+    Rows are expanded like the left merge in Prepare.prepare_quiz. Raises
+    ValueError, like prepare_quiz, when the results reference modules but none
+    of them has a quiz.
+    """
+    has_module = any("moduleId" in doc for doc in quiz_results)
+    if has_module and not any(
+        doc.get("moduleId") in quizzes_by_module for doc in quiz_results
+    ):
+        raise ValueError("Quiz dataframe is empty")
+
+    utilization, scores, passed = [], [], []
+    for doc in quiz_results:
+        quizzes = quizzes_by_module.get(doc.get("moduleId"), [None]) if has_module else [None]
+        score = to_number(doc.get("score"))
+        result_passed = to_number(doc.get("passed"))
+        duration = to_number(doc.get("duration"))
+        for quiz in quizzes:
+            if score is not None:
+                scores.append(score)
+            if result_passed is not None:
+                passed.append(result_passed)
+            max_duration = to_number(quiz.get("maximumDuration")) if quiz else None
+            if duration is not None and max_duration:
+                utilization.append(max(0.0, duration / max_duration * 100))
+
+    return {
+        "avg_time_utilization": _mean(utilization),
+        "average_score": _mean(scores),
+        "pass_rate": _mean(passed),
+    }
+
+
+def group_quizzes(quizzes: list) -> dict:
+    quizzes_by_module = {}
+    for quiz in quizzes:
+        quizzes_by_module.setdefault(quiz.get("moduleId"), []).append(quiz)
+    return quizzes_by_module
+
+
+def _module_ids(quiz_results: list) -> list:
+    return list({
+        doc["moduleId"] for doc in quiz_results if doc.get("moduleId") is not None
+    })
+
+
+class FastPrepare:
+    """Single-user pandas-free engine with the Prepare interface."""
+
+    def __init__(self, user_id):
+        self.fetch = FetchData(user_id)
+        self.features_final = list(FEATURES_FINAL)
+
+    @property
+    def round_trips(self) -> int:
+        return self.fetch.round_trips
+
+    def prepare_features_dict(self) -> dict:
+        activities = self.fetch.activity_documents()
+        quiz_results = self.fetch.quiz_result_documents()
+        quizzes = []
+        module_ids = _module_ids(quiz_results)
+        if module_ids:
+            quizzes = self.fetch._find("quizzes", {"moduleId": {"$in": module_ids}}, QUIZ_PROJECTION)
+
+        with stage("prepare.fast_features"):
+            features = activity_features(activities)
+            features.update(quiz_features(quiz_results, group_quizzes(quizzes)))
+        return {col: features[col] for col in self.features_final}
+
+    def prepare_features(self) -> pd.DataFrame:
+        """Returns a single-row DataFrame with the features_final columns."""
+        return pd.DataFrame([self.prepare_features_dict()], columns=self.features_final)
+
+
+class FastBatchPrepare:
+    """Pandas-free counterpart of BatchPrepare."""
+
+    def __init__(self, user_ids):
+        # de-duplicate while keeping request order
+        self.user_ids = list(dict.fromkeys(user_ids))
+        self.fetch = BatchFetchData(self.user_ids)
+        self.features_final = list(FEATURES_FINAL)
+
+    @property
+    def round_trips(self) -> int:
+        return self.fetch.round_trips
+
+    def prepare_features(self):
+        """Same contract as BatchPrepare.prepare_features: returns (features, errors)."""
+        activities = {user_id: [] for user_id in self.user_ids}
+        quiz_results = {user_id: [] for user_id in self.user_ids}
+        for doc in self.fetch.activity_documents():
+            activities[doc["user"]].append(doc)
+        results = self.fetch.quiz_result_documents()
+        for doc in results:
+            quiz_results[doc["userId"]].append(doc)
+        quizzes = []
+        module_ids = _module_ids(results)
+        if module_ids:
+            quizzes = self.fetch._find("quizzes", {"moduleId": {"$in": module_ids}}, QUIZ_PROJECTION)
+        quizzes_by_module = group_quizzes(quizzes)
+
+        rows = {}
+        errors = {}
+        with stage("prepare.fast_features"):
+            for user_id in self.user_ids:
+                try:
+                    features = activity_features(activities[user_id])
+                    features.update(quiz_features(quiz_results[user_id], quizzes_by_module))
+                except ValueError as exc:
+                    errors[user_id] = str(exc)
+                    continue
+                rows[user_id] = features
+
+        features = pd.DataFrame.from_dict(rows, orient="index", columns=self.features_final)
+        features.index.name = "userId"
+        return features.astype(float), errors
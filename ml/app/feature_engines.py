@@ -0,0 +1,33 @@
+import importlib
+import os
+
+# name -> (module, single-user preparer, batch preparer)
+# pandas: fetch raw documents and aggregate in Python (reference implementation)
+# mongo: aggregate server-side and fetch one small document per user
+# fast: same computation as pandas on plain dicts/NumPy, without DataFrames
+# store: read incrementally maintained running aggregates (feature_store.py);
+#   covers the whole history, FEATURE_WINDOW_* (feature_window.py) do not apply
+# snapshot: pandas logic over Parquet snapshots in SNAPSHOT_DIR (snapshot_data.py)
+# Engine modules are imported on first use, so a process only pays the import
+# cost of the engines it actually serves.
+FEATURE_ENGINES = {
+    "pandas": ("prepare_data", "Prepare", "BatchPrepare"),
+    "mongo": ("prepare_aggregate", "AggregatePrepare", "AggregateBatchPrepare"),
+    "fast": ("fast_features", "FastPrepare", "FastBatchPrepare"),
+    "store": ("feature_store", "StorePrepare", "StoreBatchPrepare"),
+    "snapshot": ("snapshot_data", "SnapshotPrepare", "SnapshotBatchPrepare"),
+}
+
+FEATURE_ENGINE = os.getenv("FEATURE_ENGINE", "pandas")
+
+
+def get_engine(name: str = None):
+    """Return the (single, batch) preparer classes for a feature engine."""
+    name = name or FEATURE_ENGINE
+    if name not in FEATURE_ENGINES:
+        raise ValueError(
+            f"Unknown feature engine '{name}', expected one of {sorted(FEATURE_ENGINES)}"
+        )
+    module_name, single_name, batch_name = FEATURE_ENGINES[name]
+    module = importlib.import_module(module_name)
+    return getattr(module, single_name), getattr(module, batch_name)
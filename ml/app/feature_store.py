@@ -0,0 +1,390 @@
+"""
+Persistent per-user feature store.
+
+Each user has one document in FEATURE_STORE_COLLECTION holding running
+aggregates (sums, counts, per-weekday activity counts and per-module first
+start/complete times) plus a watermark per source collection. Syncing a user
+only reads documents past those watermarks, so inference reads one small
+document instead of the user's whole history.
+
+The watermark is the ingest time (`createdAt`, set by the backend's Mongoose
+timestamps when the document is written), not `_id`: ObjectIds are generated
+by clients, so concurrent backend processes (or loaders with hashed ids)
+insert them out of order. Because writers' clocks and commits can still
+interleave, each sync re-reads FEATURE_STORE_OVERLAP_SECONDS before the
+watermark and skips the documents it already applied, which the state keeps
+for that overlap. Documents without `createdAt` are only picked up by a
+user's first sync or a rebuild.
+
+Quizzes are joined when a quiz result is applied; if quiz metadata changes
+afterwards, rebuild the affected users:
+
+    python feature_store.py rebuild <user_id> [<user_id> ...]
+    python feature_store.py sync <user_id> [<user_id> ...]
+"""
+import argparse
+import os
+from datetime import datetime, timedelta
+
+import pandas as pd
+from pymongo import ReplaceOne
+from pymongo.errors import BulkWriteError
+
+import prepare_data
+from instrumentation import find_documents, stage
+from prepare_data import FEATURES_FINAL
+
+FEATURE_STORE_COLLECTION = os.getenv("FEATURE_STORE_COLLECTION", "mlfeatures")
+# when false, inference only reads the store and relies on `sync` being run elsewhere
+FEATURE_STORE_SYNC_ON_READ = os.getenv("FEATURE_STORE_SYNC_ON_READ", "true").lower() == "true"
+# how far behind the watermark each sync re-reads, to catch late or skewed writes
+FEATURE_STORE_OVERLAP_SECONDS = float(os.getenv("FEATURE_STORE_OVERLAP_SECONDS", "300"))
+
+MODULE_STATUS = {"module_start": "started", "module_complete": "completed"}
+# watermark of a synced user none of whose documents had `createdAt`
+EPOCH = datetime(1970, 1, 1)
+
+
+def empty_state(user_id) -> dict:
+    """Store document for a user with no applied history."""
+    return {
+        "_id": user_id,
+        "version": 0,
+        # newest applied createdAt, and [_id, createdAt] of documents applied
+        # within the overlap before it
+        "activity_watermark": None,
+        "activity_recent": [],
+        "quiz_result_watermark": None,
+        "quiz_result_recent": [],
+        "weekday_counts": [0] * 7,
+        "modules": {},
+        "duration_sum": 0.0,
+        "duration_count": 0,
+        "utilization_sum": 0.0,
+        "utilization_count": 0,
+        "score_sum": 0.0,
+        "score_count": 0,
+        "passed_sum": 0.0,
+        "passed_count": 0,
+        "has_module": False,
+        "matched_quiz": False,
+    }
+
+
+def to_datetime(value):
+    """Timestamp as a naive datetime, or None when it cannot be parsed."""
+    if isinstance(value, datetime):
+        return value
+    parsed = pd.to_datetime(value, errors="coerce")
+    return None if pd.isna(parsed) else parsed.to_pydatetime()
+
+
+def to_number(value):
+    """Numeric value as float, or None for missing/non-numeric values."""
+    if isinstance(value, bool):
+        return float(value)
+    if isinstance(value, (int, float)) and not pd.isna(value):
+        return float(value)
+    return None
+
+
+def _module_seconds(entry: dict):
+    """Positive started->completed duration of a module, else None."""
+    if entry.get("started") is None or entry.get("completed") is None:
+        return None
+    seconds = (entry["completed"] - entry["started"]).total_seconds()
+    return seconds if seconds > 0 else None
+
+
+def apply_activity(state: dict, doc: dict) -> None:
+    """Fold one module_start/module_complete activity into `state`."""
+    status = MODULE_STATUS.get(doc.get("type"))
+    if status is None:
+        return
+    ts = to_datetime(doc.get("occurredAt"))
+    if ts is None:
+        return
+    state["weekday_counts"][ts.weekday()] += 1
+
+    module = doc.get("module")
+    if module is None:
+        return
+    entry = state["modules"].setdefault(str(module), {"started": None, "completed": None})
+    if entry[status] is not None and entry[status] <= ts:
+        return
+
+    # only the earliest start/complete counts, so swap the module's contribution
+    previous = _module_seconds(entry)
+    entry[status] = ts
+    current = _module_seconds(entry)
+    if previous is not None:
+        state["duration_sum"] -= previous
+        state["duration_count"] -= 1
+    if current is not None:
+        state["duration_sum"] += current
+        state["duration_count"] += 1
+
+
+def apply_quiz_result(state: dict, doc: dict, quizzes_by_module: dict) -> None:
+    """
+    Fold one quiz result into `state`.
+    Like the pandas left merge in Prepare.prepare_quiz, a result counts once
+    per quiz of its module, or once with no utilization when there is none.
+    """
+    module = doc.get("moduleId")
+    quizzes = []
+    # like Prepare, a moduleId field counts even when it is null
+    if "moduleId" in doc:
+        state["has_module"] = True
+    if module is not None:
+        quizzes = quizzes_by_module.get(module, [])
+        if quizzes:
+            state["matched_quiz"] = True
+
+    score = to_number(doc.get("score"))
+    passed = to_number(doc.get("passed"))
+    duration = to_number(doc.get("duration"))
+    for quiz in quizzes or [None]:
+        if score is not None:
+            state["score_sum"] += score
+            state["score_count"] += 1
+        if passed is not None:
+            state["passed_sum"] += passed
+            state["passed_count"] += 1
+        max_duration = to_number(quiz.get("maximumDuration")) if quiz else None
+        if duration is not None and max_duration:
+            state["utilization_sum"] += max(0.0, duration / max_duration * 100)
+            state["utilization_count"] += 1
+
+
+def state_features(state: dict) -> dict:
+    """Turn running aggregates into the features_final values."""
+    def mean(total, count):
+        return float(total / count) if count else 0.0
+
+    weekday_total = sum(state["weekday_counts"])
+    return {
+        "avg_study_duration": mean(state["duration_sum"], state["duration_count"]) / 60 / 60,
+        "avg_time_utilization": mean(state["utilization_sum"], state["utilization_count"]),
+        "average_score": mean(state["score_sum"], state["score_count"]),
+        "consistency_ratio": (
+            max(state["weekday_counts"]) / weekday_total if weekday_total else 0.0
+        ),
+        "pass_rate": mean(state["passed_sum"], state["passed_count"]),
+    }
+
+
+class FeatureStore:
+    def __init__(self, collection_name: str = FEATURE_STORE_COLLECTION):
+        self.collection_name = collection_name
+        self.round_trips = 0
+
+    @property
+    def collection(self):
+        return prepare_data.get_db()[self.collection_name]
+
+    def _find(self, collection: str, query: dict, projection: dict = None, sort=None) -> list:
+        """Run a find and count it as one DB round trip."""
+        self.round_trips += 1
+        return find_documents(prepare_data.get_db()[collection], query, projection, sort=sort)
+
+    def load_many(self, user_ids) -> dict:
+        """Stored state per user; users without a document get an empty state."""
+        states = {user_id: empty_state(user_id) for user_id in user_ids}
+        for doc in self._find(self.collection_name, {"_id": {"$in": list(states)}}):
+            states[doc["_id"]] = doc
+        return states
+
+    @staticmethod
+    def _delta_query(states: dict, user_field: str, watermark_field: str) -> dict:
+        """`$or` of one clause per user selecting documents ingested since its watermark, minus the overlap."""
+        overlap = timedelta(seconds=FEATURE_STORE_OVERLAP_SECONDS)
+        clauses = []
+        for user_id, state in states.items():
+            clause = {user_field: user_id}
+            if state[watermark_field] is not None:
+                clause["createdAt"] = {"$gte": state[watermark_field] - overlap}
+            clauses.append(clause)
+        return {"$or": clauses}
+
+    @staticmethod
+    def _is_new(state: dict, doc: dict, prefix: str) -> bool:
+        """Whether `doc` was not applied yet; records it in the watermark if so."""
+        recent = state[f"{prefix}_recent"]
+        if any(doc["_id"] == applied_id for applied_id, _ in recent):
+            return False
+        created = to_datetime(doc.get("createdAt"))
+        if created is not None:
+            recent.append([doc["_id"], created])
+            watermark = state[f"{prefix}_watermark"]
+            if watermark is None or created > watermark:
+                state[f"{prefix}_watermark"] = created
+        return True
+
+    @staticmethod
+    def _prune(state: dict, prefix: str) -> None:
+        """Forget applied ids that fell out of the overlap window."""
+        watermark = state[f"{prefix}_watermark"]
+        if watermark is None:
+            # synced: later deltas must not re-read the documents without createdAt
+            state[f"{prefix}_watermark"] = EPOCH
+            return
+        cutoff = watermark - timedelta(seconds=FEATURE_STORE_OVERLAP_SECONDS)
+        state[f"{prefix}_recent"] = [entry for entry in state[f"{prefix}_recent"] if entry[1] >= cutoff]
+
+    def _apply_deltas(self, states: dict) -> set:
+        """Apply new activities and quiz results; returns the users that changed."""
+        changed = set()
+
+        activity_query = self._delta_query(states, "user", "activity_watermark")
+        activity_query["type"] = {"$in": list(MODULE_STATUS)}
+        activities = self._find(
+            "activities",
+            activity_query,
+            {"user": 1, "module": 1, "type": 1, "occurredAt": 1, "createdAt": 1},
+        )
+        for doc in activities:
+            state = states[doc["user"]]
+            if self._is_new(state, doc, "activity"):
+                apply_activity(state, doc)
+                changed.add(doc["user"])
+
+        quiz_results = self._find(
+            "quizresults",
+            self._delta_query(states, "userId", "quiz_result_watermark"),
+            {"userId": 1, "moduleId": 1, "score": 1, "passed": 1, "duration": 1, "createdAt": 1},
+        )
+        quiz_results = [doc for doc in quiz_results if self._is_new(states[doc["userId"]], doc, "quiz_result")]
+        quizzes_by_module = {}
+        module_ids = list({doc["moduleId"] for doc in quiz_results if doc.get("moduleId") is not None})
+        if module_ids:
+            quizzes = self._find(
+                "quizzes",
+                {"moduleId": {"$in": module_ids}},
+                {"_id": 1, "moduleId": 1, "maximumDuration": 1},
+            )
+            for quiz in quizzes:
+                quizzes_by_module.setdefault(quiz["moduleId"], []).append(quiz)
+        for doc in quiz_results:
+            apply_quiz_result(states[doc["userId"]], doc, quizzes_by_module)
+            changed.add(doc["userId"])
+
+        for user_id in changed:
+            self._prune(states[user_id], "activity")
+            self._prune(states[user_id], "quiz_result")
+        return changed
+
+    def _save(self, states: dict, user_ids) -> None:
+        """
+        Write changed states with optimistic concurrency on `version`.
+        A lost race leaves the other writer's state in place; the deltas are
+        simply re-applied on the next sync.
+        """
+        requests = []
+        for user_id in user_ids:
+            state = states[user_id]
+            version = state["version"]
+            state["version"] = version + 1
+            state["updatedAt"] = datetime.utcnow()
+            requests.append(ReplaceOne({"_id": user_id, "version": version}, state, upsert=True))
+        if not requests:
+            return
+        self.round_trips += 1
+        try:
+            self.collection.bulk_write(requests, ordered=False)
+        except BulkWriteError as bwe:
+            write_errors = bwe.details.get("writeErrors", [])
+            if any(err.get("code") != 11000 for err in write_errors):
+                raise
+
+    def sync_many(self, user_ids) -> dict:
+        """Bring the stored state of every user up to date and return it."""
+        states = self.load_many(user_ids)
+        changed = self._apply_deltas(states)
+        with stage("store.save"):
+            self._save(states, [user_id for user_id in states if user_id in changed])
+        return states
+
+    def rebuild_many(self, user_ids) -> dict:
+        """Recompute state from the full history, replacing what is stored."""
+        stored = self.load_many(user_ids)
+        states = {user_id: empty_state(user_id) for user_id in stored}
+        for user_id, state in states.items():
+            state["version"] = stored[user_id]["version"]
+        self._apply_deltas(states)
+        self._save(states, list(states))
+        return states
+
+
+class StoreBatchPrepare:
+    """Feature engine that reads running aggregates from the feature store."""
+
+    def __init__(self, user_ids, sync: bool = FEATURE_STORE_SYNC_ON_READ):
+        # de-duplicate while keeping request order
+        self.user_ids = list(dict.fromkeys(user_ids))
+        self.features_final = list(FEATURES_FINAL)
+        self.sync = sync
+        self.store = FeatureStore()
+
+    @property
+    def round_trips(self) -> int:
+        return self.store.round_trips
+
+    def prepare_features(self):
+        """Same contract as BatchPrepare.prepare_features: returns (features, errors)."""
+        if self.sync:
+            states = self.store.sync_many(self.user_ids)
+        else:
+            states = self.store.load_many(self.user_ids)
+
+        rows = {}
+        errors = {}
+        for user_id in self.user_ids:
+            state = states[user_id]
+            if state["has_module"] and not state["matched_quiz"]:
+                errors[user_id] = "Quiz dataframe is empty"
+                continue
+            rows[user_id] = state_features(state)
+
+        features = pd.DataFrame.from_dict(rows, orient="index", columns=self.features_final)
+        features.index.name = "userId"
+        return features.astype(float), errors
+
+
+class StorePrepare:
+    """Single-user feature-store engine with the Prepare interface."""
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.batch = StoreBatchPrepare([user_id])
+        self.features_final = list(FEATURES_FINAL)
+
+    @property
+    def round_trips(self) -> int:
+        return self.batch.round_trips
+
+    def prepare_features(self) -> pd.DataFrame:
+        """Returns a single-row DataFrame with the features_final columns."""
+        features, errors = self.batch.prepare_features()
+        if self.user_id in errors:
+            raise ValueError(errors[self.user_id])
+        return features.reset_index(drop=True)[self.features_final]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the per-user feature store.")
+    parser.add_argument("command", choices=["sync", "rebuild"])
+    parser.add_argument("user_ids", nargs="+")
+    args = parser.parse_args()
+
+    store = FeatureStore()
+    if args.command == "sync":
+        states = store.sync_many(args.user_ids)
+    else:
+        states = store.rebuild_many(args.user_ids)
+    for user_id, state in states.items():
+        print(f"[ok] {args.command} user={user_id} features={state_features(state)}")
+
+
+if __name__ == "__main__":
+    main()
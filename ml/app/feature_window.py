@@ -0,0 +1,122 @@
+"""
+Windowed feature mode.
+
+By default features are computed over a user's whole history, so the work per
+inference grows for as long as the user stays on the platform. A deployment
+can cap it with a window that is applied inside the Mongo queries:
+
+    FEATURE_WINDOW_DAYS=N     only activities (occurredAt) and quiz results
+                              (timestamp) from the last N days, counted from
+                              UTC midnight so the window moves once a day
+    FEATURE_WINDOW_MODULES=N  only the N modules the user was most recently
+                              active in (per collection, by latest event time)
+
+Both default to 0 (whole history) and can be combined. Activity queries always
+ask for module_start/module_complete only, the two types the features use.
+
+The backend only requests a profile once a user's first activity is
+ML_MIN_HISTORY_DAYS old (default 14); a day window shorter than that would
+score users on less history than they were gated on, so it is logged at import.
+
+The pandas, fast, mongo, async and snapshot engines honour the window. The
+store engine keeps running aggregates over the whole history and ignores it.
+"""
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Optional
+
+FEATURE_WINDOW_DAYS = int(os.getenv("FEATURE_WINDOW_DAYS", "0"))
+FEATURE_WINDOW_MODULES = int(os.getenv("FEATURE_WINDOW_MODULES", "0"))
+ML_MIN_HISTORY_DAYS = int(os.getenv("ML_MIN_HISTORY_DAYS", "14"))
+
+MODULE_EVENT_TYPES = ["module_start", "module_complete"]
+
+logger = logging.getLogger("uvicorn.error")
+
+if 0 < FEATURE_WINDOW_DAYS < ML_MIN_HISTORY_DAYS:
+    logger.warning(
+        "FEATURE_WINDOW_DAYS=%d is shorter than ML_MIN_HISTORY_DAYS=%d; "
+        "users just past the backend's history gate are scored on part of it",
+        FEATURE_WINDOW_DAYS, ML_MIN_HISTORY_DAYS,
+    )
+
+
+def window_start(now: Optional[datetime] = None) -> Optional[datetime]:
+    """First instant inside the day window (naive UTC, like pymongo dates), or None."""
+    if FEATURE_WINDOW_DAYS <= 0:
+        return None
+    now = now or datetime.utcnow()
+    midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    return midnight - timedelta(days=FEATURE_WINDOW_DAYS)
+
+
+def activity_query(user_filter) -> dict:
+    """Activity filter for `user_filter` (an id or an `$in`), limited to the window."""
+    query = {"user": user_filter, "type": {"$in": MODULE_EVENT_TYPES}}
+    start = window_start()
+    if start is not None:
+        query["occurredAt"] = {"$gte": start}
+    return query
+
+
+def quiz_result_query(user_filter) -> dict:
+    """Quiz-result filter for `user_filter`, limited to the window."""
+    query = {"userId": user_filter}
+    start = window_start()
+    if start is not None:
+        query["timestamp"] = {"$gte": start}
+    return query
+
+
+def last_modules_stages(user_field: str, module_field: str, time_field: str) -> list:
+    """
+    Aggregation stages keeping each user's FEATURE_WINDOW_MODULES most recently
+    active modules (by their latest `time_field`); documents pass through
+    unchanged. Empty when the module window is off.
+    """
+    if FEATURE_WINDOW_MODULES <= 0:
+        return []
+    return [
+        {"$group": {
+            "_id": {"user": f"${user_field}", "module": f"${module_field}"},
+            "last": {"$max": f"${time_field}"},
+            "docs": {"$push": "$$ROOT"},
+        }},
+        {"$sort": {"last": -1, "_id": 1}},
+        {"$group": {"_id": "$_id.user", "modules": {"$push": "$docs"}}},
+        {"$project": {"modules": {"$slice": ["$modules", FEATURE_WINDOW_MODULES]}}},
+        {"$unwind": "$modules"},
+        {"$unwind": "$modules"},
+        {"$replaceRoot": {"newRoot": "$modules"}},
+    ]
+
+
+def windowed_pipeline(query: dict, projection: dict, user_field: str, module_field: str, time_field: str) -> list:
+    """find(query, projection) as a pipeline with the module window applied."""
+    # the window needs the time field even when the caller does not
+    fields = dict(projection, **{time_field: 1})
+    return [
+        {"$match": query},
+        {"$project": fields},
+        *last_modules_stages(user_field, module_field, time_field),
+        {"$project": projection},
+    ]
+
+
+def apply_window(df, user_col: str, module_col: str, time_col: str):
+    """The same window over an in-memory frame (snapshot engine)."""
+    if df.empty:
+        return df
+    start = window_start()
+    if start is not None:
+        df = df[df[time_col] >= start]
+    if FEATURE_WINDOW_MODULES > 0 and not df.empty:
+        last = df.groupby([user_col, module_col], sort=False, dropna=False)[time_col].transform("max")
+        # dense rank of each module by its latest event, newest first
+        keys = df.assign(_last=last)[[user_col, module_col, "_last"]].drop_duplicates()
+        keys = keys.sort_values("_last", ascending=False)
+        keys["_rank"] = keys.groupby(user_col, sort=False).cumcount()
+        kept = keys[keys["_rank"] < FEATURE_WINDOW_MODULES].set_index([user_col, module_col]).index
+        df = df[df.set_index([user_col, module_col]).index.isin(kept)]
+    return df
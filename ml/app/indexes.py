@@ -0,0 +1,154 @@
+"""
+Index verification for the collections the feature engines query.
+
+At startup the service checks that every query shape is backed by an index,
+optionally creates the missing ones, and logs an explain-plan summary
+(winning stage, index used, documents examined per document returned) so
+collection scans show up in the logs.
+
+    ENSURE_INDEXES=check   verify and warn about missing indexes (default)
+    ENSURE_INDEXES=create  create missing indexes in the background
+    ENSURE_INDEXES=off     skip verification and explain logging
+"""
+import logging
+import os
+from datetime import datetime
+
+from feature_window import MODULE_EVENT_TYPES, activity_query, quiz_result_query
+
+ENSURE_INDEXES = os.getenv("ENSURE_INDEXES", "check")
+# watermark used for the feature-store delta query shapes
+STORE_DELTA_SAMPLE = datetime(2024, 1, 1)
+
+# collection -> compound indexes (key lists) the ML service relies on
+INDEX_SPECS = {
+    "activities": [
+        # per-user activity fetches, filtered by type and occurredAt window
+        [("user", 1), ("type", 1), ("occurredAt", 1)],
+        # freshness token: newest activity per user
+        [("user", 1), ("occurredAt", -1)],
+        # feature-store deltas: module events per user ingested since the watermark
+        [("user", 1), ("type", 1), ("createdAt", 1)],
+    ],
+    "quizresults": [
+        [("userId", 1), ("moduleId", 1)],
+        # windowed quiz-result fetches (FEATURE_WINDOW_DAYS)
+        [("userId", 1), ("timestamp", 1)],
+        # feature-store deltas: results per user ingested since the watermark;
+        # also covers the freshness token's per-user count and newest createdAt
+        [("userId", 1), ("createdAt", 1)],
+    ],
+    "quizzes": [
+        [("moduleId", 1)],
+    ],
+}
+
+logger = logging.getLogger("uvicorn.error")
+
+
+def _is_covered(spec: list, existing: list) -> bool:
+    """An existing index covers `spec` when its keys start with the spec's keys."""
+    for keys in existing:
+        if [(field, int(direction)) for field, direction in keys[: len(spec)]] == spec:
+            return True
+    return False
+
+
+def missing_indexes(database) -> dict:
+    """{collection: [key lists]} for specs no existing index covers."""
+    missing = {}
+    for collection, specs in INDEX_SPECS.items():
+        existing = [info["key"] for info in database[collection].index_information().values()]
+        absent = [spec for spec in specs if not _is_covered(spec, existing)]
+        if absent:
+            missing[collection] = absent
+    return missing
+
+
+def ensure_indexes(database, create: bool = False) -> dict:
+    """Report missing indexes, creating them first when `create` is set."""
+    missing = missing_indexes(database)
+    for collection, specs in missing.items():
+        for spec in specs:
+            if create:
+                name = database[collection].create_index(spec, background=True)
+                logger.info("created index %s.%s", collection, name)
+            else:
+                logger.warning("missing index on %s %s", collection, spec)
+    return {} if create else missing
+
+
+def query_shapes(database) -> list:
+    """(name, collection, filter, sort) for each query the engines issue, using sample ids."""
+    activity = database.activities.find_one({"user": {"$exists": True}}, {"user": 1}) or {}
+    quiz_result = database.quizresults.find_one({"userId": {"$exists": True}}, {"userId": 1, "moduleId": 1}) or {}
+    user_id = activity.get("user")
+    result_user = quiz_result.get("userId", user_id)
+    module_ids = [quiz_result["moduleId"]] if quiz_result.get("moduleId") is not None else []
+    return [
+        ("activities_by_user", "activities", {"user": user_id}, None),
+        ("activities_by_user_type", "activities", activity_query(user_id), None),
+        ("activity_freshness", "activities", {"user": user_id}, [("occurredAt", -1)]),
+        ("quizresults_by_user", "quizresults", quiz_result_query(result_user), None),
+        ("quizresult_freshness", "quizresults", {"userId": result_user}, [("createdAt", -1)]),
+        ("activity_store_delta", "activities",
+         {"user": user_id, "type": {"$in": MODULE_EVENT_TYPES}, "createdAt": {"$gte": STORE_DELTA_SAMPLE}}, None),
+        ("quizresult_store_delta", "quizresults",
+         {"userId": result_user, "createdAt": {"$gte": STORE_DELTA_SAMPLE}}, None),
+        ("quizzes_by_module", "quizzes", {"moduleId": {"$in": module_ids}}, None),
+    ]
+
+
+def _winning_stage(plan: dict):
+    """(stage, index name) of the input stage that reads data in a plan tree."""
+    plan = plan.get("queryPlan", plan)
+    while True:
+        stage = plan.get("stage")
+        if stage in ("IXSCAN", "COLLSCAN", "IDHACK", "EXPRESS_IXSCAN", "CLUSTERED_IXSCAN"):
+            return stage, plan.get("indexName")
+        children = plan.get("inputStages") or ([plan["inputStage"]] if "inputStage" in plan else [])
+        if not children:
+            return stage, None
+        plan = children[0]
+
+
+def explain_summary(database, collection: str, query: dict, sort=None) -> dict:
+    cursor = database[collection].find(query)
+    if sort:
+        cursor = cursor.sort(sort)
+    explain = cursor.explain()
+    stage, index_name = _winning_stage(explain["queryPlanner"]["winningPlan"])
+    stats = explain.get("executionStats", {})
+    returned = stats.get("nReturned", 0)
+    examined = stats.get("totalDocsExamined", 0)
+    return {
+        "stage": stage,
+        "index": index_name,
+        "returned": returned,
+        "docs_examined": examined,
+        "keys_examined": stats.get("totalKeysExamined", 0),
+        "docs_examined_per_returned": examined / returned if returned else float(examined),
+    }
+
+
+def log_query_plans(database) -> list:
+    summaries = []
+    for name, collection, query, sort in query_shapes(database):
+        summary = explain_summary(database, collection, query, sort)
+        summary["query"] = name
+        summaries.append(summary)
+        log = logger.warning if summary["stage"] == "COLLSCAN" else logger.info
+        log(
+            "query plan %s: stage=%s index=%s returned=%d docs_examined=%d (%.1f per returned)",
+            name, summary["stage"], summary["index"], summary["returned"],
+            summary["docs_examined"], summary["docs_examined_per_returned"],
+        )
+    return summaries
+
+
+def verify_indexes(database, mode: str = ENSURE_INDEXES) -> None:
+    """Startup hook: check or create indexes, then log query plans."""
+    if mode == "off":
+        return
+    ensure_indexes(database, create=(mode == "create"))
+    log_query_plans(database)
@@ -0,0 +1,136 @@
+"""
+Per-stage instrumentation for the inference pipeline.
+
+Every Mongo query and pipeline step runs inside `stage(name)`, which feeds the
+cluster_inference_stage_seconds histogram. Queries go through
+`find_documents`/`aggregate_documents`, which read raw BSON batches so the
+documents fetched and bytes decoded per request can be counted exactly.
+Stages nest: a prepare.* stage includes the fetch.* stages it triggers.
+
+Set INFERENCE_TRACE_SAMPLE_RATE (0..1) to log a per-request trace of stage
+timings for a sample of requests.
+"""
+import json
+import logging
+import os
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import bson
+from prometheus_client import Histogram
+
+TRACE_SAMPLE_RATE = float(os.getenv("INFERENCE_TRACE_SAMPLE_RATE", "0"))
+
+STAGE_LATENCY = Histogram(
+    "cluster_inference_stage_seconds",
+    "Latency of each inference pipeline stage (seconds)",
+    ["stage"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+DOCS_FETCHED = Histogram(
+    "cluster_inference_docs_fetched",
+    "Mongo documents fetched per inference request",
+    buckets=(0, 10, 50, 100, 500, 1000, 5000, 10000, 50000),
+)
+BYTES_DECODED = Histogram(
+    "cluster_inference_bytes_decoded",
+    "BSON bytes decoded per inference request",
+    buckets=(1e3, 1e4, 5e4, 1e5, 5e5, 1e6, 5e6, 1e7, 5e7),
+)
+
+logger = logging.getLogger("uvicorn.error")
+
+_current_request = ContextVar("inference_request", default=None)
+
+
+class RequestStats:
+    def __init__(self, sampled: bool):
+        self.docs = 0
+        self.bytes = 0
+        # (stage, milliseconds) pairs, only kept for sampled requests
+        self.trace = [] if sampled else None
+
+
+@contextmanager
+def track_request(label: str):
+    """Collect docs/bytes (and an optional trace) for one inference request."""
+    stats = RequestStats(sampled=TRACE_SAMPLE_RATE > 0 and random.random() < TRACE_SAMPLE_RATE)
+    token = _current_request.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_request.reset(token)
+        DOCS_FETCHED.observe(stats.docs)
+        BYTES_DECODED.observe(stats.bytes)
+        if stats.trace is not None:
+            logger.info(
+                "inference trace %s docs=%d bytes=%d stages=%s",
+                label, stats.docs, stats.bytes, json.dumps(stats.trace),
+            )
+
+
+@contextmanager
+def stage(name: str):
+    """Time a pipeline stage into STAGE_LATENCY and the request trace."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_LATENCY.labels(stage=name).observe(elapsed)
+        stats = _current_request.get()
+        if stats is not None and stats.trace is not None:
+            stats.trace.append((name, round(elapsed * 1000, 3)))
+
+
+def _record_fetch(docs: int, nbytes: int) -> None:
+    stats = _current_request.get()
+    if stats is not None:
+        stats.docs += docs
+        stats.bytes += nbytes
+
+
+def _decode(batches, codec_options) -> list:
+    docs = []
+    nbytes = 0
+    for batch in batches:
+        nbytes += len(batch)
+        docs.extend(bson.decode_all(batch, codec_options))
+    _record_fetch(len(docs), nbytes)
+    return docs
+
+
+def find_documents(collection, query: dict, projection: dict = None, sort=None,
+                   limit: int = 0, stage_name: str = None) -> list:
+    """collection.find as a list, timed and counted."""
+    with stage(stage_name or f"fetch.{collection.name}"):
+        batches = collection.find_raw_batches(query, projection, sort=sort, limit=limit)
+        return _decode(batches, collection.codec_options)
+
+
+def aggregate_documents(collection, pipeline: list, stage_name: str = None) -> list:
+    """collection.aggregate as a list, timed and counted."""
+    with stage(stage_name or f"aggregate.{collection.name}"):
+        batches = collection.aggregate_raw_batches(pipeline)
+        return _decode(batches, collection.codec_options)
+
+
+async def async_find_documents(collection, query: dict, projection: dict = None, sort=None,
+                               limit: int = 0, stage_name: str = None) -> list:
+    """find_documents for pymongo's async collections."""
+    with stage(stage_name or f"fetch.{collection.name}"):
+        batches = [
+            batch
+            async for batch in collection.find_raw_batches(query, projection, sort=sort, limit=limit)
+        ]
+        return _decode(batches, collection.codec_options)
+
+
+async def async_aggregate_documents(collection, pipeline: list, stage_name: str = None) -> list:
+    """aggregate_documents for pymongo's async collections."""
+    with stage(stage_name or f"aggregate.{collection.name}"):
+        cursor = await collection.aggregate_raw_batches(pipeline)
+        batches = [batch async for batch in cursor]
+        return _decode(batches, collection.codec_options)
@@ -1,112 +1,57 @@
 import logging
+import os
 import time
-from pathlib import Path
-import joblib
+from contextlib import asynccontextmanager
+from typing import List, Optional
+
 import numpy as np
 
-from fastapi import FastAPI, HTTPException, Response
+from fastapi import FastAPI, Header, HTTPException, Query, Response
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
-from prometheus_client import Counter, Histogram, CONTENT_TYPE_LATEST, generate_latest
+from prometheus_client import (
+    CollectorRegistry, Counter, Gauge, Histogram, CONTENT_TYPE_LATEST, REGISTRY, generate_latest, multiprocess,
+)
 
-from prepare_data import Prepare
+from cache import InferenceCache
+from drift import DriftTracker
+from feature_engines import FEATURE_ENGINE, get_engine
+from indexes import verify_indexes
+from instrumentation import stage, track_request
+import prepare_data
+from prepare_data import FetchData
+from registry import ModelRegistry
+from similar_learners import SIMILAR_MAX_K, SIMILAR_N_PROBE, LearnerIndex, start_loading
+from singleflight import AsyncSingleFlight, SingleFlight
 
-app = FastAPI()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Mongo clients are created here rather than at import so importing the
+    # app (tests, tooling, forked workers) never opens connections
+    prepare_data.get_client()
+    if INFERENCE_IO == "async":
+        from async_data import get_async_db
 
-class InferenceRequest(BaseModel):
-    user_id: str
+        get_async_db()
+    try:
+        verify_indexes(prepare_data.get_db())
+    except Exception as exc:
+        # index checks are advisory; never block the service from starting
+        logger.warning("index verification failed: %s", exc)
+    model_registry.start_watch()
+    start_loading(learner_index, model_registry)
+    yield
+    model_registry.stop_watch()
+    prepare_data.close_client()
+    if INFERENCE_IO == "async":
+        from async_data import close_async_client
 
-class ClusterInferenceService:
-    def __init__(self, model_path: Path, scaler_path: Path):
-        self.model_path = model_path
-        self.scaler_path = scaler_path
+        await close_async_client()
 
-        # load model and scaler
-        self.model = joblib.load(self.model_path)
-        self.scaler = joblib.load(self.scaler_path)
 
-    def infer(self, user_id: str):
-        # prepare data
-        prepare = Prepare(user_id)
-        df_features = prepare.prepare_features()
-        # scale data
-        df_features_scaled = self.scaler.transform(df_features)
-        # predict cluster using KMeans
-        cluster = int(self.model.predict(df_features_scaled)[0])
-        # calculate distance to assigned centroid
-        centroid = self.model.cluster_centers_[cluster]
-        distance = float(np.linalg.norm(df_features_scaled - centroid))
-        return {"cluster": cluster, "distance": distance, "learner_type": self.translate(cluster)}
-    
-    def translate(self, cluster):
-        cluster_interpretation = {
-            0: {
-                "learner_type": "Slow but Sure",
-                "strength": [
-                    "Mampu belajar dalam durasi panjang saat termotivasi",
-                    "Hasil akademik cukup baik meskipun tidak rutin",
-                    "Tahan terhadap beban belajar berat dalam satu waktu"
-                ],
-                "weakness": [
-                    "Konsistensi belajar rendah",
-                    "Cenderung belajar secara meledak-ledak (cramming)",
-                    "Efisiensi waktu belajar kurang optimal"
-                ],
-                "tips": [
-                    "Ubah pola belajar marathon menjadi sesi singkat namun rutin",
-                    "Gunakan milestone kecil untuk menjaga momentum",
-                    "Fokus pada keberlanjutan belajar, bukan ledakan produktivitas"
-                ]
-            },
-
-            1: {
-                "learner_type": "Performative Learner",
-                "strength": [
-                    "Konsistensi belajar sangat tinggi",
-                    "Pemanfaatan waktu belajar paling efisien",
-                    "Performa akademik stabil dan unggul"
-                ],
-                "weakness": [
-                    "Durasi belajar sangat singkat",
-                    "Potensi eksplorasi materi lanjutan belum maksimal"
-                ],
-                "tips": [
-                    "Dorong eksplorasi materi lanjutan dan studi kasus kompleks",
-                    "Tambahkan challenge berbasis problem nyata",
-                    "Pertahankan presisi, tingkatkan kedalaman pemahaman"
-                ]
-            },
-
-            2: {
-                "learner_type": "Wandering Learner",
-                "strength": [
-                    "Masih menunjukkan usaha belajar secara berkala",
-                    "Tidak sepenuhnya pasif dalam proses belajar"
-                ],
-                "weakness": [
-                    "Performa akademik rendah",
-                    "Konsistensi belajar lemah",
-                    "Pemanfaatan waktu belajar tidak terarah"
-                ],
-                "tips": [
-                    "Berikan struktur belajar yang jelas dan bertahap",
-                    "Fokus pada penguatan konsep dasar",
-                    "Gunakan feedback cepat untuk menghindari kehilangan arah belajar"
-                ]
-            }
-        }
-        return cluster_interpretation[cluster]
-
-
-
-BASE_DIR = Path(__file__).resolve().parent.parent
-MODEL_PATH = BASE_DIR / "models" / "kmeans_model_37_3n_2.pkl"
-SCALER_PATH = BASE_DIR / "models" / "kmeans_scaler_1.pkl"
-
-service = ClusterInferenceService(
-    model_path=MODEL_PATH,
-    scaler_path=SCALER_PATH,
-)
+app = FastAPI(lifespan=lifespan)
+
 
 # Prometheus metrics
 INFERENCE_REQUESTS = Counter(
@@ -120,42 +65,519 @@ INFERENCE_ERRORS = Counter(
 INFERENCE_LATENCY = Histogram(
     "cluster_inference_latency_seconds",
     "Cluster inference latency (seconds)",
-    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10),
+    # 15s is the backend's ML_TIMEOUT_MS: requests above it have been abandoned
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 15, 30),
+)
+DB_ROUND_TRIPS = Histogram(
+    "cluster_inference_db_round_trips",
+    "Mongo queries issued per cluster inference request",
+    buckets=(1, 2, 3, 4, 5, 6, 8, 10),
+)
+CACHE_HITS = Counter(
+    "cluster_inference_cache_hits_total",
+    "Cluster inference requests answered from the result cache",
+)
+CACHE_MISSES = Counter(
+    "cluster_inference_cache_misses_total",
+    "Cluster inference requests that ran the feature pipeline",
+)
+CACHE_EVICTIONS = Counter(
+    "cluster_inference_cache_evictions_total",
+    "Result cache entries evicted",
+    ["reason"],
+)
+COALESCED_REQUESTS = Counter(
+    "cluster_inference_coalesced_total",
+    "Cluster inference requests that shared another request's in-flight computation",
+)
+BATCH_INFERENCE_USERS = Counter(
+    "cluster_inference_batch_users_total",
+    "Total number of users scored through the batch endpoint",
+)
+BATCH_INFERENCE_LATENCY = Histogram(
+    "cluster_inference_batch_latency_seconds",
+    "Batch cluster inference latency (seconds)",
+    buckets=(0.1, 0.25, 0.5, 1, 2, 5, 10, 30, 60),
+)
+SHADOW_LATENCY = Histogram(
+    "cluster_inference_shadow_latency_seconds",
+    "Time spent scoring the shadow model version (seconds)",
+    ["version"],
+    buckets=(0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01),
+)
+SIMILAR_LEARNERS_LATENCY = Histogram(
+    "similar_learners_latency_seconds",
+    "Similar-learners index lookup latency (seconds)",
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1),
+)
+SIMILAR_LEARNERS_INDEXED = Gauge(
+    "similar_learners_indexed_users",
+    "Users in the similar-learners index",
+    multiprocess_mode="max",
+)
+SHADOW_PREDICTIONS = Counter(
+    "cluster_inference_shadow_predictions_total",
+    "Rows scored by the shadow model version, by agreement with the active version",
+    ["version", "outcome"],
+)
+
+
+CLUSTER_INTERPRETATION = {
+    0: {
+        "learner_type": "Slow but Sure",
+        "strength": [
+            "Mampu belajar dalam durasi panjang saat termotivasi",
+            "Hasil akademik cukup baik meskipun tidak rutin",
+            "Tahan terhadap beban belajar berat dalam satu waktu"
+        ],
+        "weakness": [
+            "Konsistensi belajar rendah",
+            "Cenderung belajar secara meledak-ledak (cramming)",
+            "Efisiensi waktu belajar kurang optimal"
+        ],
+        "tips": [
+            "Ubah pola belajar marathon menjadi sesi singkat namun rutin",
+            "Gunakan milestone kecil untuk menjaga momentum",
+            "Fokus pada keberlanjutan belajar, bukan ledakan produktivitas"
+        ]
+    },
+
+    1: {
+        "learner_type": "Performative Learner",
+        "strength": [
+            "Konsistensi belajar sangat tinggi",
+            "Pemanfaatan waktu belajar paling efisien",
+            "Performa akademik stabil dan unggul"
+        ],
+        "weakness": [
+            "Durasi belajar sangat singkat",
+            "Potensi eksplorasi materi lanjutan belum maksimal"
+        ],
+        "tips": [
+            "Dorong eksplorasi materi lanjutan dan studi kasus kompleks",
+            "Tambahkan challenge berbasis problem nyata",
+            "Pertahankan presisi, tingkatkan kedalaman pemahaman"
+        ]
+    },
+
+    2: {
+        "learner_type": "Wandering Learner",
+        "strength": [
+            "Masih menunjukkan usaha belajar secara berkala",
+            "Tidak sepenuhnya pasif dalam proses belajar"
+        ],
+        "weakness": [
+            "Performa akademik rendah",
+            "Konsistensi belajar lemah",
+            "Pemanfaatan waktu belajar tidak terarah"
+        ],
+        "tips": [
+            "Berikan struktur belajar yang jelas dan bertahap",
+            "Fokus pada penguatan konsep dasar",
+            "Gunakan feedback cepat untuk menghindari kehilangan arah belajar"
+        ]
+    }
+}
+
+
+class InferenceRequest(BaseModel):
+    user_id: str
+
+
+class BatchInferenceRequest(BaseModel):
+    user_ids: List[str]
+
+
+class ModelVersionRequest(BaseModel):
+    version: Optional[str] = None
+
+
+class ClusterInferenceService:
+    def __init__(self, registry: ModelRegistry, feature_engine: str = FEATURE_ENGINE,
+                 learner_index: Optional[LearnerIndex] = None, drift: Optional[DriftTracker] = None):
+        # model versions are loaded and swapped by the registry; each scoring
+        # call reads registry.active once so a swap never splits a request
+        self.registry = registry
+        self.feature_engine = feature_engine
+        self.prepare_cls, self.batch_prepare_cls = get_engine(feature_engine)
+        # scored users are upserted here for /similar-learners
+        self.learner_index = learner_index
+        # streaming feature/cluster statistics vs the model's training baseline
+        self.drift = drift
+
+    def infer(self, user_id: str):
+        # prepare data
+        prepare = self.prepare_cls(user_id)
+        df_features = prepare.prepare_features()
+        DB_ROUND_TRIPS.observe(prepare.round_trips)
+        return self.score(df_features, user_id)
+
+    async def infer_async(self, user_id: str):
+        """infer() on the async Mongo client (pandas feature engine only, checked at startup)."""
+        from async_data import AsyncPrepare
+
+        prepare = AsyncPrepare(user_id)
+        df_features = await prepare.prepare_features()
+        DB_ROUND_TRIPS.observe(prepare.round_trips)
+        return self.score(df_features, user_id)
+
+    def score(self, df_features, user_id: Optional[str] = None):
+        """Scale a single-row feature frame and assign its cluster."""
+        return self.score_many(df_features, None if user_id is None else [user_id])[0]
+
+    def score_many(self, df_features, user_ids=None):
+        """
+        Scale feature rows and assign clusters with precomputed centroid math.
+        Each result carries the distance to its centroid and to every cluster,
+        plus the model version that produced it. With `user_ids` (one per row)
+        the rows are also upserted into the learner index.
+        """
+        version = self.registry.active
+        shadow = self.registry.shadow
+        features = df_features[version.feature_names].to_numpy(dtype=np.float64)
+        with stage("scale"):
+            features_scaled = version.centroids.transform(features)
+        with stage("predict"):
+            distances = version.centroids.distances(features_scaled)
+            clusters = distances.argmin(axis=1)
+        if shadow is not None:
+            self.shadow_score(shadow, df_features, clusters)
+        if self.drift is not None:
+            self.drift.observe_many(version, features, clusters, distances)
+        if self.learner_index is not None and user_ids is not None:
+            with stage("index"):
+                self.learner_index.upsert_many(version, user_ids, features, features_scaled, clusters)
+
+        results = []
+        for cluster, row in zip(clusters, distances):
+            cluster = int(cluster)
+            results.append({
+                "cluster": cluster,
+                "distance": float(row[cluster]),
+                "distances": row.tolist(),
+                "learner_type": self.translate(cluster),
+                "model_version": version.name,
+            })
+        return results
+
+    def shadow_score(self, shadow, df_features, clusters):
+        """
+        Score the same feature rows with the shadow version and record its
+        latency and how often it picks the same cluster as the active version.
+        Shadow results are never returned, and shadow failures never fail the
+        request.
+        """
+        start_time = time.perf_counter()
+        try:
+            features = df_features[shadow.feature_names].to_numpy(dtype=np.float64)
+            shadow_clusters, _ = shadow.centroids.predict(features)
+        except Exception as exc:
+            logger.warning("shadow scoring failed version=%s error=%s", shadow.name, exc)
+            return
+        SHADOW_LATENCY.labels(shadow.name).observe(time.perf_counter() - start_time)
+        agreed = int((shadow_clusters == clusters).sum())
+        SHADOW_PREDICTIONS.labels(shadow.name, "agree").inc(agreed)
+        SHADOW_PREDICTIONS.labels(shadow.name, "disagree").inc(len(clusters) - agreed)
+
+    def infer_many(self, user_ids: List[str]):
+        """
+        Score many users in one pass.
+        Features come from the configured engine's batch preparer, then
+        scaling, prediction and centroid distances run once over the whole
+        feature matrix.
+        Returns {user_id: result} plus {user_id: error message}.
+        """
+        prepare = self.batch_prepare_cls(user_ids)
+        df_features, errors = prepare.prepare_features()
+        DB_ROUND_TRIPS.observe(prepare.round_trips)
+        if df_features.empty:
+            return {}, errors
+
+        user_ids = list(df_features.index)
+        results = dict(zip(user_ids, self.score_many(df_features, user_ids)))
+        return results, errors
+
+    def translate(self, cluster):
+        return CLUSTER_INTERPRETATION[cluster]
+
+
+
+BATCH_MAX_USERS = int(os.getenv("BATCH_MAX_USERS", "5000"))
+CACHE_ENABLED = os.getenv("CACHE_ENABLED", "true").lower() == "true"
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+CACHE_TTL_SECONDS = float(os.getenv("CACHE_TTL_SECONDS", "600"))
+# "sync" serves /cluster-inference on the threadpool, "async" on the event loop
+INFERENCE_IO = os.getenv("INFERENCE_IO", "sync")
+if INFERENCE_IO == "async" and FEATURE_ENGINE != "pandas":
+    # the async path only has a pandas implementation; fail at startup rather
+    # than silently serving different features than the configured engine
+    raise ValueError(
+        f"INFERENCE_IO=async requires FEATURE_ENGINE=pandas, got FEATURE_ENGINE={FEATURE_ENGINE}"
+    )
+# when set, /admin/models requests must send it in the X-Admin-Token header
+MODEL_ADMIN_TOKEN = os.getenv("MODEL_ADMIN_TOKEN")
+
+model_registry = ModelRegistry(expected_clusters=len(CLUSTER_INTERPRETATION))
+learner_index = LearnerIndex(model_registry.active)
+service = ClusterInferenceService(registry=model_registry, learner_index=learner_index, drift=DriftTracker())
+
+inference_cache = InferenceCache(
+    max_entries=CACHE_MAX_ENTRIES,
+    ttl_seconds=CACHE_TTL_SECONDS,
+    evictions=CACHE_EVICTIONS,
 )
 
 logger = logging.getLogger("uvicorn.error")
 
 
+# concurrent requests for the same user (and data freshness) share one computation
+inference_flights = SingleFlight()
+async_inference_flights = AsyncSingleFlight()
+
+
+def infer_cached(user_id: str):
+    """
+    Serve a user's inference from the result cache while their data is
+    unchanged; the freshness token costs two indexed find_one calls instead
+    of the full feature pipeline. Cache misses for the same user and token
+    are coalesced into one in-flight computation.
+    """
+    token = None
+    if CACHE_ENABLED:
+        # results of a previous model version go stale once it is swapped out
+        token = (model_registry.active.name, FetchData(user_id).fetch_freshness_token())
+        result = inference_cache.get(user_id, token)
+        if result is not None:
+            CACHE_HITS.inc()
+            return result
+        CACHE_MISSES.inc()
+
+    def compute():
+        result = service.infer(user_id=user_id)
+        if CACHE_ENABLED:
+            inference_cache.put(user_id, token, result)
+        return result
+
+    result, shared = inference_flights.do((user_id, token), compute)
+    if shared:
+        COALESCED_REQUESTS.inc()
+    return result
+
+
+async def infer_cached_async(user_id: str):
+    """infer_cached() for the async I/O path."""
+    from async_data import AsyncFetchData
+
+    token = None
+    if CACHE_ENABLED:
+        token = (model_registry.active.name, await AsyncFetchData(user_id).fetch_freshness_token())
+        result = inference_cache.get(user_id, token)
+        if result is not None:
+            CACHE_HITS.inc()
+            return result
+        CACHE_MISSES.inc()
+
+    async def compute():
+        result = await service.infer_async(user_id=user_id)
+        if CACHE_ENABLED:
+            inference_cache.put(user_id, token, result)
+        return result
+
+    result, shared = await async_inference_flights.do((user_id, token), compute)
+    if shared:
+        COALESCED_REQUESTS.inc()
+    return result
+
+
 @app.get("/retrive-class")
 def get_user_class():
     # Kept for backward compatibility with the existing stub.
     return {"class": 0}
 
 
-@app.post("/cluster-inference")
+def _inference_failed(user_id: str, exc: Exception) -> HTTPException:
+    INFERENCE_ERRORS.inc()
+    if isinstance(exc, NotImplementedError):
+        return HTTPException(status_code=501, detail=str(exc))
+    logger.exception("cluster-inference failed user_id=%s error=%s", user_id, exc)
+    return HTTPException(status_code=400, detail=str(exc))
+
+
+def _inference_succeeded(user_id: str, result: dict, start_time: float) -> JSONResponse:
+    with stage("serialize"):
+        response = JSONResponse({"user_id": user_id, "result": result})
+    latency = time.perf_counter() - start_time
+    INFERENCE_LATENCY.observe(latency)
+    logger.info("cluster-inference success user_id=%s latency=%.4fs", user_id, latency)
+    return response
+
+
 def cluster_inference(request: InferenceRequest):
     """
     Predict cluster for a user using their user_id.
     Accepts user_id in the request body as JSON.
     """
+    start_time = time.perf_counter()
+    INFERENCE_REQUESTS.inc()
+    with track_request(f"user_id={request.user_id}"):
+        try:
+            result = infer_cached(request.user_id)
+        except Exception as exc:
+            raise _inference_failed(request.user_id, exc)
+        return _inference_succeeded(request.user_id, result, start_time)
+
+
+async def cluster_inference_async(request: InferenceRequest):
+    """
+    Same contract as cluster_inference, served on the event loop with the
+    activity and quiz-result queries running concurrently.
+    """
+    start_time = time.perf_counter()
+    INFERENCE_REQUESTS.inc()
+    with track_request(f"user_id={request.user_id}"):
+        try:
+            result = await infer_cached_async(request.user_id)
+        except Exception as exc:
+            raise _inference_failed(request.user_id, exc)
+        return _inference_succeeded(request.user_id, result, start_time)
+
+
+app.add_api_route(
+    "/cluster-inference",
+    cluster_inference_async if INFERENCE_IO == "async" else cluster_inference,
+    methods=["POST"],
+)
+
+
+@app.post("/cluster-inference/batch")
+def cluster_inference_batch(request: BatchInferenceRequest):
+    """
+    Predict clusters for many users in one vectorized pass.
+    Accepts user_ids in the request body as JSON. Users whose data cannot be
+    scored are reported with an error instead of failing the whole batch.
+    """
+    if len(request.user_ids) > BATCH_MAX_USERS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Batch exceeds {BATCH_MAX_USERS} users",
+        )
+
     start_time = time.perf_counter()
     INFERENCE_REQUESTS.inc()
     try:
-        result = service.infer(user_id=request.user_id)
-        latency = time.perf_counter() - start_time
-        INFERENCE_LATENCY.observe(latency)
-        logger.info("cluster-inference success user_id=%s latency=%.4fs", request.user_id, latency)
-        return {"user_id": request.user_id, "result": result}
-    except NotImplementedError as exc:
-        INFERENCE_ERRORS.inc()
-        raise HTTPException(status_code=501, detail=str(exc))
+        results, errors = service.infer_many(request.user_ids)
     except Exception as exc:
         INFERENCE_ERRORS.inc()
-        logger.exception("cluster-inference failed user_id=%s error=%s", request.user_id, exc)
+        logger.exception("cluster-inference batch failed size=%d error=%s", len(request.user_ids), exc)
+        raise HTTPException(status_code=400, detail=str(exc))
+
+    latency = time.perf_counter() - start_time
+    BATCH_INFERENCE_LATENCY.observe(latency)
+    BATCH_INFERENCE_USERS.inc(len(results))
+    logger.info(
+        "cluster-inference batch success size=%d failed=%d latency=%.4fs",
+        len(results), len(errors), latency,
+    )
+
+    items = []
+    for user_id in dict.fromkeys(request.user_ids):
+        if user_id in results:
+            items.append({"user_id": user_id, "result": results[user_id]})
+        else:
+            items.append({"user_id": user_id, "error": errors.get(user_id, "Unknown error")})
+    return {"results": items}
+
+
+@app.get("/similar-learners/{user_id}")
+def similar_learners(user_id: str, k: int = Query(10, ge=1, le=SIMILAR_MAX_K)):
+    """
+    The k learners whose scaled features are closest to the user's, searched
+    in the partitions of the nearest clusters. Users not indexed yet are
+    scored first, which adds them.
+    """
+    start_time = time.perf_counter()
+    version = model_registry.active
+    neighbors = learner_index.search(version, user_id, k)
+    if neighbors is None:
+        INFERENCE_REQUESTS.inc()
+        with track_request(f"user_id={user_id}"):
+            try:
+                infer_cached(user_id)
+            except Exception as exc:
+                raise _inference_failed(user_id, exc)
+        neighbors = learner_index.search(version, user_id, k)
+        if neighbors is None:
+            raise HTTPException(status_code=404, detail=f"No feature vector for user {user_id}")
+
+    latency = time.perf_counter() - start_time
+    SIMILAR_LEARNERS_LATENCY.observe(latency)
+    SIMILAR_LEARNERS_INDEXED.set(len(learner_index))
+    logger.info("similar-learners success user_id=%s k=%d latency=%.4fs", user_id, k, latency)
+    return {
+        "user_id": user_id,
+        "model_version": version.name,
+        "n_probe": SIMILAR_N_PROBE,
+        "neighbors": neighbors,
+    }
+
+
+def _check_admin_token(token: Optional[str]) -> None:
+    if MODEL_ADMIN_TOKEN and token != MODEL_ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+def _registry_call(fn, *args):
+    try:
+        fn(*args)
+    except KeyError as exc:
+        raise HTTPException(status_code=404, detail=str(exc.args[0]))
+    except Exception as exc:
+        logger.exception("model registry update failed error=%s", exc)
         raise HTTPException(status_code=400, detail=str(exc))
+    return model_registry.describe()
+
+
+@app.get("/admin/models")
+def list_models(x_admin_token: Optional[str] = Header(None)):
+    """Active and shadow model versions plus every version in the manifest."""
+    _check_admin_token(x_admin_token)
+    return model_registry.describe()
+
+
+@app.post("/admin/models/activate")
+def activate_model(request: ModelVersionRequest, x_admin_token: Optional[str] = Header(None)):
+    """
+    Swap the active model version without a restart.
+    In-flight requests finish on the version they started with.
+    """
+    _check_admin_token(x_admin_token)
+    if not request.version:
+        raise HTTPException(status_code=400, detail="version is required")
+    return _registry_call(model_registry.activate, request.version)
+
+
+@app.post("/admin/models/shadow")
+def shadow_model(request: ModelVersionRequest, x_admin_token: Optional[str] = Header(None)):
+    """Shadow-score a candidate version next to the active one; send no version to stop."""
+    _check_admin_token(x_admin_token)
+    return _registry_call(model_registry.set_shadow, request.version)
+
+
+@app.post("/admin/models/reload")
+def reload_models(x_admin_token: Optional[str] = Header(None)):
+    """Re-read the registry manifest and apply its active/shadow versions."""
+    _check_admin_token(x_admin_token)
+    return _registry_call(model_registry.reload)
 
 
 @app.get("/metrics")
 def metrics():
-    """Expose Prometheus metrics."""
-    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+    """
+    Expose Prometheus metrics.
+    Under serve.py with several workers, metrics are summed across all of them.
+    """
+    registry = REGISTRY
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,61 @@
+"""
+Parity check between a feature engine and the pandas reference (Prepare).
+
+Usage:
+    python parity.py <user_id> [<user_id> ...] [--engine mongo] [--tol 1e-9]
+
+Exits with status 1 when any user's features differ by more than `tol`.
+"""
+import argparse
+import sys
+
+from feature_engines import get_engine
+from prepare_data import Prepare
+
+
+def reference_features(user_id):
+    """Features from the pandas path, or the error it raises."""
+    try:
+        return Prepare(user_id).prepare_features().iloc[0].to_dict(), None
+    except Exception as exc:
+        return None, str(exc)
+
+
+def check_parity(user_ids, engine: str, tol: float = 1e-9):
+    """Compare `engine` batch output against Prepare for every user."""
+    _, batch_cls = get_engine(engine)
+    features, errors = batch_cls(user_ids).prepare_features()
+
+    mismatches = []
+    for user_id in dict.fromkeys(user_ids):
+        expected, expected_error = reference_features(user_id)
+        if expected is None:
+            if user_id not in errors:
+                mismatches.append((user_id, "error", expected_error, "no error"))
+            continue
+        if user_id in errors:
+            mismatches.append((user_id, "error", "no error", errors[user_id]))
+            continue
+        actual = features.loc[user_id]
+        for col, value in expected.items():
+            if abs(float(actual[col]) - float(value)) > tol:
+                mismatches.append((user_id, col, value, float(actual[col])))
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("user_ids", nargs="+")
+    parser.add_argument("--engine", default="mongo")
+    parser.add_argument("--tol", type=float, default=1e-9)
+    args = parser.parse_args()
+
+    mismatches = check_parity(args.user_ids, args.engine, args.tol)
+    for user_id, col, expected, actual in mismatches:
+        print(f"[mismatch] user={user_id} {col}: pandas={expected} {args.engine}={actual}")
+    print(f"[{'fail' if mismatches else 'ok'}] {len(args.user_ids)} users, {len(mismatches)} mismatches")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
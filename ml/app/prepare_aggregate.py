@@ -0,0 +1,188 @@
+import pandas as pd
+
+import prepare_data
+from feature_window import activity_query, last_modules_stages, quiz_result_query
+from instrumentation import aggregate_documents
+from prepare_data import FEATURES_FINAL
+
+# a quiz result with a non-null moduleId: the ones Prepare.prepare_quiz looks
+# quizzes up for
+HAS_MODULE = {"$ne": [{"$ifNull": ["$moduleId", None]}, None]}
+# a quiz result with a moduleId field, null or not: Prepare.prepare_quiz
+# rejects users with such results when none of them joins a quiz
+HAS_MODULE_FIELD = {"$in": ["moduleId", {"$map": {"input": {"$objectToArray": "$$ROOT"}, "in": "$$this.k"}}]}
+
+
+class AggregateBatchPrepare:
+    """
+    Server-side counterpart of BatchPrepare.
+    The five features are computed inside MongoDB `$group`/`$lookup`
+    pipelines, so only one small document per user comes back over the wire
+    instead of the user's whole activity and quiz history.
+    """
+
+    def __init__(self, user_ids):
+        # de-duplicate while keeping request order
+        self.user_ids = list(dict.fromkeys(user_ids))
+        self.features_final = list(FEATURES_FINAL)
+        self.round_trips = 0
+
+    def _aggregate(self, collection: str, pipeline: list) -> list:
+        """Run an aggregation on `collection` and count it as one DB round trip."""
+        self.round_trips += 1
+        return aggregate_documents(prepare_data.get_db()[collection], pipeline)
+
+    def _user_filter(self):
+        if len(self.user_ids) == 1:
+            return self.user_ids[0]
+        return {"$in": self.user_ids}
+
+    def activity_pipeline(self) -> list:
+        """
+        Per-user avg_study_duration (hours) and consistency_ratio inputs.
+        Mirrors Prepare.prepare_activity_by_module and
+        Prepare._compute_consistency_ratio.
+        """
+        return [
+            {"$match": activity_query(self._user_filter())},
+            *last_modules_stages("user", "module", "occurredAt"),
+            {"$facet": {
+                "durations": [
+                    {"$match": {"module": {"$ne": None}, "occurredAt": {"$type": "date"}}},
+                    {"$group": {
+                        "_id": {"user": "$user", "module": "$module"},
+                        "started": {"$min": {"$cond": [
+                            {"$eq": ["$type", "module_start"]}, "$occurredAt", None,
+                        ]}},
+                        "completed": {"$min": {"$cond": [
+                            {"$eq": ["$type", "module_complete"]}, "$occurredAt", None,
+                        ]}},
+                    }},
+                    {"$match": {"started": {"$ne": None}, "completed": {"$ne": None}}},
+                    {"$project": {
+                        "user": "$_id.user",
+                        "seconds": {"$divide": [
+                            {"$subtract": ["$completed", "$started"]}, 1000,
+                        ]},
+                    }},
+                    {"$match": {"seconds": {"$gt": 0}}},
+                    {"$group": {"_id": "$user", "avg_seconds": {"$avg": "$seconds"}}},
+                ],
+                "weekdays": [
+                    {"$match": {"occurredAt": {"$type": "date"}}},
+                    {"$group": {
+                        "_id": {"user": "$user", "day": {"$dayOfWeek": "$occurredAt"}},
+                        "n": {"$sum": 1},
+                    }},
+                    {"$group": {"_id": "$_id.user", "top": {"$max": "$n"}, "total": {"$sum": "$n"}}},
+                ],
+            }},
+        ]
+
+    def quiz_pipeline(self) -> list:
+        """
+        Per-user quiz aggregates, joining quizzes to quiz results with `$lookup`.
+        Mirrors Prepare.prepare_quiz: a result matching several quizzes of the
+        same module counts once per quiz, like the pandas left merge.
+        """
+        return [
+            {"$match": quiz_result_query(self._user_filter())},
+            *last_modules_stages("userId", "moduleId", "timestamp"),
+            {"$lookup": {
+                "from": "quizzes",
+                "localField": "moduleId",
+                "foreignField": "moduleId",
+                "as": "quiz",
+            }},
+            # a null/missing moduleId joins quizzes without one; pandas only
+            # looks quizzes up for non-null module ids, so drop those matches
+            {"$addFields": {"quiz": {"$cond": [HAS_MODULE, "$quiz", []]}}},
+            {"$unwind": {"path": "$quiz", "preserveNullAndEmptyArrays": True}},
+            {"$project": {
+                "userId": 1,
+                "score": 1,
+                # booleans average as 0/1, like pandas does
+                "passed": {"$switch": {
+                    "branches": [
+                        {"case": {"$eq": ["$passed", True]}, "then": 1},
+                        {"case": {"$eq": ["$passed", False]}, "then": 0},
+                    ],
+                    "default": "$passed",
+                }},
+                "has_module": {"$cond": [HAS_MODULE_FIELD, 1, 0]},
+                "matched": {"$cond": [{"$ifNull": ["$quiz._id", False]}, 1, 0]},
+                "utilization": {"$cond": [
+                    {"$and": [
+                        {"$isNumber": "$duration"},
+                        {"$isNumber": "$quiz.maximumDuration"},
+                        {"$ne": ["$quiz.maximumDuration", 0]},
+                    ]},
+                    {"$max": [0, {"$multiply": [
+                        {"$divide": ["$duration", "$quiz.maximumDuration"]}, 100,
+                    ]}]},
+                    None,
+                ]},
+            }},
+            {"$group": {
+                "_id": "$userId",
+                "avg_time_utilization": {"$avg": "$utilization"},
+                "average_score": {"$avg": "$score"},
+                "pass_rate": {"$avg": "$passed"},
+                "has_module": {"$max": "$has_module"},
+                "matched": {"$max": "$matched"},
+            }},
+        ]
+
+    def prepare_features(self):
+        """
+        Aggregate features for every requested user.
+        Same contract as BatchPrepare.prepare_features: returns (features, errors).
+        """
+        features = pd.DataFrame(
+            0.0,
+            index=pd.Index(self.user_ids, name="userId"),
+            columns=self.features_final,
+        )
+        errors = {}
+
+        activity = self._aggregate("activities", self.activity_pipeline())
+        facets = activity[0] if activity else {}
+        for doc in facets.get("durations", []):
+            if doc["_id"] in features.index and doc["avg_seconds"] is not None:
+                features.loc[doc["_id"], "avg_study_duration"] = doc["avg_seconds"] / 60 / 60
+        for doc in facets.get("weekdays", []):
+            if doc["_id"] in features.index and doc["total"]:
+                features.loc[doc["_id"], "consistency_ratio"] = doc["top"] / doc["total"]
+
+        for doc in self._aggregate("quizresults", self.quiz_pipeline()):
+            user_id = doc["_id"]
+            if user_id not in features.index:
+                continue
+            if doc["has_module"] and not doc["matched"]:
+                errors[user_id] = "Quiz dataframe is empty"
+                continue
+            for col in ("avg_time_utilization", "average_score", "pass_rate"):
+                if doc.get(col) is not None:
+                    features.loc[user_id, col] = float(doc[col])
+
+        return features.drop(index=list(errors)), errors
+
+
+class AggregatePrepare:
+    """Single-user server-side feature mode with the Prepare interface."""
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.batch = AggregateBatchPrepare([user_id])
+        self.features_final = list(FEATURES_FINAL)
+
+    @property
+    def round_trips(self) -> int:
+        return self.batch.round_trips
+
+    def prepare_features(self) -> pd.DataFrame:
+        """Returns a single-row DataFrame with the features_final columns."""
+        features, errors = self.batch.prepare_features()
+        if self.user_id in errors:
+            raise ValueError(errors[self.user_id])
+        return features.reset_index(drop=True)[self.features_final]
@@ -3,13 +3,76 @@ from pymongo import MongoClient
 from dotenv import load_dotenv
 import os
 from bson import ObjectId
+
+from feature_window import FEATURE_WINDOW_MODULES, activity_query, quiz_result_query, window_start, windowed_pipeline
+from instrumentation import aggregate_documents, find_documents, stage
 # load from parent directory
 load_dotenv()
 MONGO_URI = os.getenv("MONGO_URI")
 MONGO_DB = os.getenv("MONGO_DB", "insightify")
-client = MongoClient(MONGO_URI)
-db = client[MONGO_DB]
+# per process; matches the 40 threads FastAPI runs sync endpoints on, so
+# several workers on one host stay within the server's connection budget
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "40"))
+
+# created on first use (or in the service lifespan) rather than at import, so
+# importing this module never blocks on DNS/SRV resolution
+_client = None
+
+
+def get_client() -> MongoClient:
+    global _client
+    if _client is None:
+        _client = MongoClient(MONGO_URI, maxPoolSize=MONGO_MAX_POOL_SIZE)
+    return _client
+
 
+def get_db():
+    return get_client()[MONGO_DB]
+
+
+def close_client() -> None:
+    global _client
+    if _client is not None:
+        _client.close()
+        _client = None
+
+# Keep the features list aligned with the clustering notebook
+FEATURES_FINAL = [
+    "avg_study_duration",
+    "avg_time_utilization",
+    "average_score",
+    "consistency_ratio",
+    "pass_rate",
+]
+
+
+def normalize_activity(df: pd.DataFrame) -> pd.DataFrame:
+    """Rename raw activity fields and keep only module start/complete rows."""
+    if df.empty:
+        return df
+
+    df = df.rename(columns={
+        "user": "userId",
+        "module": "moduleId",
+        "occurredAt": "timestamp",
+        "type": "status",
+    })
+
+    df["status"] = df["status"].map({
+        "module_start": "started",
+        "module_complete": "completed",
+    })
+
+    df = df[df["status"].notna()]
+    return df
+
+
+def quiz_result_freshness_pipeline(user_id) -> list:
+    """A user's quiz-result count and newest createdAt, read from the (userId, createdAt) index."""
+    return [
+        {"$match": {"userId": user_id}},
+        {"$group": {"_id": None, "count": {"$sum": 1}, "createdAt": {"$max": "$createdAt"}}},
+    ]
 
 
 class FetchData:
@@ -17,67 +80,127 @@ class FetchData:
         self.user_id = user_id
         # ensure user_id is ObjectId
         # self.user_id = ObjectId(self.user_id)
+        # number of Mongo queries issued through this fetcher
+        self.round_trips = 0
+
+    def _find(self, collection: str, query: dict, projection: dict = None) -> list:
+        """Run a find on `collection` and count it as one DB round trip."""
+        self.round_trips += 1
+        return find_documents(get_db()[collection], query, projection)
+
+    def _find_windowed(self, collection: str, query: dict, projection: dict,
+                       user_field: str, module_field: str, time_field: str) -> list:
+        """_find, restricted to the last FEATURE_WINDOW_MODULES modules when that window is set."""
+        if FEATURE_WINDOW_MODULES <= 0:
+            return self._find(collection, query, projection)
+        self.round_trips += 1
+        pipeline = windowed_pipeline(query, projection, user_field, module_field, time_field)
+        return aggregate_documents(get_db()[collection], pipeline, stage_name=f"fetch.{collection}")
+
+    def _user_filter(self):
+        return self.user_id
+
+    def activity_documents(self) -> list:
+        """Module start/complete activities inside the feature window (feature_window.py)."""
+        return self._find_windowed(
+            "activities",
+            activity_query(self._user_filter()),
+            {"user": 1, "module": 1, "type": 1, "occurredAt": 1},
+            "user", "module", "occurredAt",
+        )
+
+    def quiz_result_documents(self) -> list:
+        """Quiz results inside the feature window."""
+        return self._find_windowed(
+            "quizresults",
+            quiz_result_query(self._user_filter()),
+            {"userId": 1, "moduleId": 1, "score": 1, "passed": 1, "duration": 1},
+            "userId", "moduleId", "timestamp",
+        )
+
+    def fetch_freshness_token(self) -> tuple:
+        """
+        Cheap marker of the user's latest data: newest activity occurredAt,
+        the user's quiz-result count and newest createdAt, plus the start of
+        the day window. Changes whenever new history arrives or the window
+        moves; ObjectIds from different writers are not ordered, so the
+        newest _id would miss results inserted out of order.
+        """
+        self.round_trips += 2
+        activity = find_documents(
+            get_db().activities,
+            {"user": self.user_id},
+            {"occurredAt": 1},
+            sort=[("occurredAt", -1)],
+            limit=1,
+            stage_name="fetch.freshness",
+        )
+        quiz_results = aggregate_documents(
+            get_db().quizresults,
+            quiz_result_freshness_pipeline(self.user_id),
+            stage_name="fetch.freshness",
+        )
+        activity = activity[0] if activity else None
+        quiz_results = quiz_results[0] if quiz_results else {}
+        return (
+            activity.get("occurredAt") if activity else None,
+            quiz_results.get("count", 0),
+            quiz_results.get("createdAt"),
+            window_start(),
+        )
+
     def fetch_activity(self) -> pd.DataFrame:
         """Raw activity rows for the user (all fields)."""
-        activity = list(db.activities.find({"user": self.user_id}))
+        activity = self._find("activities", {"user": self.user_id})
         return pd.DataFrame(activity)
 
     def fetch_activity_minimal(self) -> pd.DataFrame:
         """Activity rows with only fields needed for timelines."""
-        activity = list(
-            db.activities.find(
-                {"user": self.user_id},
-                {"user": 1, "module": 1, "type": 1, "occurredAt": 1},
-            )
-        )
-        df = pd.DataFrame(activity)
-        print(df)
+        df = pd.DataFrame(self.activity_documents())
 
-        if df.empty:
-            return df
-
-        df = df.rename(columns={
-            "user": "userId",
-            "module": "moduleId",
-            "occurredAt": "timestamp",
-            "type": "status",
-        })
-
-        df["status"] = df["status"].map({
-            "module_start": "started",
-            "module_complete": "completed",
-        })
-
-        df = df[df["status"].notna()]
-        return df
+        return normalize_activity(df)
 
     def fetch_quiz_results(self) -> pd.DataFrame:
-        quiz_result = list(db.quizresults.find(
-            {"userId": self.user_id}, 
-            {"userId": 1, "moduleId": 1, "score": 1, "passed": 1, "duration": 1}
-        ))
-        return pd.DataFrame(quiz_result)
+        return pd.DataFrame(self.quiz_result_documents())
 
     def fetch_quizzes(self, module_ids) -> pd.DataFrame:
         if not module_ids:
             return pd.DataFrame()
-        quiz = list(db.quizzes.find(
+        quiz = self._find(
+            "quizzes",
             {"moduleId": {"$in": module_ids}},
             {"_id": 1, "moduleId": 1, "maximumDuration": 1}
-        ))
+        )
         return pd.DataFrame(quiz)
 
 class Prepare:
     def __init__(self, user_id):
         self.fetch = FetchData(user_id)
-        # Keep the features list aligned with the clustering notebook
-        self.features_final = [
-            "avg_study_duration",
-            "avg_time_utilization",
-            "average_score",
-            "consistency_ratio",
-            "pass_rate",
-        ]
+        self.features_final = list(FEATURES_FINAL)
+        # each source collection is read once and reused by every feature
+        self._activity = None
+        self._quiz_results = None
+
+    @property
+    def round_trips(self) -> int:
+        """DB round trips made so far while preparing this user's features."""
+        return self.fetch.round_trips
+
+    def activity_minimal(self) -> pd.DataFrame:
+        """Cached FetchData.fetch_activity_minimal with a parsed `ts` column."""
+        if self._activity is None:
+            df_act = self.fetch.fetch_activity_minimal()
+            if not df_act.empty:
+                df_act = df_act.copy()
+                df_act["ts"] = self._safe_to_datetime(df_act["timestamp"])
+            self._activity = df_act
+        return self._activity
+
+    def quiz_results(self) -> pd.DataFrame:
+        """Cached FetchData.fetch_quiz_results."""
+        if self._quiz_results is None:
+            self._quiz_results = self.fetch.fetch_quiz_results()
+        return self._quiz_results
 
     @staticmethod
     def _safe_to_datetime(series: pd.Series) -> pd.Series:
@@ -95,12 +218,11 @@ class Prepare:
         started_at: earliest 'started' timestamp
         completed_at: earliest 'completed' timestamp
         """
-        df_act = self.fetch.fetch_activity_minimal()
+        df_act = self.activity_minimal()
         # print(df_act.columns)
         if df_act.empty:
             return df_act
 
-        df_act["ts"] = self._safe_to_datetime(df_act["timestamp"])
         pivoted = (
             df_act.pivot_table(
                 index=["moduleId"],
@@ -111,6 +233,10 @@ class Prepare:
             .reset_index()
             .rename(columns={"started": "started_at", "completed": "completed_at"})
         )
+        # users without any start/complete event of a kind still get both columns
+        for col in ("started_at", "completed_at"):
+            if col not in pivoted.columns:
+                pivoted[col] = pd.NaT
         # ensure only completed column is not null
         pivoted = pivoted[pivoted["completed_at"].notna()]
 
@@ -121,7 +247,7 @@ class Prepare:
         Merge quiz results with quiz metadata and activity timelines.
         Returns one row per quiz result with started_at/completed_at.
         """
-        quiz_results = self.fetch.fetch_quiz_results()
+        quiz_results = self.quiz_results()
         # print(quiz_results.columns)
         if quiz_results.empty:
             return pd.DataFrame()
@@ -132,7 +258,7 @@ class Prepare:
         quiz_results = quiz_results.copy()
         # quiz_results["moduleId_str"] = quiz_results["moduleId"].astype(str)
 
-        module_ids = quiz_results["moduleId"].dropna().tolist()
+        module_ids = quiz_results["moduleId"].dropna().unique().tolist()
 
         quiz_df = self.fetch.fetch_quizzes(module_ids)     
         # print(quiz_df.columns)
@@ -146,11 +272,14 @@ class Prepare:
         # quiz_df = quiz_df.rename(columns={"_id": "quizId"})
 
         merged = quiz_results.merge(quiz_df, on="moduleId", how="left")
-        print("Merge raw: ", merged.columns)
-        
-        
 
-        # Compute exam time utilization percentage (duration vs allowed time)
+        self._add_time_utilization(merged)
+
+        return merged
+
+    @staticmethod
+    def _add_time_utilization(merged: pd.DataFrame) -> None:
+        """Compute exam time utilization percentage (duration vs allowed time)."""
         if "duration" in merged.columns and "maximumDuration" in merged.columns:
             max_dur = merged["maximumDuration"].replace({0: pd.NA})
             merged["time_utilization_pct"] = (merged["duration"] / max_dur) * 100
@@ -158,20 +287,16 @@ class Prepare:
                 lower=0
             )
 
-        # DEBUG
-        print("merged columns:", merged.columns.tolist())
-        print("merged head:", merged.head(1).to_dict(orient="records"))
-
-        return merged
-
     @staticmethod
     def _compute_consistency_ratio(df_act: pd.DataFrame) -> float:
         """Ratio of most-common active day to total active days."""
         if df_act.empty:
             return 0.0
-        df = df_act.copy()
-        df["ts"] = Prepare._safe_to_datetime(df["timestamp"])
-        counts = df["ts"].dt.day_name().value_counts()
+        if "ts" in df_act.columns:
+            ts = df_act["ts"]
+        else:
+            ts = Prepare._safe_to_datetime(df_act["timestamp"])
+        counts = ts.dt.day_name().value_counts()
         total = counts.sum()
         return float(counts.max() / total) if total else 0.0
 
@@ -197,35 +322,40 @@ class Prepare:
         Aggregate user-level features aligned with features_final in the notebook.
         Returns a single-row DataFrame with the expected columns.
         """
-        activity_min = self.fetch.fetch_activity_minimal()
-        activity_by_module = self.prepare_activity_by_module()
-        quiz_df = self.prepare_quiz()
-
-        avg_study_duration = self._compute_avg_study_duration(activity_by_module) / 60
-        avg_time_utilization = self._nan_to_zero(
-            quiz_df["time_utilization_pct"].dropna().mean()
-            if not quiz_df.empty and "time_utilization_pct" in quiz_df.columns
-            else 0.0
-        )
-        average_score = self._nan_to_zero(
-            quiz_df["score"].dropna().mean()
-            if not quiz_df.empty and "score" in quiz_df.columns
-            else 0.0
-        )
-        pass_rate = self._nan_to_zero(
-            quiz_df["passed"].dropna().mean()
-            if not quiz_df.empty and "passed" in quiz_df.columns
-            else 0.0
-        )
-        consistency_ratio = self._compute_consistency_ratio(activity_min)
+        with stage("prepare.load_frames"):
+            activity_min = self.activity_minimal()
+            self.quiz_results()
+        with stage("prepare.activity_by_module"):
+            activity_by_module = self.prepare_activity_by_module()
+        with stage("prepare.quiz"):
+            quiz_df = self.prepare_quiz()
+
+        with stage("prepare.aggregate"):
+            avg_study_duration = self._compute_avg_study_duration(activity_by_module) / 60
+            avg_time_utilization = self._nan_to_zero(
+                quiz_df["time_utilization_pct"].dropna().mean()
+                if not quiz_df.empty and "time_utilization_pct" in quiz_df.columns
+                else 0.0
+            )
+            average_score = self._nan_to_zero(
+                quiz_df["score"].dropna().mean()
+                if not quiz_df.empty and "score" in quiz_df.columns
+                else 0.0
+            )
+            pass_rate = self._nan_to_zero(
+                quiz_df["passed"].dropna().mean()
+                if not quiz_df.empty and "passed" in quiz_df.columns
+                else 0.0
+            )
+            consistency_ratio = self._compute_consistency_ratio(activity_min)
 
-        data = {
-            "avg_study_duration": avg_study_duration,
-            "avg_time_utilization": avg_time_utilization,
-            "average_score": average_score,
-            "consistency_ratio": consistency_ratio,
-            "pass_rate": pass_rate,
-        }
+            data = {
+                "avg_study_duration": avg_study_duration,
+                "avg_time_utilization": avg_time_utilization,
+                "average_score": average_score,
+                "consistency_ratio": consistency_ratio,
+                "pass_rate": pass_rate,
+            }
 
         # Ensure order/availability of expected columns
         df_features = pd.DataFrame([data])
@@ -235,6 +365,144 @@ class Prepare:
         return df_features[self.features_final]
 
 
+class BatchFetchData(FetchData):
+    """FetchData counterpart that reads many users with a few `$in` queries."""
+
+    def __init__(self, user_ids):
+        self.user_ids = list(user_ids)
+        self.round_trips = 0
+
+    def _user_filter(self):
+        return {"$in": self.user_ids}
+
+    def fetch_quiz_results(self) -> pd.DataFrame:
+        """
+        Quiz results of every user, plus a `has_module_field` column telling
+        whether the document has a moduleId field at all (null or not). That
+        is what makes Prepare.prepare_quiz look quizzes up for a user, and the
+        combined frame cannot tell a null moduleId from a missing one.
+        """
+        docs = self.quiz_result_documents()
+        df = pd.DataFrame(docs)
+        if "moduleId" in df.columns:
+            df["has_module_field"] = ["moduleId" in doc for doc in docs]
+        return df
+
+
+class BatchPrepare:
+    """
+    Vectorized Prepare over many users at once.
+    Produces the same per-user features as Prepare.prepare_features, but from
+    one set of `$in` queries and groupby aggregations instead of one pipeline
+    per user.
+    """
+
+    def __init__(self, user_ids):
+        # de-duplicate while keeping request order
+        self.user_ids = list(dict.fromkeys(user_ids))
+        self.fetch = BatchFetchData(self.user_ids)
+        self.features_final = list(FEATURES_FINAL)
+
+    @property
+    def round_trips(self) -> int:
+        """DB round trips made so far for the whole batch."""
+        return self.fetch.round_trips
+
+    @staticmethod
+    def _avg_study_duration(df_act: pd.DataFrame) -> pd.Series:
+        """Average hours spent per completed module, per user."""
+        by_module = df_act.pivot_table(
+            index=["userId", "moduleId"],
+            columns="status",
+            values="ts",
+            aggfunc="min",
+        )
+        if "started" not in by_module.columns or "completed" not in by_module.columns:
+            return pd.Series(dtype=float)
+        seconds = (by_module["completed"] - by_module["started"]).dt.total_seconds()
+        seconds = seconds[seconds > 0]
+        return seconds.groupby(level="userId").mean() / 60 / 60
+
+    @staticmethod
+    def _consistency_ratio(df_act: pd.DataFrame) -> pd.Series:
+        """Ratio of most-common active day to total active days, per user."""
+        df = df_act.dropna(subset=["ts"])
+        counts = df.groupby(["userId", df["ts"].dt.day_name()]).size()
+        by_user = counts.groupby(level="userId")
+        return by_user.max() / by_user.sum()
+
+    def _quiz_features(self, quiz_results: pd.DataFrame):
+        """
+        Per-user quiz aggregates plus the users that Prepare.prepare_quiz
+        would reject because none of their modules has a quiz.
+        """
+        merged = quiz_results
+        failed = []
+        if "moduleId" in quiz_results.columns:
+            module_ids = quiz_results["moduleId"].dropna().unique().tolist()
+            quiz_df = self.fetch.fetch_quizzes(module_ids)
+            if quiz_df.empty:
+                quiz_df = pd.DataFrame(columns=["_id", "moduleId", "maximumDuration"])
+
+            merged = quiz_results.merge(
+                quiz_df, on="moduleId", how="left", indicator=True
+            )
+            # like Prepare, a moduleId field counts even when it is null; frames
+            # without the marker (snapshots) have the field on every row
+            if "has_module_field" in quiz_results.columns:
+                has_module = quiz_results["has_module_field"].groupby(quiz_results["userId"]).any()
+            else:
+                has_module = pd.Series(True, index=quiz_results["userId"].unique())
+            has_quiz = (merged["_merge"] == "both").groupby(merged["userId"]).any()
+            failed = has_module[has_module & ~has_quiz.reindex(has_module.index, fill_value=False)]
+            failed = failed.index.tolist()
+            Prepare._add_time_utilization(merged)
+
+        aggregated = pd.DataFrame(index=merged["userId"].unique())
+        for feature, column in (
+            ("avg_time_utilization", "time_utilization_pct"),
+            ("average_score", "score"),
+            ("pass_rate", "passed"),
+        ):
+            if column in merged.columns:
+                values = pd.to_numeric(merged[column], errors="coerce")
+                aggregated[feature] = values.groupby(merged["userId"]).mean()
+        return aggregated, failed
+
+    def prepare_features(self):
+        """
+        Aggregate features for every requested user.
+        Returns (features, errors): a DataFrame indexed by user id with the
+        features_final columns, and a {user_id: message} dict for users whose
+        data Prepare would reject.
+        """
+        features = pd.DataFrame(
+            0.0,
+            index=pd.Index(self.user_ids, name="userId"),
+            columns=self.features_final,
+        )
+        errors = {}
+
+        df_act = self.fetch.fetch_activity_minimal()
+        if not df_act.empty:
+            with stage("prepare.batch_activity"):
+                df_act = df_act.copy()
+                df_act["ts"] = Prepare._safe_to_datetime(df_act["timestamp"])
+                features["avg_study_duration"] = self._avg_study_duration(df_act)
+                features["consistency_ratio"] = self._consistency_ratio(df_act)
+
+        quiz_results = self.fetch.fetch_quiz_results()
+        if not quiz_results.empty:
+            with stage("prepare.batch_quiz"):
+                aggregated, failed = self._quiz_features(quiz_results)
+            for col in aggregated.columns:
+                features[col] = aggregated[col]
+            for user_id in failed:
+                errors[user_id] = "Quiz dataframe is empty"
+
+        features = features.astype(float).fillna(0.0)
+        return features.drop(index=list(errors)), errors
+
 
 if __name__ == "__main__":
     # # target Feature
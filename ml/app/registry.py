@@ -0,0 +1,224 @@
+"""
+Versioned model registry.
+
+Named model+scaler versions are listed in a JSON manifest (MODEL_REGISTRY_MANIFEST,
+default ml/models/registry.json):
+
+    {
+      "active": "kmeans_model_37_3n_2",
+      "shadow": null,
+      "versions": {
+        "kmeans_model_37_3n_2": {
+          "model": "kmeans_model_37_3n_2.pkl",
+          "scaler": "kmeans_scaler_1.pkl",
+          "params": "kmeans_model_37_3n_2.npz"
+        },
+        ...
+      }
+    }
+
+When a version lists `params` (exported with `python centroids.py export`)
+and the file exists, its arrays are loaded from there without importing
+joblib/sklearn, provided the digest recorded at export matches the current
+pickles (or the pickles are not deployed). Otherwise, including exports that
+predate the digest, the pickles are loaded and parity-checked. The
+training-time drift baseline (drift.py) is read from the version's `baseline`
+file, default <version>.baseline.json, when it exists.
+
+Versions are loaded (and parity-checked) before they are published, then the
+active/shadow references are swapped in one assignment, so requests already
+scoring keep the version they started with and no request sees a half-loaded
+model. The manifest can be re-read on demand or polled for changes every
+MODEL_REGISTRY_WATCH_SECONDS (0 disables the watcher).
+"""
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+from centroids import KMEANS_ARTIFACTS, MODELS_DIR, CentroidModel, check_parity, source_digest
+from prepare_data import FEATURES_FINAL
+
+MODEL_REGISTRY_MANIFEST = Path(os.getenv("MODEL_REGISTRY_MANIFEST", MODELS_DIR / "registry.json"))
+MODEL_REGISTRY_WATCH_SECONDS = float(os.getenv("MODEL_REGISTRY_WATCH_SECONDS", "0"))
+DEFAULT_VERSION = "kmeans_model_37_3n_2"
+
+logger = logging.getLogger("uvicorn.error")
+
+
+def default_manifest() -> dict:
+    """Manifest used when no registry file exists: every known KMeans pair."""
+    return {
+        "active": DEFAULT_VERSION,
+        "shadow": None,
+        "versions": {
+            Path(model_name).stem: {
+                "model": model_name,
+                "scaler": scaler_name,
+                "params": f"{Path(model_name).stem}.npz",
+            }
+            for model_name, scaler_name in KMEANS_ARTIFACTS.items()
+        },
+    }
+
+
+def load_baseline(path: Path) -> Optional[dict]:
+    """A drift baseline written by `python drift.py baseline`, or None."""
+    return json.loads(path.read_text()) if path.exists() else None
+
+
+class ModelVersion:
+    """One loaded model+scaler pair, folded into a CentroidModel."""
+
+    def __init__(self, name: str, centroids: CentroidModel, source: str, baseline: Optional[dict] = None):
+        self.name = name
+        self.centroids = centroids
+        self.source = source
+        self.feature_names = centroids.feature_names or list(FEATURES_FINAL)
+        self.n_clusters = centroids.centers.shape[0]
+        # training-time distributions for drift monitoring, if exported
+        self.baseline = baseline
+        self.loaded_at = time.time()
+
+    @classmethod
+    def from_spec(cls, name: str, spec: dict, models_dir: Path) -> "ModelVersion":
+        baseline = load_baseline(models_dir / spec.get("baseline", f"{name}.baseline.json"))
+        params = spec.get("params")
+        if params and (models_dir / params).exists():
+            centroids = CentroidModel.load(models_dir / params)
+            pickles = [models_dir / spec["model"], models_dir / spec["scaler"]]
+            if not all(path.exists() for path in pickles) or centroids.source_digest == source_digest(*pickles):
+                return cls(name, centroids, params, baseline)
+            logger.warning(
+                "model %s: %s was not exported from the current %s/%s, loading the pickles; "
+                "re-run `python centroids.py export`",
+                name, params, spec["model"], spec["scaler"],
+            )
+
+        import joblib
+
+        model = joblib.load(models_dir / spec["model"])
+        scaler = joblib.load(models_dir / spec["scaler"])
+        centroids = CentroidModel.from_sklearn(model, scaler)
+        check_parity(centroids, model, scaler)
+        return cls(name, centroids, f"{spec['model']}+{spec['scaler']}", baseline)
+
+    def describe(self) -> dict:
+        return {
+            "name": self.name,
+            "source": self.source,
+            "n_clusters": self.n_clusters,
+            "drift_baseline": self.baseline is not None,
+            "loaded_at": self.loaded_at,
+        }
+
+
+class ModelRegistry:
+    def __init__(self, manifest_path: Path = MODEL_REGISTRY_MANIFEST, expected_clusters: Optional[int] = None):
+        self.manifest_path = Path(manifest_path)
+        self.models_dir = self.manifest_path.parent
+        self.expected_clusters = expected_clusters
+        self.versions = {}
+        self._loaded = {}
+        self._lock = threading.Lock()
+        self._manifest_mtime = None
+        self._watch_stop = None
+        self.active: Optional[ModelVersion] = None
+        self.shadow: Optional[ModelVersion] = None
+        self.reload()
+
+    def _read_manifest(self) -> dict:
+        if not self.manifest_path.exists():
+            self._manifest_mtime = None
+            return default_manifest()
+        mtime = self.manifest_path.stat().st_mtime
+        manifest = json.loads(self.manifest_path.read_text())
+        self._manifest_mtime = mtime
+        return manifest
+
+    def load(self, name: str) -> ModelVersion:
+        """Loaded version `name`; raises KeyError for names not in the manifest."""
+        if name not in self.versions:
+            raise KeyError(f"Unknown model version: {name}")
+        version = self._loaded.get(name)
+        if version is not None:
+            return version
+
+        spec = self.versions[name]
+        version = ModelVersion.from_spec(name, spec, self.models_dir)
+        if self.expected_clusters is not None and version.n_clusters != self.expected_clusters:
+            raise ValueError(
+                f"Model version {name} has {version.n_clusters} clusters, expected {self.expected_clusters}"
+            )
+        self._loaded[name] = version
+        return version
+
+    def activate(self, name: str) -> ModelVersion:
+        """Load `name` and make it the active version."""
+        with self._lock:
+            version = self.load(name)
+            previous, self.active = self.active, version
+        if previous is None or previous.name != name:
+            logger.info("model registry: active version %s", name)
+        return version
+
+    def set_shadow(self, name: Optional[str]) -> Optional[ModelVersion]:
+        """Load `name` and shadow-score it next to the active version; None disables shadowing."""
+        with self._lock:
+            self.shadow = self.load(name) if name else None
+        logger.info("model registry: shadow version %s", name)
+        return self.shadow
+
+    def reload(self) -> None:
+        """
+        Re-read the manifest and apply its active/shadow versions.
+        Versions whose spec changed are reloaded; if loading fails the
+        previously active version keeps serving.
+        """
+        manifest = self._read_manifest()
+        with self._lock:
+            previous_versions = self.versions
+            self.versions = manifest["versions"]
+            # drop cached versions whose spec changed or disappeared
+            for name in list(self._loaded):
+                if previous_versions.get(name) != self.versions.get(name):
+                    del self._loaded[name]
+        self.activate(manifest["active"])
+        self.set_shadow(manifest.get("shadow"))
+
+    def describe(self) -> dict:
+        return {
+            "active": self.active.describe() if self.active else None,
+            "shadow": self.shadow.describe() if self.shadow else None,
+            "versions": sorted(self.versions),
+        }
+
+    def _watch(self, interval: float, stop: threading.Event) -> None:
+        while not stop.wait(interval):
+            try:
+                mtime = self.manifest_path.stat().st_mtime if self.manifest_path.exists() else None
+                if mtime != self._manifest_mtime:
+                    logger.info("model registry: %s changed, reloading", self.manifest_path)
+                    self.reload()
+            except Exception as exc:
+                logger.warning("model registry reload failed: %s", exc)
+
+    def start_watch(self, interval: float = MODEL_REGISTRY_WATCH_SECONDS) -> None:
+        """Poll the manifest every `interval` seconds and reload on change."""
+        if interval <= 0 or self._watch_stop is not None:
+            return
+        self._watch_stop = threading.Event()
+        threading.Thread(
+            target=self._watch,
+            args=(interval, self._watch_stop),
+            name="model-registry-watch",
+            daemon=True,
+        ).start()
+
+    def stop_watch(self) -> None:
+        if self._watch_stop is not None:
+            self._watch_stop.set()
+            self._watch_stop = None
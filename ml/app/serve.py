@@ -0,0 +1,109 @@
+"""
+Multi-process server for the ML service.
+
+The app (pandas, FastAPI, the active model arrays) is imported once in this
+parent process, then WEB_CONCURRENCY workers are forked and serve on one
+shared listening socket. Workers share the preloaded memory copy-on-write;
+gc.freeze() keeps the collector from touching (and so copying) those pages.
+Each worker opens its own Mongo clients in the app lifespan, after the fork,
+with at most MONGO_MAX_POOL_SIZE connections.
+
+With more than one worker:
+- metrics are collected through PROMETHEUS_MULTIPROC_DIR, so /metrics on any
+  worker reports totals for all of them;
+- the model manifest is watched (MODEL_REGISTRY_WATCH_SECONDS, default 5s here)
+  because an /admin/models call only reaches the worker that serves it.
+
+Usage:
+    python serve.py --workers 4 --port 8000
+"""
+import argparse
+import gc
+import logging
+import os
+import signal
+import socket
+import tempfile
+import time
+
+logger = logging.getLogger("uvicorn.error")
+
+
+def bind_socket(host: str, port: int, backlog: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the ML app with pre-forked workers.")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", "1")))
+    parser.add_argument("--backlog", type=int, default=2048)
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+
+    if args.workers > 1:
+        # both must be set before prometheus_client and the registry are imported
+        os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", tempfile.mkdtemp(prefix="ml-metrics-"))
+        os.environ.setdefault("MODEL_REGISTRY_WATCH_SECONDS", "5")
+
+    import uvicorn
+
+    import main as app_module
+
+    config = uvicorn.Config(app_module.app, log_level=args.log_level)
+    if args.workers <= 1:
+        uvicorn.Server(config).run(sockets=[bind_socket(args.host, args.port, args.backlog)])
+        return
+
+    from prometheus_client import multiprocess
+
+    sock = bind_socket(args.host, args.port, args.backlog)
+    gc.freeze()
+
+    workers = set()
+    stopping = False
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            uvicorn.Server(config).run(sockets=[sock])
+            os._exit(0)
+        workers.add(pid)
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in workers:
+            os.kill(pid, signal.SIGTERM)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    for _ in range(args.workers):
+        spawn()
+    logger.info("serving on %s:%d with %d workers", args.host, args.port, args.workers)
+
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        workers.discard(pid)
+        multiprocess.mark_process_dead(pid)
+        if not stopping:
+            logger.warning("worker %d exited with status %d, restarting", pid, status)
+            # avoid a tight respawn loop when workers fail on startup
+            time.sleep(1)
+            spawn()
+
+
+if __name__ == "__main__":
+    main()
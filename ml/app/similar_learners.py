@@ -0,0 +1,313 @@
+"""
+In-memory nearest-neighbour index over learners' scaled feature vectors.
+
+Every user is kept in the partition of the cluster the active model assigns
+them to, as rows of contiguous NumPy arrays (raw features as float64, scaled
+features as float32) plus a parallel list of user ids. A query scales nothing:
+it looks up the user's stored vector, ranks the centroids by distance to it
+and scans only the SIMILAR_N_PROBE nearest partitions, so its cost is a
+fraction of the population instead of all of it.
+
+Rows are upserted in place whenever the service scores a user, and the whole
+index is filled at startup from SIMILAR_LEARNERS_SOURCE:
+
+    store            (default) every document in the feature store
+                     (feature_store.py), kept current by the store engine or
+                     `python feature_store.py sync`
+    <path>.parquet   features written by `python ../snapshot.py features`
+    history          every user with activities or quiz results, scored in
+                     chunks with the service's FEATURE_ENGINE; this recomputes
+                     the whole population from raw history in every worker
+                     on every start, so it is meant for small deployments
+    none             start empty and fill from inference only
+
+A source that yields no users is logged as a warning, since every query then
+has to score the user first and only finds users scored since startup.
+User ids are indexed as strings, the form requests use.
+
+The index follows the model registry: the first call with a different active
+version re-scales and re-partitions every row from the raw features. Each
+service worker keeps its own index.
+"""
+import itertools
+import logging
+import os
+import threading
+from typing import Optional
+
+import numpy as np
+
+from prepare_data import FEATURES_FINAL
+
+SIMILAR_LEARNERS_SOURCE = os.getenv("SIMILAR_LEARNERS_SOURCE", "store")
+# partitions (clusters) scanned per query; the number of clusters scans everything
+SIMILAR_N_PROBE = int(os.getenv("SIMILAR_N_PROBE", "1"))
+SIMILAR_MAX_K = int(os.getenv("SIMILAR_MAX_K", "100"))
+# rows read per chunk when filling the index at startup
+LOAD_CHUNK_SIZE = 10000
+INITIAL_CAPACITY = 1024
+
+logger = logging.getLogger("uvicorn.error")
+
+
+class _Partition:
+    """Rows of one cluster; removal moves the last row into the freed slot."""
+
+    def __init__(self, n_features: int):
+        self.ids = []
+        self.raw = np.empty((INITIAL_CAPACITY, n_features), dtype=np.float64)
+        self.scaled = np.empty((INITIAL_CAPACITY, n_features), dtype=np.float32)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def append(self, user_id, raw: np.ndarray, scaled: np.ndarray) -> int:
+        slot = len(self.ids)
+        if slot == len(self.raw):
+            self.raw = np.concatenate([self.raw, np.empty_like(self.raw)])
+            self.scaled = np.concatenate([self.scaled, np.empty_like(self.scaled)])
+        self.ids.append(user_id)
+        self.raw[slot] = raw
+        self.scaled[slot] = scaled
+        return slot
+
+    def remove(self, slot: int):
+        """Drop row `slot`; returns the id of the row moved into it, if any."""
+        last = len(self.ids) - 1
+        moved = None
+        if slot != last:
+            moved = self.ids[last]
+            self.ids[slot] = moved
+            self.raw[slot] = self.raw[last]
+            self.scaled[slot] = self.scaled[last]
+        self.ids.pop()
+        return moved
+
+    def nearest(self, query: np.ndarray, k: int):
+        """(squared distances, slots) of the k rows closest to `query`, unordered."""
+        n = len(self.ids)
+        diff = self.scaled[:n] - query
+        d2 = np.einsum("nd,nd->n", diff, diff)
+        if k < n:
+            slots = np.argpartition(d2, k)[:k]
+            return d2[slots], slots
+        return d2, np.arange(n)
+
+
+class LearnerIndex:
+    def __init__(self, version=None, n_features: int = len(FEATURES_FINAL)):
+        self.n_features = n_features
+        self.version = None
+        self._partitions = []
+        # user id -> (cluster, slot)
+        self._positions = {}
+        self._lock = threading.RLock()
+        if version is not None:
+            self._use(version)
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def __contains__(self, user_id) -> bool:
+        return user_id in self._positions
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by the vector arrays (ids excluded)."""
+        return sum(p.raw.nbytes + p.scaled.nbytes for p in self._partitions)
+
+    def _use(self, version) -> None:
+        """Switch to `version`, re-partitioning every row if it is a different model."""
+        if self.version is not None and self.version.name == version.name:
+            return
+        ids = [user_id for p in self._partitions for user_id in p.ids]
+        raw = np.concatenate([p.raw[:len(p)] for p in self._partitions]) if ids else None
+        self.version = version
+        self._partitions = [_Partition(self.n_features) for _ in range(version.n_clusters)]
+        self._positions = {}
+        if ids:
+            self._insert(ids, raw, None, None, replace=True)
+            logger.info("similar learners: re-indexed %d users for model %s", len(ids), version.name)
+
+    def _insert(self, user_ids, raw: np.ndarray, scaled, clusters, replace: bool) -> int:
+        centroids = self.version.centroids
+        if scaled is None:
+            scaled = centroids.transform(raw)
+            clusters = centroids.distances(scaled).argmin(axis=1)
+        written = 0
+        for user_id, row, row_scaled, cluster in zip(user_ids, raw, scaled, clusters):
+            cluster = int(cluster)
+            position = self._positions.get(user_id)
+            if position is not None:
+                if not replace:
+                    continue
+                old_cluster, slot = position
+                if old_cluster == cluster:
+                    partition = self._partitions[cluster]
+                    partition.raw[slot] = row
+                    partition.scaled[slot] = row_scaled
+                    written += 1
+                    continue
+                self._remove(user_id)
+            slot = self._partitions[cluster].append(user_id, row, row_scaled)
+            self._positions[user_id] = (cluster, slot)
+            written += 1
+        return written
+
+    def _remove(self, user_id) -> None:
+        cluster, slot = self._positions.pop(user_id)
+        moved = self._partitions[cluster].remove(slot)
+        if moved is not None:
+            self._positions[moved] = (cluster, slot)
+
+    def upsert_many(self, version, user_ids, features, scaled=None, clusters=None, replace: bool = True) -> int:
+        """
+        Insert or update users from raw feature rows. `scaled`/`clusters` may
+        be passed when already computed with `version`; with replace=False
+        users already in the index are left alone. Returns rows written.
+        """
+        raw = np.asarray(features, dtype=np.float64).reshape(-1, self.n_features)
+        with self._lock:
+            self._use(version)
+            return self._insert(list(user_ids), raw, scaled, clusters, replace)
+
+    def remove(self, user_id) -> None:
+        with self._lock:
+            if user_id in self._positions:
+                self._remove(user_id)
+
+    def search(self, version, user_id, k: int, n_probe: int = SIMILAR_N_PROBE) -> Optional[list]:
+        """
+        The k users nearest to `user_id` in the n_probe partitions whose
+        centroids are closest to it, nearest first, or None if the user is not
+        indexed.
+        """
+        with self._lock:
+            self._use(version)
+            position = self._positions.get(user_id)
+            if position is None:
+                return None
+            cluster, slot = position
+            query = self._partitions[cluster].scaled[slot].copy()
+            centers = self.version.centroids.centers
+            probe = np.argsort(((centers - query) ** 2).sum(axis=1))[:max(1, n_probe)]
+
+            candidates = []
+            for c in probe:
+                partition = self._partitions[c]
+                if not len(partition):
+                    continue
+                # one extra, in case the user itself is among them
+                d2, slots = partition.nearest(query, k + 1)
+                candidates.extend((float(d), partition.ids[s], int(c)) for d, s in zip(d2, slots))
+
+        candidates.sort(key=lambda candidate: candidate[0])
+        neighbors = []
+        for d2, neighbor_id, neighbor_cluster in candidates:
+            if neighbor_id == user_id:
+                continue
+            neighbors.append({
+                "user_id": neighbor_id,
+                "distance": float(np.sqrt(d2)),
+                "cluster": neighbor_cluster,
+            })
+            if len(neighbors) == k:
+                break
+        return neighbors
+
+
+def _history_user_ids():
+    """Distinct users with activities or quiz results, streamed from the user indexes."""
+    import prepare_data
+
+    db = prepare_data.get_db()
+    seen = set()
+    for collection, field in (("activities", "user"), ("quizresults", "userId")):
+        pipeline = [{"$sort": {field: 1}}, {"$group": {"_id": f"${field}"}}]
+        for doc in db[collection].aggregate(pipeline, allowDiskUse=True, batchSize=LOAD_CHUNK_SIZE):
+            if doc["_id"] is not None and doc["_id"] not in seen:
+                seen.add(doc["_id"])
+                yield doc["_id"]
+
+
+def _history_chunks(engine: str = None):
+    """(user ids, feature rows) chunks computed by the batch preparer of `engine`."""
+    from feature_engines import get_engine
+
+    _, batch_prepare_cls = get_engine(engine)
+    user_ids = _history_user_ids()
+    while True:
+        chunk = list(itertools.islice(user_ids, LOAD_CHUNK_SIZE))
+        if not chunk:
+            return
+        # users the engine rejects (no quiz for their modules) are left out
+        features, _ = batch_prepare_cls(chunk).prepare_features()
+        yield [str(user_id) for user_id in features.index], features[FEATURES_FINAL].to_numpy()
+
+
+def _store_chunks():
+    """(user ids, feature rows) chunks from the feature store collection."""
+    import prepare_data
+    from feature_store import FEATURE_STORE_COLLECTION, state_features
+
+    ids, rows = [], []
+    for state in prepare_data.get_db()[FEATURE_STORE_COLLECTION].find({}, batch_size=LOAD_CHUNK_SIZE):
+        if state.get("has_module") and not state.get("matched_quiz"):
+            # the feature engines reject these users too
+            continue
+        features = state_features(state)
+        ids.append(str(state["_id"]))
+        rows.append([features[col] for col in FEATURES_FINAL])
+        if len(ids) >= LOAD_CHUNK_SIZE:
+            yield ids, rows
+            ids, rows = [], []
+    if ids:
+        yield ids, rows
+
+
+def _parquet_chunks(path: str):
+    """(user ids, feature rows) chunks from a `snapshot.py features` file."""
+    import pyarrow.parquet as pq
+    from bson import ObjectId
+
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=LOAD_CHUNK_SIZE):
+        ids = [str(ObjectId(raw)) for raw in batch.column("userId").to_pylist()]
+        rows = np.column_stack([batch.column(col).to_numpy(zero_copy_only=False) for col in FEATURES_FINAL])
+        yield ids, rows
+
+
+def load_index(index: LearnerIndex, registry, source: str = SIMILAR_LEARNERS_SOURCE) -> int:
+    """Fill `index` from `source`; users already indexed by inference keep their rows."""
+    if source == "none":
+        return 0
+    if source == "history":
+        chunks = _history_chunks()
+    elif source == "store":
+        chunks = _store_chunks()
+    else:
+        chunks = _parquet_chunks(source)
+    loaded = 0
+    for ids, rows in chunks:
+        loaded += index.upsert_many(registry.active, ids, rows, replace=False)
+    if not loaded and not len(index):
+        logger.warning(
+            "similar learners: %s has no users, the index only fills from inference; "
+            "set SIMILAR_LEARNERS_SOURCE to a source with features",
+            source,
+        )
+    logger.info(
+        "similar learners: loaded %d users from %s (%d indexed, %.1f MiB)",
+        loaded, source, len(index), index.nbytes / 2 ** 20,
+    )
+    return loaded
+
+
+def start_loading(index: LearnerIndex, registry, source: str = SIMILAR_LEARNERS_SOURCE) -> None:
+    """load_index in a background thread, so startup does not wait for it."""
+    def run():
+        try:
+            load_index(index, registry, source)
+        except Exception as exc:
+            logger.warning("similar learners: loading from %s failed: %s", source, exc)
+
+    threading.Thread(target=run, name="similar-learners-load", daemon=True).start()
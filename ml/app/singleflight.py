@@ -0,0 +1,65 @@
+import asyncio
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Collapse concurrent calls that share a key into one execution.
+    The first caller runs the function; callers arriving while it is in
+    flight wait for and share its result (or exception).
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        """Returns (result, shared) where shared is True for coalesced callers."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except Exception as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+
+class AsyncSingleFlight:
+    """SingleFlight for coroutines running on one event loop."""
+
+    def __init__(self):
+        self._calls = {}
+
+    async def do(self, key, coro_fn):
+        """Returns (result, shared) where shared is True for coalesced callers."""
+        future = self._calls.get(key)
+        if future is not None:
+            # shield so a cancelled follower does not cancel the shared work
+            return await asyncio.shield(future), True
+
+        future = asyncio.ensure_future(coro_fn())
+        self._calls[key] = future
+        future.add_done_callback(lambda _: self._calls.pop(key, None))
+        return await asyncio.shield(future), False
@@ -0,0 +1,277 @@
+"""
+Feature engine over Parquet snapshots of the Mongo collections.
+
+`python ../snapshot.py export` writes activities, quizresults, quizzes and
+mlprofiles under SNAPSHOT_DIR as hive-partitioned Parquet datasets
+(<collection>/date=YYYY-MM-DD/part-*.parquet) with the explicit schemas below:
+ObjectIds are kept as 12-byte binaries and datetimes as UTC timestamps, so
+nothing is lost the way it is in CSV exports. Hex-string ids (as CSV imports
+store them) are converted to ObjectIds.
+
+SnapshotPrepare / SnapshotBatchPrepare run the Prepare / BatchPrepare logic
+unchanged, with the FetchData queries answered from those files instead of the
+database ("snapshot" in feature_engines.py), so offline feature building does
+not touch production. Each collection's columns are loaded once per process
+and indexed by user / module; the feature window (feature_window.py) is
+applied in pandas.
+"""
+import os
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+from bson import ObjectId
+
+from feature_window import MODULE_EVENT_TYPES, apply_window
+from prepare_data import BatchFetchData, BatchPrepare, FetchData, Prepare, normalize_activity
+
+SNAPSHOT_DIR = Path(os.getenv("SNAPSHOT_DIR", Path(__file__).resolve().parent.parent / "dataset" / "snapshot"))
+
+OBJECT_ID = pa.binary(12)
+TIMESTAMP = pa.timestamp("ms", tz="UTC")
+
+SCHEMAS = {
+    "activities": pa.schema([
+        ("_id", OBJECT_ID),
+        ("user", OBJECT_ID),
+        ("course", OBJECT_ID),
+        ("module", OBJECT_ID),
+        ("type", pa.string()),
+        ("occurredAt", TIMESTAMP),
+        ("metadata", pa.struct([
+            ("score", pa.float64()),
+            ("passed", pa.bool_()),
+            ("quizResultId", OBJECT_ID),
+        ])),
+        ("createdAt", TIMESTAMP),
+        ("updatedAt", TIMESTAMP),
+    ]),
+    "quizresults": pa.schema([
+        ("_id", OBJECT_ID),
+        ("userId", OBJECT_ID),
+        ("moduleId", OBJECT_ID),
+        ("quizId", OBJECT_ID),
+        ("score", pa.float64()),
+        ("totalQuestions", pa.int32()),
+        ("passed", pa.bool_()),
+        ("duration", pa.float64()),
+        ("examFinishedAt", TIMESTAMP),
+        ("timestamp", TIMESTAMP),
+        ("createdAt", TIMESTAMP),
+        ("updatedAt", TIMESTAMP),
+    ]),
+    "quizzes": pa.schema([
+        ("_id", OBJECT_ID),
+        ("moduleId", OBJECT_ID),
+        ("maximumDuration", pa.float64()),
+        ("questions", pa.list_(pa.struct([
+            ("id", OBJECT_ID),
+            ("question", pa.string()),
+            ("options", pa.list_(pa.string())),
+            ("answer", pa.int32()),
+        ]))),
+        ("createdAt", TIMESTAMP),
+        ("updatedAt", TIMESTAMP),
+    ]),
+    "mlprofiles": pa.schema([
+        ("_id", OBJECT_ID),
+        ("userId", OBJECT_ID),
+        ("payload", pa.struct([
+            ("user_id", pa.string()),
+            ("result", pa.struct([
+                ("cluster", pa.int32()),
+                ("distance", pa.float64()),
+                ("distances", pa.list_(pa.float64())),
+                ("learner_type", pa.string()),
+                ("model_version", pa.string()),
+            ])),
+        ])),
+        ("generatedAt", TIMESTAMP),
+        ("createdAt", TIMESTAMP),
+        ("updatedAt", TIMESTAMP),
+    ]),
+}
+
+# field that dates a document (date partition, --since/--until);
+# None: the creation time embedded in its ObjectId `_id`
+TIME_FIELDS = {
+    "activities": "occurredAt",
+    "quizresults": "timestamp",
+    "quizzes": None,
+    "mlprofiles": "generatedAt",
+}
+
+PARTITIONING = ds.partitioning(pa.schema([("date", pa.string())]), flavor="hive")
+
+# the FetchData projections (plus the quiz result timestamp the feature window
+# filters on), and the key each collection is looked up by
+FRAMES = {
+    "activities": ("user", ["user", "module", "type", "occurredAt"]),
+    "quizresults": ("userId", ["userId", "moduleId", "score", "passed", "duration", "timestamp"]),
+    "quizzes": ("moduleId", ["_id", "moduleId", "maximumDuration"]),
+}
+
+
+def _arrow_value(value, type_: pa.DataType):
+    """A Mongo value in the Python form pyarrow expects for `type_`."""
+    if value is None:
+        return None
+    if type_ == OBJECT_ID:
+        return ObjectId(value).binary
+    if pa.types.is_struct(type_):
+        if not isinstance(value, dict):
+            return None
+        return {field.name: _arrow_value(value.get(field.name), field.type) for field in type_}
+    if pa.types.is_list(type_):
+        if not isinstance(value, list):
+            return None
+        return [_arrow_value(item, type_.value_type) for item in value]
+    return value
+
+
+def _is_plain(type_: pa.DataType) -> bool:
+    return type_ != OBJECT_ID and not pa.types.is_nested(type_)
+
+
+def documents_to_table(docs: list, schema: pa.Schema) -> pa.Table:
+    """Mongo documents as a table of `schema`; fields outside the schema are dropped."""
+    columns = {}
+    for field in schema:
+        if _is_plain(field.type):
+            columns[field.name] = [doc.get(field.name) for doc in docs]
+        else:
+            columns[field.name] = [_arrow_value(doc.get(field.name), field.type) for doc in docs]
+    return pa.Table.from_pydict(columns, schema=schema)
+
+
+def read_dataset(collection: str, columns=None, snapshot_dir: Path = SNAPSHOT_DIR) -> pa.Table:
+    path = Path(snapshot_dir) / collection
+    if not path.exists():
+        return SCHEMAS[collection].empty_table().select(columns or SCHEMAS[collection].names)
+    dataset = ds.dataset(path, format="parquet", partitioning=PARTITIONING)
+    return dataset.to_table(columns=columns)
+
+
+def table_to_frame(table: pa.Table) -> pd.DataFrame:
+    """Arrow table as pandas with ObjectIds and naive UTC datetimes, as pymongo returns them."""
+    df = table.to_pandas()
+    for field in table.schema:
+        if field.type == OBJECT_ID:
+            values = df[field.name]
+            ids = {raw: ObjectId(raw) for raw in values.dropna().unique()}
+            df[field.name] = values.map(ids).astype(object)
+        elif pa.types.is_timestamp(field.type) and field.type.tz is not None:
+            df[field.name] = df[field.name].dt.tz_convert(None)
+    return df
+
+
+class SnapshotReader:
+    """Columns needed for features, loaded once per snapshot and indexed by lookup key."""
+
+    def __init__(self, snapshot_dir: Path = SNAPSHOT_DIR):
+        self.snapshot_dir = Path(snapshot_dir)
+        self._frames: Dict[str, pd.DataFrame] = {}
+        self._positions: Dict[str, dict] = {}
+
+    def frame(self, collection: str) -> pd.DataFrame:
+        if collection not in self._frames:
+            key, columns = FRAMES[collection]
+            df = table_to_frame(read_dataset(collection, columns, self.snapshot_dir))
+            self._frames[collection] = df
+            self._positions[collection] = df.groupby(key, sort=False).indices if not df.empty else {}
+        return self._frames[collection]
+
+    def rows(self, collection: str, keys) -> pd.DataFrame:
+        """Rows whose lookup key is one of `keys` (ObjectIds or hex strings)."""
+        df = self.frame(collection)
+        positions = self._positions[collection]
+        found = [positions[key] for key in map(_as_object_id, keys) if key in positions]
+        if not found:
+            return df.iloc[0:0]
+        return df.iloc[np.sort(np.concatenate(found))]
+
+    def user_ids(self) -> list:
+        """Every user with activity or quiz results in the snapshot."""
+        users = pd.concat([self.frame("activities")["user"], self.frame("quizresults")["userId"]])
+        return sorted(users.dropna().unique().tolist())
+
+
+def _as_object_id(value):
+    try:
+        return ObjectId(value)
+    except (TypeError, ValueError):
+        return value
+
+
+_readers: Dict[Path, SnapshotReader] = {}
+
+
+def get_reader(snapshot_dir: Optional[Path] = None) -> SnapshotReader:
+    path = Path(snapshot_dir or SNAPSHOT_DIR).resolve()
+    if path not in _readers:
+        _readers[path] = SnapshotReader(path)
+    return _readers[path]
+
+
+def _as_requested(df: pd.DataFrame, column: str, user_ids) -> pd.DataFrame:
+    """Report user ids the way the caller passed them (str or ObjectId), as Mongo queries would."""
+    if df.empty:
+        return df
+    requested = {_as_object_id(user_id): user_id for user_id in user_ids}
+    df = df.copy()
+    df[column] = df[column].map(requested)
+    return df
+
+
+class SnapshotFetchData(FetchData):
+    """FetchData answered from the snapshot files."""
+
+    def __init__(self, user_id, snapshot_dir: Optional[Path] = None):
+        super().__init__(user_id)
+        self.reader = get_reader(snapshot_dir)
+
+    def _user_ids(self) -> list:
+        return [self.user_id]
+
+    def fetch_freshness_token(self) -> tuple:
+        return (str(self.reader.snapshot_dir),)
+
+    def fetch_activity_minimal(self) -> pd.DataFrame:
+        df = self.reader.rows("activities", self._user_ids())
+        df = apply_window(df[df["type"].isin(MODULE_EVENT_TYPES)], "user", "module", "occurredAt")
+        df = _as_requested(df, "user", self._user_ids())
+        return normalize_activity(df.reset_index(drop=True))
+
+    def fetch_quiz_results(self) -> pd.DataFrame:
+        df = apply_window(self.reader.rows("quizresults", self._user_ids()), "userId", "moduleId", "timestamp")
+        df = _as_requested(df.drop(columns="timestamp"), "userId", self._user_ids())
+        return df.reset_index(drop=True)
+
+    def fetch_quizzes(self, module_ids) -> pd.DataFrame:
+        if not module_ids:
+            return pd.DataFrame()
+        return self.reader.rows("quizzes", module_ids).reset_index(drop=True)
+
+
+class SnapshotBatchFetchData(SnapshotFetchData, BatchFetchData):
+    def __init__(self, user_ids, snapshot_dir: Optional[Path] = None):
+        BatchFetchData.__init__(self, user_ids)
+        self.reader = get_reader(snapshot_dir)
+
+    def _user_ids(self) -> list:
+        return self.user_ids
+
+
+class SnapshotPrepare(Prepare):
+    def __init__(self, user_id, snapshot_dir: Optional[Path] = None):
+        super().__init__(user_id)
+        self.fetch = SnapshotFetchData(user_id, snapshot_dir)
+
+
+class SnapshotBatchPrepare(BatchPrepare):
+    def __init__(self, user_ids, snapshot_dir: Optional[Path] = None):
+        super().__init__(user_ids)
+        self.fetch = SnapshotBatchFetchData(self.user_ids, snapshot_dir)
@@ -0,0 +1,142 @@
+"""
+Sync vs async /cluster-inference benchmark.
+
+Starts the ML service once per I/O mode (INFERENCE_IO=sync|async) against the
+Mongo in MONGO_URI, drives it at several concurrency levels and reports
+requests/sec and p50/p99 latency. The result cache is disabled so every
+request runs the feature pipeline.
+
+Usage:
+    python benchmarks/bench_async.py --concurrency 1,8,32,128 --requests 500
+    python benchmarks/bench_async.py --user-ids 693d55326da7b2a751d03ac8 --json out.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+import numpy as np
+from dotenv import load_dotenv
+from pymongo import MongoClient
+
+APP_DIR = Path(__file__).resolve().parent.parent / "app"
+
+
+def sample_user_ids(limit: int) -> list:
+    """Users that have activity, taken from the configured Mongo."""
+    load_dotenv()
+    client = MongoClient(os.getenv("MONGO_URI"))
+    try:
+        db = client[os.getenv("MONGO_DB", "insightify")]
+        return db.activities.distinct("user")[:limit]
+    finally:
+        client.close()
+
+
+def start_service(mode: str, port: int) -> subprocess.Popen:
+    env = dict(os.environ, INFERENCE_IO=mode, CACHE_ENABLED="false")
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=APP_DIR,
+        env=env,
+    )
+
+
+def wait_ready(base_url: str, timeout: float = 60) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{base_url}/metrics", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.25)
+    raise RuntimeError(f"Service at {base_url} did not start within {timeout}s")
+
+
+async def run_level(base_url: str, user_ids: list, concurrency: int, total: int) -> dict:
+    """Closed-loop load: `concurrency` workers issue `total` requests."""
+    latencies = []
+    errors = 0
+    remaining = iter(range(total))
+
+    async def worker(client):
+        nonlocal errors
+        for _ in remaining:
+            user_id = random.choice(user_ids)
+            start = time.perf_counter()
+            try:
+                resp = await client.post("/cluster-inference", json={"user_id": str(user_id)})
+                ok = resp.status_code == 200
+            except httpx.HTTPError:
+                ok = False
+            latencies.append(time.perf_counter() - start)
+            errors += 0 if ok else 1
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=limits) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": errors,
+        "rps": total / elapsed,
+        "p50_ms": float(np.percentile(latencies_ms, 50)),
+        "p99_ms": float(np.percentile(latencies_ms, 99)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark sync vs async /cluster-inference.")
+    parser.add_argument("--modes", default="sync,async")
+    parser.add_argument("--concurrency", default="1,8,32,128")
+    parser.add_argument("--requests", type=int, default=500, help="requests per concurrency level")
+    parser.add_argument("--user-ids", nargs="*", help="defaults to users found in activities")
+    parser.add_argument("--sample-users", type=int, default=200)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    user_ids = args.user_ids or sample_user_ids(args.sample_users)
+    if not user_ids:
+        print("ERROR: no users with activity found; seed the database first")
+        sys.exit(1)
+
+    levels = [int(c) for c in args.concurrency.split(",")]
+    base_url = f"http://127.0.0.1:{args.port}"
+    results = []
+    for mode in args.modes.split(","):
+        proc = start_service(mode, args.port)
+        try:
+            wait_ready(base_url)
+            # warm up connection pools and pandas code paths
+            asyncio.run(run_level(base_url, user_ids, 4, 20))
+            for concurrency in levels:
+                row = asyncio.run(run_level(base_url, user_ids, concurrency, args.requests))
+                row["mode"] = mode
+                results.append(row)
+                print(
+                    f"{mode:>5} c={concurrency:<4} rps={row['rps']:8.1f} "
+                    f"p50={row['p50_ms']:8.1f}ms p99={row['p99_ms']:8.1f}ms errors={row['errors']}"
+                )
+        finally:
+            proc.terminate()
+            proc.wait()
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2))
+        print(f"Wrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Insert throughput of the shared BulkWriter against the plain insert_many loop.
+
+Generates activity-shaped documents chunk by chunk (so document building costs
+something, as it does in the loaders) and writes them into a scratch
+collection of the Mongo in MONGO_URI, once with the old sequential loop and
+then with BulkWriter at each in-flight setting. Reports docs/sec and the
+speed-up over the sequential loop. The scratch collection is dropped before
+each run and at the end.
+
+Usage:
+    python benchmarks/bench_bulk_write.py --docs 200000 --in-flight 1,2,4,8
+    python benchmarks/bench_bulk_write.py --batch-size 1000 --json bulk.json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+from bson import ObjectId
+from pymongo import MongoClient
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bulk_writer import BulkWriter  # noqa: E402
+
+SCRATCH_COLLECTION = "bench_bulk_write"
+
+
+def build_chunks(total: int, chunk_size: int, seed: int = 0):
+    """Yield lists of activity-like documents, converted from numpy columns per chunk."""
+    rng = np.random.default_rng(seed)
+    start = datetime(2024, 1, 1)
+    user_ids = [ObjectId() for _ in range(1000)]
+    for offset in range(0, total, chunk_size):
+        n = min(chunk_size, total - offset)
+        users = rng.integers(0, len(user_ids), n)
+        minutes = rng.integers(0, 60 * 24 * 365, n)
+        durations = rng.integers(60, 7200, n)
+        yield [
+            {
+                "_id": ObjectId(),
+                "userId": user_ids[user],
+                "type": "study_session",
+                "occurredAt": start + timedelta(minutes=int(minute)),
+                "payload": {"durationSeconds": int(duration), "moduleId": f"module-{user % 50}"},
+            }
+            for user, minute, duration in zip(users, minutes, durations)
+        ]
+
+
+def run_sequential(collection, total: int, chunk_size: int, batch_size: int) -> float:
+    start = time.perf_counter()
+    for docs in build_chunks(total, chunk_size):
+        for i in range(0, len(docs), batch_size):
+            collection.insert_many(docs[i:i + batch_size], ordered=False)
+    return time.perf_counter() - start
+
+
+def run_writer(collection, total: int, chunk_size: int, batch_size, in_flight: int) -> BulkWriter:
+    with BulkWriter(collection, batch_size=batch_size, max_in_flight=in_flight) as writer:
+        for docs in build_chunks(total, chunk_size):
+            writer.add(docs)
+    return writer
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark pipelined bulk inserts.")
+    parser.add_argument("--mongo-uri", default=os.getenv("MONGO_URI", "mongodb://localhost:27017"))
+    parser.add_argument("--db", default=os.getenv("MONGO_DB", "insightify"))
+    parser.add_argument("--docs", type=int, default=200000)
+    parser.add_argument("--chunk-size", type=int, default=5000, help="documents built per chunk")
+    parser.add_argument("--batch-size", type=int, help="default: tuned from document size")
+    parser.add_argument("--in-flight", default="1,2,4,8")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    client = MongoClient(args.mongo_uri, serverSelectionTimeoutMS=5000)
+    collection = client[args.db][SCRATCH_COLLECTION]
+    results = []
+    try:
+        collection.drop()
+        sequential_batch = args.batch_size or 1000
+        seconds = run_sequential(collection, args.docs, args.chunk_size, sequential_batch)
+        baseline = args.docs / seconds
+        results.append({"mode": "sequential", "in_flight": 1, "batch_size": sequential_batch,
+                        "seconds": seconds, "docs_per_second": baseline, "speedup": 1.0})
+
+        for in_flight in [int(n) for n in args.in_flight.split(",")]:
+            collection.drop()
+            writer = run_writer(collection, args.docs, args.chunk_size, args.batch_size, in_flight)
+            results.append({"mode": "bulk_writer", "in_flight": in_flight, "batch_size": writer.batch_size,
+                            "seconds": writer.seconds, "docs_per_second": writer.docs_per_second,
+                            "speedup": writer.docs_per_second / baseline})
+    finally:
+        collection.drop()
+        client.close()
+
+    print(f"{args.docs} documents, chunks of {args.chunk_size}")
+    print("mode          in-flight  batch   seconds      docs/s  speedup")
+    for row in results:
+        print(
+            f"{row['mode']:<13} {row['in_flight']:>9} {row['batch_size']:>6} {row['seconds']:>9.2f} "
+            f"{row['docs_per_second']:>11.0f} {row['speedup']:>7.2f}x"
+        )
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2))
+        print(f"Wrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
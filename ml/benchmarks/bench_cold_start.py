@@ -0,0 +1,99 @@
+"""
+Time-to-first-successful-inference benchmark.
+
+Starts a fresh ML service process per run against the Mongo in MONGO_URI and
+measures, from process spawn, when /metrics first answers (ready) and when the
+first POST /cluster-inference returns 200 (first inference).
+
+Usage:
+    python benchmarks/bench_cold_start.py --runs 5
+    python benchmarks/bench_cold_start.py --user-id 693d55326da7b2a751d03ac8 --json cold.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+import numpy as np
+
+from bench_async import APP_DIR, sample_user_ids
+
+
+def poll(request, timeout: float) -> float:
+    """Call `request` until it returns True; returns the monotonic time it did."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if request():
+                return time.monotonic()
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.01)
+    raise RuntimeError(f"No successful response within {timeout}s")
+
+
+def cold_start(user_id: str, port: int, timeout: float) -> dict:
+    base_url = f"http://127.0.0.1:{port}"
+    spawned = time.monotonic()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=APP_DIR,
+        env=dict(os.environ, CACHE_ENABLED="false"),
+    )
+    try:
+        ready = poll(lambda: httpx.get(f"{base_url}/metrics", timeout=1).status_code == 200, timeout)
+        first = poll(
+            lambda: httpx.post(
+                f"{base_url}/cluster-inference", json={"user_id": user_id}, timeout=timeout,
+            ).status_code == 200,
+            timeout,
+        )
+    finally:
+        proc.terminate()
+        proc.wait()
+    return {"ready_s": ready - spawned, "first_inference_s": first - spawned}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure time to first successful inference.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--user-id", help="defaults to a user found in activities")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    user_ids = [args.user_id] if args.user_id else sample_user_ids(1)
+    if not user_ids:
+        print("ERROR: no users with activity found; seed the database first")
+        sys.exit(1)
+
+    runs = []
+    for run in range(args.runs):
+        row = cold_start(str(user_ids[0]), args.port, args.timeout)
+        runs.append(row)
+        print(f"run {run + 1}: ready={row['ready_s']:.3f}s first_inference={row['first_inference_s']:.3f}s")
+
+    summary = {
+        key: {"min": float(np.min(values)), "median": float(np.median(values))}
+        for key, values in (
+            ("ready_s", [row["ready_s"] for row in runs]),
+            ("first_inference_s", [row["first_inference_s"] for row in runs]),
+        )
+    }
+    print(
+        f"median ready={summary['ready_s']['median']:.3f}s "
+        f"first_inference={summary['first_inference_s']['median']:.3f}s"
+    )
+
+    if args.json:
+        Path(args.json).write_text(json.dumps({"runs": runs, "summary": summary}, indent=2))
+        print(f"Wrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Per-request overhead of the drift monitor (app/drift.py).
+
+Scores feature rows with the active model version and times
+DriftTracker.observe_many per single-row request (the /cluster-inference
+path) and per row of a batch, next to the scoring itself. Rows are resampled
+from the training data, optionally shifted by --shift baseline standard
+deviations to check that the drift scores react.
+
+Usage:
+    python benchmarks/bench_drift.py --requests 100000
+    python benchmarks/bench_drift.py --shift 1.0
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+ML_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ML_DIR / "app"))
+
+from drift import TRAINING_DATA, DriftTracker, training_features  # noqa: E402
+from registry import ModelRegistry  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark drift monitor overhead.")
+    parser.add_argument("--requests", type=int, default=100000)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--shift", type=float, default=0.0, help="feature mean shift in baseline std units")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    version = ModelRegistry().active
+    if version.baseline is None:
+        raise SystemExit(f"{version.name} has no drift baseline; run `python app/drift.py baseline`")
+    rng = np.random.default_rng(args.seed)
+    centroids = version.centroids
+    training = training_features(TRAINING_DATA, version.feature_names)
+    features = training[rng.integers(0, len(training), size=args.requests)] + args.shift * centroids.scale
+    tracker = DriftTracker(enabled=True)
+
+    score_ns, observe_ns = [], []
+    for row in features:
+        row = row[None, :]
+        start = time.perf_counter_ns()
+        distances = centroids.distances(centroids.transform(row))
+        clusters = distances.argmin(axis=1)
+        scored = time.perf_counter_ns()
+        tracker.observe_many(version, row, clusters, distances)
+        observe_ns.append(time.perf_counter_ns() - scored)
+        score_ns.append(scored - start)
+
+    batch = features[:args.batch_size]
+    distances = centroids.distances(centroids.transform(batch))
+    start = time.perf_counter_ns()
+    tracker.observe_many(version, batch, distances.argmin(axis=1), distances)
+    batch_ns = (time.perf_counter_ns() - start) / len(batch)
+
+    observe_us, score_us = np.array(observe_ns) / 1000, np.array(score_ns) / 1000
+    print(f"model {version.name}, {args.requests} single-row requests")
+    print(f"  scoring        p50 {np.percentile(score_us, 50):6.2f} us  p99 {np.percentile(score_us, 99):6.2f} us")
+    print(f"  drift observe  p50 {np.percentile(observe_us, 50):6.2f} us  p99 {np.percentile(observe_us, 99):6.2f} us")
+    print(f"  drift observe  {batch_ns / 1000:6.2f} us per row in a batch of {len(batch)}")
+
+    scores = tracker.monitor(version).scores()
+    print(f"scores after {scores['observations']:.0f} effective rows (shift {args.shift}):")
+    for name, stats in scores["features"].items():
+        print(f"  {name:<22} psi {stats['psi']:6.3f}  mean shift {stats['mean_shift']:+6.2f}  std ratio {stats['std_ratio']:5.2f}")
+    print(f"  cluster shares {np.round(scores['cluster_shares'], 3).tolist()}  psi {scores['cluster_psi']:.3f}")
+    print(f"  distance psi {scores['distance_psi']:.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Per-request CPU time and memory churn of the single-user feature engines.
+
+Runs each engine's prepare_features for the same users against the Mongo in
+MONGO_URI and reports wall time, CPU time (process_time) and peak traced
+allocation per request.
+
+Usage:
+    python benchmarks/bench_engines.py --engines pandas,fast --users 100
+"""
+import argparse
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+from feature_engines import get_engine  # noqa: E402
+from prepare_data import get_db  # noqa: E402
+
+
+def run_engine(engine: str, user_ids: list, repeat: int) -> dict:
+    prepare_cls, _ = get_engine(engine)
+    wall, cpu, peak = [], [], []
+    for _ in range(repeat):
+        for user_id in user_ids:
+            tracemalloc.start()
+            wall_start, cpu_start = time.perf_counter(), time.process_time()
+            try:
+                prepare_cls(user_id).prepare_features()
+            except ValueError:
+                pass
+            cpu.append(time.process_time() - cpu_start)
+            wall.append(time.perf_counter() - wall_start)
+            peak.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+    return {
+        "engine": engine,
+        "wall_ms": float(np.mean(wall) * 1000),
+        "cpu_ms": float(np.mean(cpu) * 1000),
+        "peak_kib": float(np.mean(peak) / 1024),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare feature engines per request.")
+    parser.add_argument("--engines", default="pandas,fast")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    user_ids = get_db().activities.distinct("user")[: args.users]
+    if not user_ids:
+        print("ERROR: no users with activity found; seed the database first")
+        sys.exit(1)
+
+    print(f"{len(user_ids)} users x {args.repeat} repeats")
+    for engine in args.engines.split(","):
+        row = run_engine(engine, user_ids, args.repeat)
+        print(
+            f"{engine:>7} wall={row['wall_ms']:7.2f}ms cpu={row['cpu_ms']:7.2f}ms "
+            f"peak={row['peak_kib']:8.1f}KiB per request"
+        )
+
+
+if __name__ == "__main__":
+    main()
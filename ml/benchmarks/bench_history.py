@@ -0,0 +1,186 @@
+"""
+Feature pipeline cost as a function of a user's history length.
+
+Generates synthetic users (synthetic.py) with exactly N activities for each N
+in --histories, then times, per user:
+
+- each FetchData query (freshness token, activities, quiz results, quizzes);
+- each Prepare step, on one Prepare instance so later steps reuse its cached
+  frames (activity_minimal and quiz_results include their fetch);
+- the full ClusterInferenceService.infer for every --engines entry.
+
+Data goes to a scratch database (--db, dropped first) on the Mongo in
+MONGO_URI, or with --inmemory to a throwaway mongod started in-process by
+pymongo_inmemory. Results are written as JSON (--json) together with the git
+commit, so runs can be compared across commits with --baseline.
+
+Usage:
+    python benchmarks/bench_history.py --histories 10,100,1000,10000 --json history.json
+    python benchmarks/bench_history.py --inmemory --baseline history.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+ML_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ML_DIR))
+sys.path.insert(0, str(ML_DIR / "app"))
+
+import synthetic  # noqa: E402
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ML_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def seed_histories(db, histories: list, users_per_size: int, seed: int) -> dict:
+    """{history length: [user ids]} for freshly generated users."""
+    rng = random.Random(seed)
+    new_id = synthetic.IdFactory(object_ids=False)
+    catalog = synthetic.build_catalog(rng, new_id, courses=10, modules_per_course=8)
+    synthetic.write_catalog(db, catalog)
+    users = {}
+    for n in histories:
+        users[n] = synthetic.generate_users(db, rng, new_id, catalog, [n] * users_per_size, synthetic.BULK_MAX_IN_FLIGHT)
+    synthetic.create_indexes(db)
+    return users
+
+
+def timed(samples: dict, step: str, fn, *args):
+    start = time.perf_counter()
+    try:
+        return fn(*args)
+    finally:
+        samples.setdefault(step, []).append((time.perf_counter() - start) * 1000)
+
+
+def time_user(user_id: str, services: dict, samples: dict) -> None:
+    from prepare_data import FetchData, Prepare
+
+    fetch = FetchData(user_id)
+    timed(samples, "fetch.freshness_token", fetch.fetch_freshness_token)
+    timed(samples, "fetch.activity_minimal", fetch.fetch_activity_minimal)
+    results = timed(samples, "fetch.quiz_results", fetch.fetch_quiz_results)
+    module_ids = results["moduleId"].dropna().unique().tolist() if "moduleId" in results else []
+    timed(samples, "fetch.quizzes", fetch.fetch_quizzes, module_ids)
+
+    prepare = Prepare(user_id)
+    timed(samples, "prepare.activity_minimal", prepare.activity_minimal)
+    timed(samples, "prepare.quiz_results", prepare.quiz_results)
+    timed(samples, "prepare.activity_by_module", prepare.prepare_activity_by_module)
+    timed(samples, "prepare.quiz", prepare.prepare_quiz)
+    timed(samples, "prepare.features", Prepare(user_id).prepare_features)
+
+    for engine, service in services.items():
+        timed(samples, f"infer.{engine}", service.infer, user_id)
+
+
+def summarize(history: int, step: str, values: list) -> dict:
+    values = np.array(values)
+    return {
+        "history": history,
+        "step": step,
+        "samples": len(values),
+        "mean_ms": float(values.mean()),
+        "p50_ms": float(np.percentile(values, 50)),
+        "p95_ms": float(np.percentile(values, 95)),
+        "max_ms": float(values.max()),
+    }
+
+
+def print_comparison(rows: list, baseline_path: Path) -> None:
+    baseline = json.loads(baseline_path.read_text())
+    previous = {(row["history"], row["step"]): row for row in baseline["results"]}
+    print(f"\nvs {baseline_path} (commit {baseline.get('commit')}): p50 ratio, >1 is slower")
+    for row in rows:
+        old = previous.get((row["history"], row["step"]))
+        if old and old["p50_ms"] > 0:
+            print(f"  history={row['history']:<7} {row['step']:<28} {row['p50_ms'] / old['p50_ms']:6.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark fetch/prepare/infer across history sizes.")
+    parser.add_argument("--histories", default="10,100,1000,10000", help="activities per user")
+    parser.add_argument("--users-per-size", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=3, help="timed passes over every user")
+    parser.add_argument("--engines", default="pandas", help="feature engines to time infer() with")
+    parser.add_argument("--mongo-uri", default=os.getenv("MONGO_URI", "mongodb://localhost:27017"))
+    parser.add_argument("--db", default="insightify_bench")
+    parser.add_argument("--inmemory", action="store_true", help="use a throwaway in-process mongod")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", type=Path, help="write results to this file")
+    parser.add_argument("--baseline", type=Path, help="earlier --json output to compare against")
+    args = parser.parse_args()
+
+    histories = [int(n) for n in args.histories.split(",")]
+    mongod = synthetic.start_inmemory() if args.inmemory else None
+    # the app modules read these when first imported
+    os.environ["MONGO_URI"] = mongod.connection_string if mongod else args.mongo_uri
+    os.environ["MONGO_DB"] = args.db
+    os.environ["CACHE_ENABLED"] = "false"
+
+    import prepare_data
+    from main import ClusterInferenceService, model_registry
+
+    try:
+        prepare_data.get_client().drop_database(args.db)
+        db = prepare_data.get_db()
+        start = time.perf_counter()
+        users = seed_histories(db, histories, args.users_per_size, args.seed)
+        print(f"Generated {sum(len(ids) for ids in users.values())} users in {time.perf_counter() - start:.1f}s")
+
+        services = {
+            engine: ClusterInferenceService(registry=model_registry, feature_engine=engine)
+            for engine in args.engines.split(",")
+        }
+        rows = []
+        for history, user_ids in users.items():
+            # one untimed pass to warm connections and imports
+            time_user(user_ids[0], services, {})
+            samples = {}
+            for _ in range(args.repeat):
+                for user_id in user_ids:
+                    time_user(user_id, services, samples)
+            rows.extend(summarize(history, step, values) for step, values in samples.items())
+    finally:
+        prepare_data.get_client().drop_database(args.db)
+        prepare_data.close_client()
+        if mongod:
+            mongod.stop()
+
+    print("history  step                          p50 ms    p95 ms   mean ms")
+    for row in rows:
+        print(
+            f"{row['history']:<8} {row['step']:<28} {row['p50_ms']:9.2f} {row['p95_ms']:9.2f} {row['mean_ms']:9.2f}"
+        )
+
+    if args.baseline:
+        print_comparison(rows, args.baseline)
+    if args.json:
+        report = {
+            "commit": git_commit(),
+            "created_at": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "args": {key: str(value) for key, value in vars(args).items()},
+            "results": rows,
+        }
+        args.json.write_text(json.dumps(report, indent=2))
+        print(f"Wrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
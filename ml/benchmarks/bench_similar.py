@@ -0,0 +1,86 @@
+"""
+Similar-learners index: query latency vs population size.
+
+Fills a LearnerIndex (app/similar_learners.py) with synthetic feature rows
+drawn around the active model's centroids, then times top-k queries for random
+indexed users, probing the nearest cluster (--n-probe) and every cluster
+(exhaustive). Also reports build rate, vector memory and recall@k of the
+partitioned search against the exhaustive one. Needs no database.
+
+Usage:
+    python benchmarks/bench_similar.py --populations 10000,100000,1000000 --k 10
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+ML_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ML_DIR / "app"))
+
+from registry import ModelRegistry  # noqa: E402
+from similar_learners import LearnerIndex  # noqa: E402
+
+
+def synthetic_features(version, n: int, rng: np.random.Generator) -> np.ndarray:
+    """Raw feature rows scattered around the model's centroids."""
+    centroids = version.centroids
+    clusters = rng.integers(0, version.n_clusters, size=n)
+    scaled = centroids.centers[clusters] + rng.normal(0, 0.6, size=(n, centroids.centers.shape[1]))
+    return scaled * centroids.scale + centroids.mean
+
+
+def time_queries(index: LearnerIndex, version, user_ids: list, k: int, n_probe: int) -> tuple:
+    latencies, results = [], []
+    for user_id in user_ids:
+        start = time.perf_counter()
+        neighbors = index.search(version, user_id, k, n_probe)
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append({neighbor["user_id"] for neighbor in neighbors})
+    return np.array(latencies), results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark similar-learners queries by population size.")
+    parser.add_argument("--populations", default="10000,100000,1000000")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--n-probe", type=int, default=1)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    version = ModelRegistry().active
+    rng = np.random.default_rng(args.seed)
+    print(f"model {version.name}, {version.n_clusters} clusters, k={args.k}")
+    print(
+        "population  build/s     MiB   probe  p50 ms   p95 ms   p99 ms   "
+        "all p50  all p95  recall@k"
+    )
+    for population in (int(n) for n in args.populations.split(",")):
+        features = synthetic_features(version, population, rng)
+        user_ids = [f"u{i}" for i in range(population)]
+        index = LearnerIndex(version)
+        start = time.perf_counter()
+        for i in range(0, population, 10000):
+            index.upsert_many(version, user_ids[i:i + 10000], features[i:i + 10000])
+        build_rate = population / (time.perf_counter() - start)
+
+        sample = [user_ids[i] for i in rng.integers(0, population, size=args.queries)]
+        # warm up
+        time_queries(index, version, sample[:10], args.k, args.n_probe)
+        probed, probed_results = time_queries(index, version, sample, args.k, args.n_probe)
+        exhaustive, exact_results = time_queries(index, version, sample, args.k, version.n_clusters)
+        recall = np.mean([
+            len(found & exact) / len(exact) for found, exact in zip(probed_results, exact_results) if exact
+        ])
+        print(
+            f"{population:<11} {build_rate:>8.0f} {index.nbytes / 2 ** 20:7.1f} {args.n_probe:>6} "
+            f"{np.percentile(probed, 50):7.3f} {np.percentile(probed, 95):8.3f} {np.percentile(probed, 99):8.3f} "
+            f"{np.percentile(exhaustive, 50):8.3f} {np.percentile(exhaustive, 95):8.3f} {recall:9.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Requests/sec scaling with the number of serve.py workers.
+
+For each worker count, starts `serve.py --workers N` against the Mongo in
+MONGO_URI and drives it closed-loop from several client processes (so the load
+generator is not the bottleneck), then reports requests/sec, p50/p99 and the
+speed-up over one worker. The result cache is disabled so every request runs
+the feature pipeline.
+
+`--endpoint noop` targets GET /retrive-class instead, which measures the
+HTTP/worker ceiling without Mongo.
+
+Usage:
+    python benchmarks/bench_workers.py --workers 1,2,4 --concurrency 64 --requests 4000
+    python benchmarks/bench_workers.py --endpoint noop --json workers.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from multiprocessing import Pool
+from pathlib import Path
+
+import httpx
+import numpy as np
+
+from bench_async import APP_DIR, sample_user_ids, wait_ready
+
+
+def start_server(workers: int, port: int) -> subprocess.Popen:
+    env = dict(os.environ, CACHE_ENABLED="false")
+    env.pop("PROMETHEUS_MULTIPROC_DIR", None)
+    return subprocess.Popen(
+        [sys.executable, "serve.py", "--workers", str(workers), "--port", str(port), "--log-level", "warning"],
+        cwd=APP_DIR,
+        env=env,
+    )
+
+
+async def drive(base_url: str, endpoint: str, user_ids: list, concurrency: int, total: int) -> list:
+    """Closed-loop load from one process; returns (latency, ok) per request."""
+    samples = []
+    remaining = iter(range(total))
+
+    async def worker(client):
+        for _ in remaining:
+            start = time.perf_counter()
+            try:
+                if endpoint == "noop":
+                    resp = await client.get("/retrive-class")
+                else:
+                    user_id = str(random.choice(user_ids))
+                    resp = await client.post("/cluster-inference", json={"user_id": user_id})
+                ok = resp.status_code == 200
+            except httpx.HTTPError:
+                ok = False
+            samples.append((time.perf_counter() - start, ok))
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=limits) as client:
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+    return samples
+
+
+def client_process(job: tuple) -> list:
+    return asyncio.run(drive(*job))
+
+
+def run_load(base_url: str, endpoint: str, user_ids: list, clients: int, concurrency: int, total: int) -> dict:
+    per_client = max(1, concurrency // clients)
+    jobs = [(base_url, endpoint, user_ids, per_client, total // clients) for _ in range(clients)]
+    with Pool(clients) as pool:
+        start = time.perf_counter()
+        results = pool.map(client_process, jobs)
+        elapsed = time.perf_counter() - start
+
+    samples = [sample for result in results for sample in result]
+    latencies_ms = np.array([latency for latency, _ in samples]) * 1000
+    return {
+        "requests": len(samples),
+        "errors": sum(1 for _, ok in samples if not ok),
+        "rps": len(samples) / elapsed,
+        "p50_ms": float(np.percentile(latencies_ms, 50)),
+        "p99_ms": float(np.percentile(latencies_ms, 99)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark RPS scaling with serve.py workers.")
+    parser.add_argument("--workers", default="1,2,4")
+    parser.add_argument("--endpoint", choices=["inference", "noop"], default="inference")
+    parser.add_argument("--concurrency", type=int, default=64, help="in-flight requests in total")
+    parser.add_argument("--requests", type=int, default=4000, help="requests per worker count")
+    parser.add_argument("--clients", type=int, default=min(4, os.cpu_count() or 1), help="load generator processes")
+    parser.add_argument("--user-ids", nargs="*", help="defaults to users found in activities")
+    parser.add_argument("--sample-users", type=int, default=200)
+    parser.add_argument("--port", type=int, default=8767)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    user_ids = []
+    if args.endpoint == "inference":
+        user_ids = args.user_ids or sample_user_ids(args.sample_users)
+        if not user_ids:
+            print("ERROR: no users with activity found; seed the database first")
+            sys.exit(1)
+
+    base_url = f"http://127.0.0.1:{args.port}"
+    print(f"{os.cpu_count()} CPUs, {args.clients} client processes, concurrency {args.concurrency}")
+    results = []
+    for workers in [int(n) for n in args.workers.split(",")]:
+        proc = start_server(workers, args.port)
+        try:
+            wait_ready(base_url)
+            # warm up every worker's connection pool and code paths
+            run_load(base_url, args.endpoint, user_ids, args.clients, args.concurrency, workers * 50)
+            row = run_load(base_url, args.endpoint, user_ids, args.clients, args.concurrency, args.requests)
+        finally:
+            proc.terminate()
+            proc.wait()
+        row["workers"] = workers
+        row["speedup"] = row["rps"] / results[0]["rps"] if results else 1.0
+        results.append(row)
+        print(
+            f"workers={workers:<3} rps={row['rps']:8.1f} speedup={row['speedup']:4.2f}x "
+            f"p50={row['p50_ms']:7.1f}ms p99={row['p99_ms']:7.1f}ms errors={row['errors']}"
+        )
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2))
+        print(f"Wrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,317 @@
+"""
+Load test for POST /cluster-inference.
+
+Seeds a scratch database with synthetic users (synthetic.py), starts the
+service on it with serve.py and drives it in phases:
+
+- open loop (--rates 5,10,20,50): Poisson arrivals at each rate for
+  --duration seconds, whether or not earlier requests have finished, so
+  queueing shows up as latency the way it does for real clients. Latency is
+  measured from each request's scheduled arrival time.
+- closed loop (--concurrency 8): that many clients issuing back-to-back
+  requests, for comparison with the other benchmarks.
+
+User ids follow --distribution: uniform, hot (--hot-share of the traffic goes
+to the first --hot-fraction of users, the rest is long tail) or zipf.
+
+Every request is abandoned after --timeout-ms, by default the backend's
+ML_TIMEOUT_MS (15s), and counted as a timeout, which is what the backend
+would report. Open-loop arrivals dropped because --max-in-flight requests
+were already outstanding count as errors too: the service could not keep up
+with them. Each phase reports throughput, p50/p95/p99, error and timeout
+rates, and cross-checks them against the deltas of the service's own
+/metrics (requests, errors and the cluster_inference_latency_seconds
+histogram, whose quantiles are estimated from its buckets).
+
+Everything runs locally: --inmemory starts a throwaway mongod in-process
+(pymongo_inmemory); otherwise the scratch database (--db, dropped before and
+after) lives on the Mongo in MONGO_URI. --url targets an already running
+service and database instead (users are then sampled from its activities).
+
+Usage:
+    python benchmarks/loadtest.py --inmemory --users 2000 --rates 5,10,20,40 --duration 30
+    python benchmarks/loadtest.py --workers 4 --concurrency 32 --distribution zipf --json load.json
+    python benchmarks/loadtest.py --url http://127.0.0.1:8000 --rates 50 --distribution hot
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+import numpy as np
+from prometheus_client.parser import text_string_to_metric_families
+from pymongo import MongoClient
+
+from bench_async import APP_DIR, sample_user_ids, wait_ready
+
+sys.path.insert(0, str(APP_DIR.parent))
+
+import synthetic  # noqa: E402
+
+ML_TIMEOUT_MS = int(os.getenv("ML_TIMEOUT_MS", "15000"))
+LATENCY_METRIC = "cluster_inference_latency_seconds"
+
+
+class UserPicker:
+    """Draws user ids with a uniform, hot-set or zipf popularity."""
+
+    def __init__(self, user_ids: list, distribution: str, hot_fraction: float, hot_share: float, zipf_s: float,
+                 seed: int = 0):
+        self.user_ids = list(user_ids)
+        self.distribution = distribution
+        self.rng = random.Random(seed)
+        self.hot = max(1, int(len(self.user_ids) * hot_fraction))
+        self.hot_share = hot_share
+        if distribution == "zipf":
+            weights = 1 / np.arange(1, len(self.user_ids) + 1) ** zipf_s
+            self.cumulative = np.cumsum(weights / weights.sum())
+
+    def __call__(self) -> str:
+        if self.distribution == "hot":
+            if self.rng.random() < self.hot_share or self.hot >= len(self.user_ids):
+                return self.user_ids[self.rng.randrange(self.hot)]
+            return self.user_ids[self.rng.randrange(self.hot, len(self.user_ids))]
+        if self.distribution == "zipf":
+            index = int(np.searchsorted(self.cumulative, self.rng.random()))
+            return self.user_ids[min(index, len(self.user_ids) - 1)]
+        return self.rng.choice(self.user_ids)
+
+
+async def send(client: httpx.AsyncClient, user_id: str, scheduled: float, samples: list) -> None:
+    try:
+        resp = await client.post("/cluster-inference", json={"user_id": str(user_id)})
+        outcome = "ok" if resp.status_code == 200 else f"http_{resp.status_code}"
+    except httpx.TimeoutException:
+        outcome = "timeout"
+    except httpx.HTTPError:
+        outcome = "error"
+    samples.append((time.perf_counter() - scheduled, outcome))
+
+
+async def open_loop(client, pick, rate: float, duration: float, max_in_flight: int, seed: int) -> tuple:
+    """Poisson arrivals at `rate`/s; arrivals beyond max_in_flight are dropped and counted."""
+    rng = random.Random(seed)
+    samples, tasks, dropped = [], set(), 0
+    start = time.perf_counter()
+    offset = 0.0
+    while True:
+        offset += rng.expovariate(rate)
+        if offset >= duration:
+            break
+        await asyncio.sleep(max(0.0, start + offset - time.perf_counter()))
+        if len(tasks) >= max_in_flight:
+            dropped += 1
+            continue
+        task = asyncio.create_task(send(client, pick(), start + offset, samples))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+    await asyncio.gather(*tasks)
+    return samples, dropped, time.perf_counter() - start
+
+
+async def closed_loop(client, pick, concurrency: int, duration: float) -> tuple:
+    samples = []
+    start = time.perf_counter()
+
+    async def worker():
+        while time.perf_counter() - start < duration:
+            await send(client, pick(), time.perf_counter(), samples)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return samples, 0, time.perf_counter() - start
+
+
+def scrape(base_url: str) -> dict:
+    """Request/error counters and latency buckets from /metrics."""
+    text = httpx.get(f"{base_url}/metrics", timeout=10).text
+    values = {"requests": 0.0, "errors": 0.0, "buckets": {}}
+    for family in text_string_to_metric_families(text):
+        for sample in family.samples:
+            if sample.name == "cluster_inference_requests_total":
+                values["requests"] += sample.value
+            elif sample.name == "cluster_inference_errors_total":
+                values["errors"] += sample.value
+            elif sample.name == f"{LATENCY_METRIC}_bucket":
+                bound = float(sample.labels["le"])
+                values["buckets"][bound] = values["buckets"].get(bound, 0.0) + sample.value
+    return values
+
+
+def histogram_quantile(buckets: dict, q: float) -> float:
+    """Quantile (ms) from cumulative bucket counts, interpolating inside a bucket like PromQL."""
+    bounds = sorted(buckets)
+    total = buckets[bounds[-1]] if bounds else 0
+    if not total:
+        return float("nan")
+    rank = q * total
+    lower_bound, lower_count = 0.0, 0.0
+    for bound in bounds:
+        if buckets[bound] >= rank:
+            if bound == float("inf"):
+                return lower_bound * 1000
+            fraction = (rank - lower_count) / max(buckets[bound] - lower_count, 1e-12)
+            return (lower_bound + (bound - lower_bound) * fraction) * 1000
+        lower_bound, lower_count = bound, buckets[bound]
+    return lower_bound * 1000
+
+
+def summarize(samples: list, dropped: int, elapsed: float, before: dict, after: dict) -> dict:
+    latencies = np.array([latency for latency, _ in samples]) * 1000
+    outcomes = {}
+    for _, outcome in samples:
+        outcomes[outcome] = outcomes.get(outcome, 0) + 1
+    if dropped:
+        outcomes["dropped"] = dropped
+    sent = len(samples)
+    offered = sent + dropped
+    ok = outcomes.get("ok", 0)
+    deltas = {bound: after["buckets"].get(bound, 0) - before["buckets"].get(bound, 0) for bound in after["buckets"]}
+    return {
+        "sent": sent,
+        "dropped": dropped,
+        "throughput_rps": ok / elapsed,
+        "p50_ms": float(np.percentile(latencies, 50)) if sent else float("nan"),
+        "p95_ms": float(np.percentile(latencies, 95)) if sent else float("nan"),
+        "p99_ms": float(np.percentile(latencies, 99)) if sent else float("nan"),
+        # dropped arrivals never got a response, so they count as errors
+        "error_rate": (offered - ok) / offered if offered else 0.0,
+        "timeouts": outcomes.get("timeout", 0),
+        "outcomes": outcomes,
+        "server": {
+            "requests": after["requests"] - before["requests"],
+            "errors": after["errors"] - before["errors"],
+            "p50_ms": histogram_quantile(deltas, 0.50),
+            "p95_ms": histogram_quantile(deltas, 0.95),
+            "p99_ms": histogram_quantile(deltas, 0.99),
+        },
+    }
+
+
+def print_phase(row: dict) -> None:
+    server = row["server"]
+    print(
+        f"{row['phase']:<14} sent={row['sent']:<6} ok/s={row['throughput_rps']:7.1f} "
+        f"p50={row['p50_ms']:8.1f} p95={row['p95_ms']:8.1f} p99={row['p99_ms']:8.1f}ms "
+        f"err={row['error_rate']:6.1%} timeouts={row['timeouts']} dropped={row['dropped']}"
+    )
+    print(
+        f"{'  /metrics':<14} requests={server['requests']:<6.0f} errors={server['errors']:<4.0f} "
+        f"p50~{server['p50_ms']:7.1f} p95~{server['p95_ms']:7.1f} p99~{server['p99_ms']:7.1f}ms"
+    )
+    # the server counts requests it finished; client-side drops and timeouts may still be running
+    if server["requests"] < row["sent"] - row["timeouts"]:
+        print(f"{'':<14} ! server saw fewer requests than the client completed")
+
+
+def start_service(workers: int, port: int, mongo_uri: str, db_name: str, cache: bool) -> subprocess.Popen:
+    env = dict(os.environ, MONGO_URI=mongo_uri, MONGO_DB=db_name, CACHE_ENABLED=str(cache).lower())
+    env.pop("PROMETHEUS_MULTIPROC_DIR", None)
+    return subprocess.Popen(
+        [sys.executable, "serve.py", "--workers", str(workers), "--port", str(port), "--log-level", "warning"],
+        cwd=APP_DIR,
+        env=env,
+    )
+
+
+async def run_phases(base_url: str, pick, args) -> list:
+    rows = []
+    timeout = httpx.Timeout(args.timeout_ms / 1000)
+    limits = httpx.Limits(max_connections=args.max_in_flight, max_keepalive_connections=args.max_in_flight)
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        phases = [("rate", float(r)) for r in args.rates.split(",")] if args.rates else []
+        phases += [("concurrency", int(c)) for c in args.concurrency.split(",")] if args.concurrency else []
+        for kind, level in phases:
+            before = scrape(base_url)
+            if kind == "rate":
+                result = await open_loop(client, pick, level, args.duration, args.max_in_flight, args.seed)
+            else:
+                result = await closed_loop(client, pick, level, args.duration)
+            # let abandoned requests finish server-side before reading the counters
+            await asyncio.sleep(1)
+            row = summarize(*result, before, scrape(base_url))
+            row["phase"] = f"{kind}={level:g}"
+            rows.append(row)
+            print_phase(row)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test /cluster-inference.")
+    parser.add_argument("--rates", help="open-loop arrival rates (req/s), one phase each")
+    parser.add_argument("--concurrency", help="closed-loop client counts, one phase each")
+    parser.add_argument("--duration", type=float, default=30, help="seconds per phase")
+    parser.add_argument("--max-in-flight", type=int, default=1000)
+    parser.add_argument("--timeout-ms", type=int, default=ML_TIMEOUT_MS)
+    parser.add_argument("--distribution", choices=["uniform", "hot", "zipf"], default="hot")
+    parser.add_argument("--hot-fraction", type=float, default=0.05)
+    parser.add_argument("--hot-share", type=float, default=0.8)
+    parser.add_argument("--zipf-s", type=float, default=1.1)
+    parser.add_argument("--users", type=int, default=2000, help="synthetic users to seed")
+    parser.add_argument("--activities-per-user", type=float, default=60)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--no-cache", action="store_true", help="disable the service's result cache")
+    parser.add_argument("--port", type=int, default=8768)
+    parser.add_argument("--mongo-uri", default=os.getenv("MONGO_URI", "mongodb://localhost:27017"))
+    parser.add_argument("--db", default="insightify_load")
+    parser.add_argument("--inmemory", action="store_true", help="seed a throwaway in-process mongod")
+    parser.add_argument("--url", help="load an already running service instead")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", type=Path, help="write results to this file")
+    args = parser.parse_args()
+    if not args.rates and not args.concurrency:
+        args.rates = "5,10,20,40"
+
+    mongod = client = proc = None
+    try:
+        if args.url:
+            base_url = args.url.rstrip("/")
+            user_ids = sample_user_ids(max(args.users, 1))
+        else:
+            mongod = synthetic.start_inmemory() if args.inmemory else None
+            mongo_uri = mongod.connection_string if mongod else args.mongo_uri
+            client = MongoClient(mongo_uri)
+            client.drop_database(args.db)
+            start = time.perf_counter()
+            user_ids = synthetic.generate(client[args.db], args.users, args.activities_per_user, seed=args.seed)["user_ids"]
+            print(f"Seeded {len(user_ids)} users in {time.perf_counter() - start:.1f}s")
+            base_url = f"http://127.0.0.1:{args.port}"
+            proc = start_service(args.workers, args.port, mongo_uri, args.db, cache=not args.no_cache)
+            wait_ready(base_url)
+        if not user_ids:
+            print("ERROR: no users with activity found; seed the database first")
+            sys.exit(1)
+
+        pick = UserPicker(user_ids, args.distribution, args.hot_fraction, args.hot_share, args.zipf_s, args.seed)
+        print(f"{len(user_ids)} users, {args.distribution} distribution, timeout {args.timeout_ms}ms")
+        rows = asyncio.run(run_phases(base_url, pick, args))
+    finally:
+        if proc:
+            proc.terminate()
+            proc.wait()
+        if client:
+            client.drop_database(args.db)
+            client.close()
+        if mongod:
+            mongod.stop()
+
+    # error_rate includes dropped arrivals, so a phase that shed load is not healthy
+    healthy = [row for row in rows if row["error_rate"] < 0.01 and row["p99_ms"] < args.timeout_ms]
+    if healthy:
+        best = max(healthy, key=lambda row: row["throughput_rps"])
+        print(f"\nCeiling: {best['throughput_rps']:.1f} ok/s at {best['phase']} with p99 under {args.timeout_ms}ms")
+    else:
+        print(f"\nNo phase stayed under {args.timeout_ms}ms p99 with <1% errors (drops included)")
+
+    if args.json:
+        args.json.write_text(json.dumps({"args": {k: str(v) for k, v in vars(args).items()}, "phases": rows}, indent=2))
+        print(f"Wrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Startup profile of the ML service.
+
+Imports `main` in a fresh interpreter with `-X importtime` and reports where
+the cold start goes: cumulative import time per module imported by the app,
+self time per top-level package, and the time spent loading the active model
+version and running the FastAPI lifespan (Mongo client + index checks).
+
+Usage:
+    python benchmarks/startup_profile.py
+    python benchmarks/startup_profile.py --top 25 --skip-lifespan --json startup.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+APP_DIR = Path(__file__).resolve().parent.parent / "app"
+
+# runs in the child interpreter; prints phase timings as JSON on the last line
+PHASES_SCRIPT = """
+import asyncio, json, sys, time
+phases = {}
+start = time.perf_counter()
+import main
+phases["import_main"] = time.perf_counter() - start
+
+from registry import ModelRegistry
+start = time.perf_counter()
+ModelRegistry(expected_clusters=len(main.CLUSTER_INTERPRETATION))
+phases["model_load"] = time.perf_counter() - start
+
+if sys.argv[1] == "lifespan":
+    async def startup():
+        async with main.lifespan(main.app):
+            pass
+    start = time.perf_counter()
+    asyncio.run(startup())
+    phases["lifespan"] = time.perf_counter() - start
+print(json.dumps(phases))
+"""
+
+
+def parse_importtime(stderr: str) -> list:
+    """(module, depth, self_us, cumulative_us) rows from -X importtime output."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), depth, int(self_us), int(cumulative_us)))
+    return rows
+
+
+def profile(skip_lifespan: bool) -> dict:
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PHASES_SCRIPT, "none" if skip_lifespan else "lifespan"],
+        cwd=APP_DIR,
+        env=dict(os.environ),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    rows = parse_importtime(proc.stderr)
+    phases = json.loads(proc.stdout.strip().splitlines()[-1])
+
+    # modules imported directly by main, with everything they pulled in
+    main_depth = next(depth for name, depth, _, _ in rows if name == "main")
+    direct = []
+    for name, depth, _, cumulative_us in rows:
+        if depth == main_depth + 1:
+            direct.append({"module": name, "cumulative_ms": cumulative_us / 1000})
+
+    packages = defaultdict(int)
+    for name, _, self_us, _ in rows:
+        packages[name.split(".")[0]] += self_us
+
+    return {
+        "phases_ms": {name: seconds * 1000 for name, seconds in phases.items()},
+        "imported_by_main": sorted(direct, key=lambda row: -row["cumulative_ms"]),
+        "packages": sorted(
+            ({"package": name, "self_ms": us / 1000} for name, us in packages.items()),
+            key=lambda row: -row["self_ms"],
+        ),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Break down ML service startup time.")
+    parser.add_argument("--top", type=int, default=15, help="rows per table")
+    parser.add_argument("--skip-lifespan", action="store_true", help="do not connect to Mongo")
+    parser.add_argument("--json", help="write the report to this file")
+    args = parser.parse_args()
+
+    report = profile(args.skip_lifespan)
+
+    print("Phases")
+    for name, ms in report["phases_ms"].items():
+        print(f"  {name:<16} {ms:9.1f} ms")
+    print("Imported by main (cumulative)")
+    for row in report["imported_by_main"][: args.top]:
+        print(f"  {row['module']:<32} {row['cumulative_ms']:9.1f} ms")
+    print("Top-level packages (self time)")
+    for row in report["packages"][: args.top]:
+        print(f"  {row['package']:<32} {row['self_ms']:9.1f} ms")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2))
+        print(f"Wrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,39 +1,51 @@
+import argparse
+import io
+import math
+import sys
+import tracemalloc
+import warnings
 import zipfile
-import tempfile
+from pathlib import Path
+
+import numpy as np
 import pandas as pd
 from pymongo import MongoClient
 from pymongo.errors import ConnectionFailure, BulkWriteError
 from dateutil.parser import parse
-from pathlib import Path
-import math
-import sys
-import os
+
+from bulk_writer import BULK_MAX_IN_FLIGHT, BulkWriter
 
 # ================= CONFIG =================
 ZIP_PATH = "dataset/test.zip"          # zip containing CSVs
 MONGO_URI = "mongodb://localhost:27017"
 DB_NAME = "insightify"
-BATCH_SIZE = 1000
+BATCH_SIZE = None             # None: sized per collection from its documents
+CHUNK_ROWS = 5000             # CSV rows read and converted at a time
+SAMPLE_ROWS = 1000            # rows used to infer each column's type
 DROP_COLLECTIONS = True       # set True if you want clean overwrite
 # =========================================
 
+NULL_TOKENS = ("null", "none", "")
+BOOL_TOKENS = ("true", "false")
+
 
 def infer_value(v):
+    """Per-cell conversion; used for cells that don't fit their column's type."""
     if pd.isna(v):
         return None
 
     if isinstance(v, str):
         s = v.strip().lower()
-        if s in ("true", "false"):
+        if s in BOOL_TOKENS:
             return s == "true"
-        if s in ("null", "none", ""):
+        if s in NULL_TOKENS:
             return None
 
         # try int
         try:
             i = int(v)
             return i
-        except:
+        except ValueError:
             pass
 
         # try float
@@ -41,141 +53,230 @@ def infer_value(v):
             f = float(v)
             if math.isfinite(f):
                 return f
-        except:
+        except ValueError:
             pass
 
         # try date
         try:
             return parse(v)
-        except:
+        except (ValueError, OverflowError):
             pass
 
     return v
 
 
-def convert_df(df):
-    return [
-        {col: infer_value(row[col]) for col in df.columns}
-        for _, row in df.iterrows()
-    ]
+def _null_mask(values: pd.Series) -> pd.Series:
+    return values.isna() | values.str.strip().str.lower().isin(NULL_TOKENS)
+
+
+def _parse_dates(values: pd.Series) -> pd.Series:
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", UserWarning)
+        parsed = pd.to_datetime(values, errors="coerce", utc=True, format="ISO8601")
+        retry = parsed.isna() & values.notna()
+        if retry.any():
+            parsed[retry] = pd.to_datetime(values[retry], errors="coerce", utc=True, format="mixed")
+    return parsed
+
+
+def infer_column_type(sample: pd.Series) -> str:
+    """
+    Type of a column from a sample of its raw string values: one of
+    bool, int, float, date, str, or null when the sample has no values.
+    Checked in the same order infer_value tries them.
+    """
+    values = sample[~_null_mask(sample)].str.strip()
+    if values.empty:
+        return "null"
+    if values.str.lower().isin(BOOL_TOKENS).all():
+        return "bool"
+    if values.str.fullmatch(r"[+-]?\d+").all():
+        return "int"
+    numbers = pd.to_numeric(values, errors="coerce").astype(float)
+    if np.isfinite(numbers).all():
+        return "float"
+    if _parse_dates(values).notna().all():
+        return "date"
+    return "str"
+
+
+def convert_column(values: pd.Series, column_type: str) -> list:
+    """
+    Convert a column of raw strings to Python values in one pass.
+    Cells that don't parse as the column's type fall back to infer_value.
+    """
+    nulls = _null_mask(values)
+    if column_type == "null":
+        converted = pd.Series(None, index=values.index, dtype=object)
+    elif column_type == "bool":
+        lowered = values.str.strip().str.lower()
+        converted = (lowered == "true").astype(object).where(lowered.isin(BOOL_TOKENS))
+    elif column_type == "int":
+        stripped = values.str.strip()
+        ints = pd.to_numeric(stripped.where(stripped.str.fullmatch(r"[+-]?\d+", na=False)), errors="coerce")
+        converted = ints.astype("Int64").astype(object)
+    elif column_type == "float":
+        numbers = pd.to_numeric(values.str.strip(), errors="coerce").astype(float)
+        converted = numbers.where(np.isfinite(numbers)).astype(object)
+    elif column_type == "date":
+        parsed = _parse_dates(values.str.strip())
+        converted = pd.Series(
+            parsed.dt.to_pydatetime().to_numpy(dtype=object, copy=True), index=values.index, dtype=object,
+        ).where(parsed.notna())
+    else:
+        converted = values.astype(object)
+
+    failed = converted.isna() & ~nulls
+    if failed.any():
+        converted[failed] = values[failed].map(infer_value)
+    converted[nulls] = None
+    return converted.tolist()
+
+
+def convert_chunk(df: pd.DataFrame, column_types: dict) -> list:
+    columns = list(df.columns)
+    converted = [convert_column(df[col], column_types.get(col, "str")) for col in columns]
+    return [dict(zip(columns, values)) for values in zip(*converted)]
+
+
+def collection_name_for(member: str) -> str:
+    """
+    Collection name from the db.collection.csv export format,
+    e.g. "test/insightify.activities.csv" -> "activities".
+    """
+    parts = Path(member).stem.split(".")
+    if len(parts) >= 2:
+        # Take everything after the first part (db name)
+        return ".".join(parts[1:])
+    # Fallback: use the whole stem if no dots found
+    return parts[0]
+
+
+def iter_documents(zf: zipfile.ZipFile, member: str, chunk_rows: int, stats: dict):
+    """
+    Stream converted documents of one CSV member, chunk by chunk.
+    Column types are inferred once, from the first SAMPLE_ROWS rows.
+    """
+    column_types = None
+    with zf.open(member) as raw:
+        reader = pd.read_csv(io.TextIOWrapper(raw, encoding="utf-8"), dtype=str, chunksize=chunk_rows)
+        for chunk in reader:
+            if column_types is None:
+                sample = chunk.head(SAMPLE_ROWS)
+                column_types = {col: infer_column_type(sample[col]) for col in chunk.columns}
+                stats["column_types"] = column_types
+            stats["rows"] += len(chunk)
+            yield convert_chunk(chunk, column_types)
+
+
+def import_member(
+    db, zf: zipfile.ZipFile, member: str, batch_size, chunk_rows: int, drop: bool, in_flight: int = BULK_MAX_IN_FLIGHT,
+) -> dict:
+    collection_name = collection_name_for(member)
+    print(f"\nImporting: {collection_name} (from {member})")
+    col = db[collection_name]
+    if drop:
+        print("  → Dropping existing collection...")
+        col.drop()
+
+    stats = {"collection": collection_name, "rows": 0}
+    tracemalloc.reset_peak()
+    # the next chunk is converted while earlier batches are being written
+    with BulkWriter(col, batch_size=batch_size, max_in_flight=in_flight) as writer:
+        for docs in iter_documents(zf, member, chunk_rows, stats):
+            writer.add(docs)
+    stats["inserted"] = writer.inserted
+    stats["duplicates"] = writer.duplicates
+    stats["batch_size"] = writer.batch_size
+    stats["seconds"] = writer.seconds
+    # tracemalloc is off with --no-memory-report; peak then reads 0
+    stats["peak_mib"] = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+
+    print(f"  → Column types: {stats.get('column_types', {})}")
+    skipped = f", skipped {writer.duplicates} duplicates" if writer.duplicates else ""
+    print(
+        f"  ✓ Inserted {stats['inserted']} documents into '{collection_name}'{skipped} "
+        f"in {stats['seconds']:.2f}s (batch {writer.batch_size}, peak {stats['peak_mib']:.1f} MiB)"
+    )
+    return stats
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Import db.collection.csv exports from a zip into MongoDB.")
+    parser.add_argument("--zip", default=ZIP_PATH, help="path relative to this script")
+    parser.add_argument("--mongo-uri", default=MONGO_URI)
+    parser.add_argument("--db", default=DB_NAME)
+    parser.add_argument(
+        "--batch-size", type=int, default=BATCH_SIZE,
+        help="documents per insert_many (default: tuned per collection from document size)",
+    )
+    parser.add_argument("--in-flight", type=int, default=BULK_MAX_IN_FLIGHT, help="concurrent insert batches")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--keep", action="store_true", help="do not drop existing collections")
+    parser.add_argument(
+        "--no-memory-report", action="store_true",
+        help="skip tracemalloc peak-memory tracking (it slows conversion down ~2-3x)",
+    )
+    args = parser.parse_args()
+
     # Resolve ZIP path relative to script location
     script_dir = Path(__file__).parent
-    zip_path = script_dir / ZIP_PATH
-    zip_path = zip_path.resolve()
-    
-    print(f"Script directory: {script_dir}")
+    zip_path = (script_dir / args.zip).resolve()
     print(f"Looking for ZIP file at: {zip_path}")
-    
-    # Check if ZIP file exists
     if not zip_path.exists():
         print(f"ERROR: ZIP file not found at {zip_path}")
-        print(f"Current working directory: {os.getcwd()}")
         sys.exit(1)
-    
-    print(f"Found ZIP file: {zip_path}")
-    
+
     # Test MongoDB connection
     try:
-        print(f"Connecting to MongoDB at {MONGO_URI}...")
-        client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000)
-        # Test connection
+        print(f"Connecting to MongoDB at {args.mongo_uri}...")
+        client = MongoClient(args.mongo_uri, serverSelectionTimeoutMS=5000)
         client.admin.command('ping')
         print("✓ MongoDB connection successful")
     except ConnectionFailure as e:
         print(f"ERROR: Failed to connect to MongoDB: {e}")
         sys.exit(1)
-    except Exception as e:
-        print(f"ERROR: Unexpected error connecting to MongoDB: {e}")
-        sys.exit(1)
-    
-    db = client[DB_NAME]
-    print(f"Using database: {DB_NAME}")
 
-    try:
-        with tempfile.TemporaryDirectory() as tmp:
-            print(f"Extracting ZIP to temporary directory...")
-            try:
-                with zipfile.ZipFile(zip_path) as z:
-                    z.extractall(tmp)
-                    print(f"✓ ZIP extracted successfully")
-            except zipfile.BadZipFile as e:
-                print(f"ERROR: Invalid ZIP file: {e}")
-                sys.exit(1)
-            except Exception as e:
-                print(f"ERROR: Failed to extract ZIP file: {e}")
-                sys.exit(1)
+    db = client[args.db]
+    print(f"Using database: {args.db}")
 
-            # Find CSV files recursively (handles subdirectories like 'test/')
-            csv_files = list(Path(tmp).rglob("*.csv"))
-            if not csv_files:
-                print(f"WARNING: No CSV files found in ZIP archive")
-                print(f"Files in ZIP: {list(Path(tmp).iterdir())}")
+    if not args.no_memory_report:
+        tracemalloc.start()
+    summary = []
+    try:
+        # CSV members are read straight from the archive, nothing is extracted
+        with zipfile.ZipFile(zip_path) as zf:
+            members = [name for name in zf.namelist() if name.endswith(".csv")]
+            if not members:
+                print("WARNING: No CSV files found in ZIP archive")
                 sys.exit(1)
-            
-            print(f"Found {len(csv_files)} CSV file(s)")
-
-            for csv_file in csv_files:
-                # Extract collection name from db.collection.csv format
-                # e.g., "insightify.activities.csv" -> "activities"
-                stem = csv_file.stem  # "insightify.activities"
-                parts = stem.split('.')
-                if len(parts) >= 2:
-                    # Take everything after the first part (db name)
-                    collection_name = '.'.join(parts[1:])
-                else:
-                    # Fallback: use the whole stem if no dots found
-                    collection_name = stem
-                
-                print(f"\nImporting: {collection_name} (from {csv_file.name})")
-
-                try:
-                    df = pd.read_csv(csv_file)
-                    print(f"  → Read {len(df)} rows from CSV")
-                except Exception as e:
-                    print(f"  ERROR: Failed to read CSV file {csv_file}: {e}")
-                    continue
-
-                try:
-                    docs = convert_df(df)
-                    print(f"  → Converted {len(docs)} documents")
-                except Exception as e:
-                    print(f"  ERROR: Failed to convert DataFrame: {e}")
-                    continue
-
-                col = db[collection_name]
-
-                if DROP_COLLECTIONS:
-                    print(f"  → Dropping existing collection...")
-                    col.drop()
+            print(f"Found {len(members)} CSV file(s)")
 
+            for member in members:
                 try:
-                    inserted_count = 0
-                    for i in range(0, len(docs), BATCH_SIZE):
-                        batch = docs[i:i+BATCH_SIZE]
-                        result = col.insert_many(batch)
-                        inserted_count += len(result.inserted_ids)
-                        print(f"  → Inserted batch {i//BATCH_SIZE + 1} ({len(batch)} documents)")
-
-                    print(f"  ✓ Successfully inserted {inserted_count} documents into '{collection_name}'")
+                    summary.append(import_member(
+                        db, zf, member, args.batch_size, args.chunk_rows, DROP_COLLECTIONS and not args.keep,
+                        args.in_flight,
+                    ))
                 except BulkWriteError as e:
                     print(f"  ERROR: Bulk write error: {e.details}")
-                    continue
                 except Exception as e:
-                    print(f"  ERROR: Failed to insert documents: {e}")
-                    continue
-
-        print("\n✓ Done.")
-    except Exception as e:
-        print(f"\nERROR: Unexpected error in main execution: {e}")
-        import traceback
-        traceback.print_exc()
+                    print(f"  ERROR: Failed to import {member}: {e}")
+    except zipfile.BadZipFile as e:
+        print(f"ERROR: Invalid ZIP file: {e}")
         sys.exit(1)
     finally:
+        tracemalloc.stop()
         client.close()
 
+    print("\nCollection             rows   batch   seconds  peak MiB")
+    for stats in summary:
+        print(
+            f"{stats['collection']:<20} {stats['rows']:>6} {stats['batch_size'] or 0:>7} "
+            f"{stats['seconds']:>9.2f} {stats['peak_mib']:>9.1f}"
+        )
+    print("\n✓ Done.")
+
 
 if __name__ == "__main__":
     main()
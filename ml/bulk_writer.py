@@ -0,0 +1,148 @@
+"""
+Pipelined bulk inserts shared by the data loaders (bulk_mongo.py, mockdata.py).
+
+BulkWriter buffers documents and hands full batches to a small thread pool, so
+the caller keeps converting the next documents while earlier batches are in
+flight. At most `max_in_flight` batches are outstanding; add() blocks beyond
+that, which keeps memory flat however fast documents are produced.
+
+Batches are unordered. Duplicate-key errors (code 11000) are counted as
+skipped documents, like the loaders always did; any other write error is
+raised from add() or close(). With upsert=True each document replaces the one
+with its `_id` (inserting it when missing) instead of being inserted, so a
+batch can be written again safely. `on_written` is called, from a writer
+thread, with every batch once it is stored.
+
+When no batch size is given it is derived from the collection's documents:
+enough documents to fill about BULK_BATCH_BYTES of BSON, within
+[MIN_BATCH_SIZE, MAX_BATCH_SIZE].
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import bson
+from pymongo import ReplaceOne
+from pymongo.errors import BulkWriteError
+
+BULK_MAX_IN_FLIGHT = int(os.getenv("BULK_MAX_IN_FLIGHT", "4"))
+BULK_BATCH_BYTES = int(os.getenv("BULK_BATCH_BYTES", str(4 * 1024 * 1024)))
+MIN_BATCH_SIZE = 100
+MAX_BATCH_SIZE = 10000
+SIZE_SAMPLE = 50
+
+
+def tuned_batch_size(docs: List[Dict[str, Any]], target_bytes: int = BULK_BATCH_BYTES) -> int:
+    """Batch size that fills about `target_bytes` given these documents' BSON size."""
+    sample = docs[:SIZE_SAMPLE]
+    if not sample:
+        return MIN_BATCH_SIZE
+    avg_bytes = sum(len(bson.encode(doc)) for doc in sample) / len(sample)
+    return int(min(MAX_BATCH_SIZE, max(MIN_BATCH_SIZE, target_bytes // max(avg_bytes, 1))))
+
+
+class BulkWriter:
+    def __init__(
+        self,
+        collection,
+        batch_size: Optional[int] = None,
+        max_in_flight: int = BULK_MAX_IN_FLIGHT,
+        upsert: bool = False,
+        on_written: Optional[Callable[[List[Dict[str, Any]]], None]] = None,
+    ):
+        self.collection = collection
+        self.batch_size = batch_size
+        self.max_in_flight = max(1, max_in_flight)
+        self.upsert = upsert
+        self.on_written = on_written
+        self.inserted = 0
+        self.replaced = 0
+        self.duplicates = 0
+        self.batches = 0
+        self.seconds = 0.0
+
+        self._pending: List[Dict[str, Any]] = []
+        self._slots = threading.BoundedSemaphore(self.max_in_flight)
+        self._pool = ThreadPoolExecutor(self.max_in_flight, thread_name_prefix=f"bulk-{collection.name}")
+        self._futures = []
+        self._lock = threading.Lock()
+        self._started = time.perf_counter()
+
+    def __enter__(self) -> "BulkWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            # don't mask the caller's error; just stop the pool
+            self._pool.shutdown(wait=True, cancel_futures=True)
+
+    def _write(self, batch: List[Dict[str, Any]]) -> None:
+        replaced = duplicates = 0
+        try:
+            if self.upsert:
+                requests = [ReplaceOne({"_id": doc["_id"]}, doc, upsert=True) for doc in batch]
+                result = self.collection.bulk_write(requests, ordered=False)
+                inserted, replaced = result.upserted_count, result.matched_count
+            else:
+                inserted = len(self.collection.insert_many(batch, ordered=False).inserted_ids)
+        except BulkWriteError as bwe:
+            write_errors = bwe.details.get("writeErrors", [])
+            if any(err.get("code") != 11000 for err in write_errors):
+                raise
+            inserted = bwe.details.get("nInserted", 0) + bwe.details.get("nUpserted", 0)
+            replaced = bwe.details.get("nMatched", 0)
+            duplicates = len(write_errors)
+        finally:
+            self._slots.release()
+        with self._lock:
+            self.inserted += inserted
+            self.replaced += replaced
+            self.duplicates += duplicates
+            self.batches += 1
+        if self.on_written is not None:
+            self.on_written(batch)
+
+    def _raise_failed(self) -> None:
+        done = [future for future in self._futures if future.done()]
+        self._futures = [future for future in self._futures if not future.done()]
+        for future in done:
+            future.result()
+
+    def _submit(self, batch: List[Dict[str, Any]]) -> None:
+        self._slots.acquire()
+        self._futures.append(self._pool.submit(self._write, batch))
+        self._raise_failed()
+
+    def add(self, docs: Iterable[Dict[str, Any]]) -> None:
+        """Queue documents; full batches are written in the background."""
+        self._pending.extend(docs)
+        if self.batch_size is None:
+            if not self._pending:
+                return
+            self.batch_size = tuned_batch_size(self._pending)
+        while len(self._pending) >= self.batch_size:
+            batch = self._pending[: self.batch_size]
+            del self._pending[: self.batch_size]
+            self._submit(batch)
+
+    def close(self) -> "BulkWriter":
+        """Write what is left, wait for every batch and raise the first failure."""
+        if self._pending:
+            batch, self._pending = self._pending, []
+            self._submit(batch)
+        try:
+            for future in self._futures:
+                future.result()
+        finally:
+            self._futures = []
+            self._pool.shutdown(wait=True)
+            self.seconds = time.perf_counter() - self._started
+        return self
+
+    @property
+    def docs_per_second(self) -> float:
+        return (self.inserted + self.replaced + self.duplicates) / self.seconds if self.seconds else 0.0
@@ -1,21 +1,35 @@
+import argparse
 import hashlib
+import json
 import os
+import threading
+import time
+import warnings
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
 
+import bson
+import numpy as np
 import pandas as pd
 from bson import ObjectId
 from dotenv import load_dotenv
 from pymongo import MongoClient
 from pymongo.errors import BulkWriteError
 
+from bulk_writer import BulkWriter
+
 
 load_dotenv()
 
 # Paths
 ROOT_DIR = Path(__file__).resolve().parent
 DATA_DIR = ROOT_DIR / "dataset" / "raw"
+# CSV rows converted per yielded batch of documents
+CHUNK_SIZE = 5000
+# incremental ingest state (--incremental)
+DEFAULT_CHECKPOINT = ROOT_DIR / "mockdata.checkpoint.json"
+CHECKPOINT_EVERY_SECONDS = 10
 
 # Mongo connection
 MONGO_URI = os.getenv("MONGO_URI")
@@ -28,26 +42,6 @@ client = MongoClient(MONGO_URI)
 db = client[MONGO_DB]
 
 
-def parse_dt(value: Any) -> Optional[datetime]:
-    """Parse datetime strings from CSV into datetime objects."""
-    if value is None or (isinstance(value, float) and pd.isna(value)):
-        return None
-    parsed = pd.to_datetime(str(value), errors="coerce")
-    if pd.isna(parsed):
-        return None
-    return parsed.to_pydatetime()
-
-
-def clean_int(value: Any) -> Optional[int]:
-    """Normalize stringified numbers that include thousands separators."""
-    if value is None or (isinstance(value, float) and pd.isna(value)):
-        return None
-    try:
-        return int(str(value).replace(",", "").strip())
-    except ValueError:
-        return None
-
-
 def make_object_id(seed: str) -> ObjectId:
     """Deterministic ObjectId from a seed string to keep relations stable."""
     digest = hashlib.md5(seed.encode("utf-8")).hexdigest()
@@ -59,196 +53,411 @@ def load_csv(name: str, **kwargs) -> pd.DataFrame:
     return pd.read_csv(path, thousands=",", **kwargs)
 
 
-def build_activities(limit: int = 1000) -> List[Dict[str, Any]]:
+def iter_csv(name: str, required: List[str], chunk_size: int, limit: Optional[int] = None) -> Iterator[pd.DataFrame]:
+    """
+    Stream a raw CSV in chunks, dropping rows missing any `required` column.
+    Stops after `limit` kept rows (None keeps everything).
+    """
+    remaining = limit
+    with load_csv(name, chunksize=chunk_size) as reader:
+        for chunk in reader:
+            chunk = chunk.dropna(subset=required)
+            if remaining is not None:
+                chunk = chunk.head(remaining)
+                remaining -= len(chunk)
+            if not chunk.empty:
+                yield chunk
+            if remaining == 0:
+                return
+
+
+def parse_dt_column(values: pd.Series) -> pd.Series:
+    """
+    Parse CSV datetime strings, NaT where they do not parse. The format is
+    inferred once for the whole column; values that do not match it are
+    re-parsed with a per-value format.
+    """
+    text = values.map(str, na_action="ignore")
+    with warnings.catch_warnings():
+        # raised when no single format can be inferred; the retry covers it
+        warnings.simplefilter("ignore", UserWarning)
+        parsed = pd.to_datetime(text, errors="coerce")
+    retry = parsed.isna() & text.notna()
+    if retry.any():
+        parsed[retry] = pd.to_datetime(text[retry], errors="coerce", format="mixed")
+    return parsed
+
+
+def to_datetimes(parsed: pd.Series) -> List[Optional[datetime]]:
+    """Parsed column as datetime objects, None where parsing failed."""
+    values = parsed.dt.to_pydatetime().to_numpy(dtype=object, copy=True)
+    values[parsed.isna().to_numpy()] = None
+    return values.tolist()
+
+
+def clean_int_column(values: pd.Series) -> pd.Series:
+    """Stringified numbers with thousands separators as a nullable Int64 column."""
+    if pd.api.types.is_integer_dtype(values):
+        return values.astype("Int64")
+    text = values.map(str, na_action="ignore").str.replace(",", "", regex=False).str.strip()
+    valid = text.str.fullmatch(r"[+-]?\d+").fillna(False).astype(bool)
+    return pd.to_numeric(text.where(valid), errors="coerce").astype("Int64")
+
+
+def int_seed_column(values: pd.Series) -> pd.Series:
+    """Seed strings for a clean_int_column result: the number, or "None" when missing."""
+    return values.astype("string").fillna("None").astype(object)
+
+
+def make_object_ids(seeds: pd.Series) -> List[ObjectId]:
+    """make_object_id over a column of seeds; each distinct seed is hashed once."""
+    ids = {seed: make_object_id(seed) for seed in seeds.unique()}
+    return seeds.map(ids).tolist()
+
+
+def positive_seconds(start: pd.Series, end: pd.Series, floor: int, default: int) -> List[int]:
+    """
+    Whole seconds from start to end, at least `floor`; `default` when either
+    side is missing or the span is not positive.
+    """
+    diff = (end - start).dt.total_seconds()
+    seconds = np.maximum(floor, np.floor(diff.fillna(0)))
+    return np.where(diff > 0, seconds, default).astype(int).tolist()
+
+
+def build_activities(limit: Optional[int] = None, chunk_size: int = CHUNK_SIZE) -> Iterator[List[Dict[str, Any]]]:
     """
     Map developer_journey_trackings into Activity documents.
 
     - Use records with completed_at not null (clean data requirement).
     - Split each record into started and completed Activity entries.
     - Limit to `limit` base rows (will produce up to 2 * limit docs).
-    """
-    df = load_csv("developer_journey_trackings.csv")
-    df = df.dropna(subset=["completed_at"]).head(limit)
 
-    docs: List[Dict[str, Any]] = []
+    Yields lists of up to 2 * chunk_size documents.
+    """
+    for df in iter_csv("developer_journey_trackings.csv", ["completed_at"], chunk_size, limit):
+        user_ids = make_object_ids("user-" + df["developer_id"].map(str))
+        course_ids = make_object_ids("course-" + df["journey_id"].map(str))
+        module_ids = make_object_ids("module-" + df["tutorial_id"].map(str))
+        start_ids = make_object_ids("activity-start-" + df["id"].map(str))
+        complete_ids = make_object_ids("activity-complete-" + df["id"].map(str))
+
+        started_source = df["first_opened_at"] if "first_opened_at" in df else df.get("last_viewed")
+        if started_source is None:
+            started_source = pd.Series(None, index=df.index, dtype=object)
+        started = to_datetimes(parse_dt_column(started_source))
+        completed = to_datetimes(parse_dt_column(df["completed_at"]))
+
+        docs: List[Dict[str, Any]] = []
+        rows = zip(user_ids, course_ids, module_ids, start_ids, complete_ids, started, completed)
+        for user_id, course_id, module_id, start_id, complete_id, started_at, completed_at in rows:
+            if started_at:
+                docs.append(
+                    {
+                        "_id": start_id,
+                        "userId": user_id,
+                        "courseId": course_id,
+                        "moduleId": module_id,
+                        "status": "started",
+                        "timestamp": started_at,
+                    }
+                )
+            if completed_at:
+                docs.append(
+                    {
+                        "_id": complete_id,
+                        "userId": user_id,
+                        "courseId": course_id,
+                        "moduleId": module_id,
+                        "status": "completed",
+                        "timestamp": completed_at,
+                    }
+                )
+        yield docs
 
-    for _, row in df.iterrows():
-        user_seed = str(row.get("developer_id"))
-        course_seed = str(row.get("journey_id"))
-        module_seed = str(row.get("tutorial_id"))
 
-        user_id = make_object_id(f"user-{user_seed}")
-        course_id = make_object_id(f"course-{course_seed}")
-        module_id = make_object_id(f"module-{module_seed}")
+def build_quizzes(limit: Optional[int] = None, chunk_size: int = CHUNK_SIZE) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Map exam_registrations into Quiz documents.
 
-        started_at = parse_dt(row.get("first_opened_at") or row.get("last_viewed"))
-        completed_at = parse_dt(row.get("completed_at"))
+    Only keep rows with both created_at and deadline_at to derive durations.
+    Yields lists of up to chunk_size documents.
+    """
+    required = ["created_at", "deadline_at", "exam_module_id"]
+    for df in iter_csv("exam_registrations.csv", required, chunk_size, limit):
+        module_ids = make_object_ids("module-" + int_seed_column(clean_int_column(df["exam_module_id"])))
+        quiz_ids = make_object_ids("quiz-" + df["id"].map(str))
+        # 1800s when a date is unparseable or the deadline is not after creation
+        durations = positive_seconds(
+            parse_dt_column(df["created_at"]), parse_dt_column(df["deadline_at"]), 600, 1800,
+        )
+        tutorials = clean_int_column(df["tutorial_id"])
+        labels = tutorials.astype(object).where(tutorials.notna() & (tutorials != 0), "tutorial").tolist()
 
-        if started_at:
+        docs: List[Dict[str, Any]] = []
+        for quiz_id, module_id, duration_seconds, tutorial_label in zip(quiz_ids, module_ids, durations, labels):
             docs.append(
                 {
-                    "_id": make_object_id(f"activity-start-{row.get('id')}"),
-                    "userId": user_id,
-                    "courseId": course_id,
+                    "_id": quiz_id,
                     "moduleId": module_id,
-                    "status": "started",
-                    "timestamp": started_at,
+                    "maximumDuration": duration_seconds,
+                    "questions": [
+                        {
+                            "question": f"Auto-generated question for tutorial {tutorial_label}",
+                            "options": [
+                                "Placeholder option A",
+                                "Placeholder option B",
+                                "Placeholder option C",
+                                "Placeholder option D",
+                            ],
+                            "answer": 0,
+                        }
+                    ],
                 }
             )
+        yield docs
+
+
+def load_registrations() -> pd.DataFrame:
+    """exam_registrations linkage (module and user seeds) keyed by registration id."""
+    reg_df = load_csv("exam_registrations.csv", usecols=["id", "exam_module_id", "examinees_id"])
+    reg_df = pd.DataFrame({
+        "reg_id": clean_int_column(reg_df["id"]),
+        "module_seed": int_seed_column(clean_int_column(reg_df["exam_module_id"])),
+        "user_seed": int_seed_column(clean_int_column(reg_df["examinees_id"])),
+    })
+    reg_df = reg_df.dropna(subset=["reg_id"]).drop_duplicates("reg_id")
+    return reg_df.set_index("reg_id")
+
+
+def build_quiz_results(limit: Optional[int] = None, chunk_size: int = CHUNK_SIZE) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Map exam_results into QuizResult documents, joining exam_registrations
+    to pull module and user linkage.
 
-        if completed_at:
+    Yields lists of up to chunk_size documents.
+    """
+    reg_df = load_registrations()
+
+    for results_df in iter_csv("exam_results.csv", ["exam_registration_id", "score"], chunk_size, limit):
+        reg_ids = clean_int_column(results_df["exam_registration_id"])
+        reg = reg_df.reindex(reg_ids)
+        found = reg["module_seed"].notna().to_numpy()
+        reg_seed = int_seed_column(reg_ids).to_numpy()
+
+        quiz_seeds = np.where(
+            reg_ids.notna().to_numpy(),
+            "quiz-" + reg_seed,
+            "quiz-missing-" + results_df["id"].map(str).to_numpy(),
+        )
+        module_seeds = np.where(found, reg["module_seed"].to_numpy(), "reg-" + reg_seed)
+        user_seeds = np.where(found, reg["user_seed"].to_numpy(), "user-" + reg_seed)
+
+        quiz_ids = make_object_ids(pd.Series(quiz_seeds))
+        module_ids = make_object_ids("module-" + pd.Series(module_seeds))
+        user_ids = make_object_ids("user-" + pd.Series(user_seeds))
+        result_ids = make_object_ids("quiz-result-" + results_df["id"].map(str))
+
+        scores = pd.to_numeric(results_df["score"], errors="coerce").fillna(0).astype(float).tolist()
+        totals = pd.to_numeric(results_df["total_questions"], errors="coerce").fillna(0).astype(int).tolist()
+        passed = pd.to_numeric(results_df["is_passed"], errors="coerce").fillna(0).astype(int).astype(bool).tolist()
+
+        created = parse_dt_column(results_df["created_at"])
+        durations = positive_seconds(created, parse_dt_column(results_df["look_report_at"]), 60, 900)
+        # missing timestamps stay None here and get the load time in
+        # fill_timestamps(), after incremental ingest has fingerprinted them
+        timestamps = to_datetimes(created)
+
+        docs: List[Dict[str, Any]] = []
+        rows = zip(result_ids, quiz_ids, user_ids, module_ids, scores, totals, passed, durations, timestamps)
+        for result_id, quiz_id, user_id, module_id, score, total_questions, is_passed, duration, timestamp in rows:
             docs.append(
                 {
-                    "_id": make_object_id(f"activity-complete-{row.get('id')}"),
+                    "_id": result_id,
+                    "quizId": quiz_id,
                     "userId": user_id,
-                    "courseId": course_id,
                     "moduleId": module_id,
-                    "status": "completed",
-                    "timestamp": completed_at,
+                    "score": score,
+                    "totalQuestions": total_questions,
+                    "passed": is_passed,
+                    "duration": duration,
+                    "timestamp": timestamp,
                 }
             )
+        yield docs
 
-    return docs
-
-
-def build_quizzes(limit: int = 1000) -> List[Dict[str, Any]]:
-    """
-    Map exam_registrations into Quiz documents.
-
-    Only keep rows with both created_at and deadline_at to derive durations.
-    """
-    df = load_csv("exam_registrations.csv")
-    df = df.dropna(subset=["created_at", "deadline_at", "exam_module_id"]).head(limit)
 
-    docs: List[Dict[str, Any]] = []
+def fill_timestamps(docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Default quiz results without a created_at to the time they are loaded."""
+    now = datetime.utcnow()
+    for doc in docs:
+        if "timestamp" in doc and doc["timestamp"] is None:
+            doc["timestamp"] = now
+    return docs
 
-    for _, row in df.iterrows():
-        module_seed = str(clean_int(row.get("exam_module_id")))
-        module_id = make_object_id(f"module-{module_seed}")
 
-        created_at = parse_dt(row.get("created_at"))
-        deadline_at = parse_dt(row.get("deadline_at"))
+def insert_documents(collection_name: str, batches: Iterable[List[Dict[str, Any]]]) -> None:
+    """Insert batches of documents; the next batch is built while earlier ones are written."""
+    writer = BulkWriter(db[collection_name])
+    try:
+        with writer:
+            for docs in batches:
+                writer.add(fill_timestamps(docs))
+    except BulkWriteError:
+        print(f"[error] Inserted {writer.inserted} docs into {collection_name} before failure")
+        raise
+
+    if writer.duplicates:
+        print(
+            f"[ok-partial] Inserted {writer.inserted} docs into {collection_name}, "
+            f"skipped {writer.duplicates} duplicates"
+        )
+    elif writer.inserted:
+        print(f"[ok] Inserted {writer.inserted} documents into {collection_name} ({writer.docs_per_second:.0f} docs/s)")
+    else:
+        print(f"[skip] No documents to insert into {collection_name}")
 
-        duration_seconds = 1800  # sensible default
-        if created_at and deadline_at:
-            diff = (deadline_at - created_at).total_seconds()
-            if diff > 0:
-                duration_seconds = max(600, int(diff))
 
-        tutorial_label = clean_int(row.get("tutorial_id")) or "tutorial"
+def file_digest(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
 
-        docs.append(
-            {
-                "_id": make_object_id(f"quiz-{row.get('id')}"),
-                "moduleId": module_id,
-                "maximumDuration": duration_seconds,
-                "questions": [
-                    {
-                        "question": f"Auto-generated question for tutorial {tutorial_label}",
-                        "options": [
-                            "Placeholder option A",
-                            "Placeholder option B",
-                            "Placeholder option C",
-                            "Placeholder option D",
-                        ],
-                        "answer": 0,
-                    }
-                ],
-            }
-        )
 
-    return docs
+def doc_fingerprint(doc: Dict[str, Any]) -> str:
+    return hashlib.blake2b(bson.encode(doc), digest_size=8).hexdigest()
 
 
-def build_quiz_results(limit: int = 1000) -> List[Dict[str, Any]]:
+class IngestCheckpoint:
     """
-    Map exam_results into QuizResult documents, joining exam_registrations
-    to pull module and user linkage.
+    Incremental ingest state, per collection: the digests of the CSVs it was
+    built from, whether that build finished, and a fingerprint of every
+    document known to be stored, keyed by `_id`.
+
+    Fingerprints are taken before load-time defaults are filled in, so a
+    document without a created_at keeps the same fingerprint across runs.
+    They are recorded from the writer threads as batches land, and
+    the file is rewritten at most every CHECKPOINT_EVERY_SECONDS, so an
+    interrupted run resumes without rewriting what was already stored.
     """
-    reg_df = load_csv("exam_registrations.csv")
-    reg_df["reg_id"] = reg_df["id"].apply(clean_int)
-    reg_df["module_seed"] = reg_df["exam_module_id"].apply(clean_int)
-    reg_df["user_seed"] = reg_df["examinees_id"].apply(clean_int)
-    reg_df = reg_df.set_index("reg_id")
-
-    results_df = load_csv("exam_results.csv")
-    results_df = results_df.dropna(subset=["exam_registration_id", "score"]).head(limit)
-
-    docs: List[Dict[str, Any]] = []
-
-    for _, row in results_df.iterrows():
-        reg_id = clean_int(row.get("exam_registration_id"))
-        reg = reg_df.loc[reg_id] if reg_id in reg_df.index else None
-
-        quiz_id = make_object_id(f"quiz-{reg_id}") if reg_id is not None else make_object_id(
-            f"quiz-missing-{row.get('id')}"
-        )
-        module_seed = str(reg["module_seed"]) if reg is not None else f"reg-{reg_id}"
-        user_seed = str(reg["user_seed"]) if reg is not None else f"user-{reg_id}"
-
-        module_id = make_object_id(f"module-{module_seed}")
-        user_id = make_object_id(f"user-{user_seed}")
-
-        score = row.get("score")
-        total_questions = row.get("total_questions") or 0
-        passed = bool(int(row.get("is_passed"))) if not pd.isna(row.get("is_passed")) else False
-
-        created_at = parse_dt(row.get("created_at"))
-        look_report_at = parse_dt(row.get("look_report_at"))
-        duration_seconds = 900
-        if created_at and look_report_at:
-            diff = (look_report_at - created_at).total_seconds()
-            if diff > 0:
-                duration_seconds = max(60, int(diff))
-
-        docs.append(
-            {
-                "_id": make_object_id(f"quiz-result-{row.get('id')}"),
-                "quizId": quiz_id,
-                "userId": user_id,
-                "moduleId": module_id,
-                "score": float(score) if not pd.isna(score) else 0,
-                "totalQuestions": int(total_questions) if not pd.isna(total_questions) else 0,
-                "passed": passed,
-                "duration": duration_seconds,
-                "timestamp": created_at or datetime.utcnow(),
-            }
-        )
-
-    return docs
-
 
-def insert_documents(collection_name: str, docs: List[Dict[str, Any]]) -> None:
-    if not docs:
-        print(f"[skip] No documents to insert into {collection_name}")
+    def __init__(self, path: Path):
+        self.path = path
+        self.sources: Dict[str, Dict[str, Any]] = json.loads(path.read_text()) if path.exists() else {}
+        self._lock = threading.Lock()
+        self._saved_at = time.monotonic()
+
+    def source(self, collection_name: str) -> Dict[str, Any]:
+        return self.sources.setdefault(collection_name, {"inputs": {}, "complete": False, "fingerprints": {}})
+
+    def reset(self, collection_name: str) -> Dict[str, Any]:
+        self.sources.pop(collection_name, None)
+        return self.source(collection_name)
+
+    def record(self, collection_name: str, docs: List[Dict[str, Any]], pending: Dict[str, str]) -> None:
+        """Store the fingerprints `pending` holds for a written batch."""
+        fingerprints = {key: pending.pop(key) for key in (str(doc["_id"]) for doc in docs)}
+        with self._lock:
+            self.sources[collection_name]["fingerprints"].update(fingerprints)
+
+    def save(self, force: bool = True) -> None:
+        if not force and time.monotonic() - self._saved_at < CHECKPOINT_EVERY_SECONDS:
+            return
+        with self._lock:
+            text = json.dumps(self.sources)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(text)
+        tmp.replace(self.path)
+        self._saved_at = time.monotonic()
+
+
+def ingest_incremental(
+    collection_name: str,
+    csv_names: List[str],
+    build: Callable[[], Iterable[List[Dict[str, Any]]]],
+    checkpoint: IngestCheckpoint,
+) -> None:
+    """
+    Load only what changed since the last ingest. A collection whose CSVs
+    are unchanged and whose last build finished is skipped without parsing
+    anything; otherwise documents whose fingerprint matches the checkpoint
+    are dropped locally and the rest are upserted by `_id`.
+    """
+    collection = db[collection_name]
+    inputs = {name: file_digest(DATA_DIR / name) for name in csv_names}
+    state = checkpoint.source(collection_name)
+    if state["fingerprints"] and collection.estimated_document_count() < len(state["fingerprints"]):
+        # the collection was emptied or dropped behind our back
+        print(f"[reset] {collection_name} holds fewer documents than its checkpoint; reloading")
+        state = checkpoint.reset(collection_name)
+    if state["complete"] and state["inputs"] == inputs:
+        print(f"[skip] {collection_name} is up to date")
         return
-    try:
-        result = db[collection_name].insert_many(docs, ordered=False)
-        print(f"[ok] Inserted {len(result.inserted_ids)} documents into {collection_name}")
-    except BulkWriteError as bwe:
-        write_errors = bwe.details.get("writeErrors", [])
-        dup_errors = [err for err in write_errors if err.get("code") == 11000]
-        non_dup_errors = [err for err in write_errors if err.get("code") != 11000]
-        inserted = bwe.details.get("nInserted", 0)
-
-        if non_dup_errors:
-            print(f"[error] Inserted {inserted} docs into {collection_name} before failure")
-            raise
 
-        skipped = len(dup_errors)
-        print(f"[ok-partial] Inserted {inserted} docs into {collection_name}, skipped {skipped} duplicates")
+    state["inputs"], state["complete"] = inputs, False
+    known = state["fingerprints"]
+    unchanged = 0
+    # fingerprints of documents handed to the writer, until their batch lands
+    pending: Dict[str, str] = {}
+    writer = BulkWriter(
+        collection, upsert=True, on_written=lambda batch: checkpoint.record(collection_name, batch, pending)
+    )
+    try:
+        with writer:
+            for docs in build():
+                changed = []
+                for doc in docs:
+                    key, fingerprint = str(doc["_id"]), doc_fingerprint(doc)
+                    if known.get(key) != fingerprint:
+                        pending[key] = fingerprint
+                        changed.append(doc)
+                unchanged += len(docs) - len(changed)
+                writer.add(fill_timestamps(changed))
+                checkpoint.save(force=False)
+    finally:
+        checkpoint.save()
+
+    state["complete"] = True
+    checkpoint.save()
+    print(
+        f"[ok] {collection_name}: inserted {writer.inserted}, updated {writer.replaced}, "
+        f"unchanged {unchanged}"
+    )
 
 
 def main() -> None:
-    activities = build_activities(limit=1000)
-    quizzes = build_quizzes(limit=1000)
-    quiz_results = build_quiz_results(limit=1000)
-
-    insert_documents("activities", activities)
-    insert_documents("quizzes", quizzes)
-    insert_documents("quizresults", quiz_results)
+    parser = argparse.ArgumentParser(description="Load the raw CSVs in dataset/raw into MongoDB.")
+    parser.add_argument(
+        "--incremental", action="store_true",
+        help="skip documents already loaded (per the checkpoint) and upsert changed ones",
+    )
+    parser.add_argument("--checkpoint", type=Path, default=DEFAULT_CHECKPOINT)
+    parser.add_argument("--restart", action="store_true", help="ignore an existing checkpoint")
+    args = parser.parse_args()
+
+    # collection, main CSV, builder, every CSV the builder reads
+    sources = [
+        ("activities", "developer_journey_trackings.csv", build_activities, ["developer_journey_trackings.csv"]),
+        ("quizzes", "exam_registrations.csv", build_quizzes, ["exam_registrations.csv"]),
+        ("quizresults", "exam_results.csv", build_quiz_results, ["exam_results.csv", "exam_registrations.csv"]),
+    ]
+    checkpoint = None
+    if args.incremental:
+        if args.restart and args.checkpoint.exists():
+            args.checkpoint.unlink()
+        checkpoint = IngestCheckpoint(args.checkpoint)
+
+    for collection_name, csv_name, build, inputs in sources:
+        if not (DATA_DIR / csv_name).exists():
+            print(f"[skip] {csv_name} not found in {DATA_DIR}")
+            continue
+        if checkpoint is not None:
+            ingest_incremental(collection_name, inputs, build, checkpoint)
+        else:
+            insert_documents(collection_name, build())
 
 
 if __name__ == "__main__":
     main()
-
@@ -0,0 +1,143 @@
+"""
+Offline bulk re-scoring of existing mlprofiles.
+
+Only users that already have a profile are re-scored: the backend creates a
+profile once a user passes its ML_MIN_HISTORY_DAYS gate and reports the
+others as pending, so users without history never get one from here.
+
+Streams profile userIds in ascending order in chunks, computes each chunk's
+features with grouped `$in` queries/aggregations (no per-user queries),
+scores the chunk with the service's loaded ClusterInferenceService model and
+writes the profiles back with unordered bulk updates. Memory stays bounded by
+the chunk size.
+
+After every chunk the last processed userId is written to a checkpoint
+file, so an interrupted run continues where it stopped:
+
+    python rescore.py --chunk-size 1000 --engine mongo
+    python rescore.py --restart          # ignore an existing checkpoint
+"""
+import argparse
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+from bson import json_util
+from pymongo import UpdateOne
+
+APP_DIR = Path(__file__).resolve().parent / "app"
+sys.path.insert(0, str(APP_DIR))
+
+import prepare_data  # noqa: E402
+from feature_engines import get_engine  # noqa: E402
+from main import service  # noqa: E402
+
+DEFAULT_CHECKPOINT = Path(__file__).resolve().parent / "rescore.checkpoint.json"
+
+
+def load_checkpoint(path: Path) -> dict:
+    if not path.exists():
+        return {"last_user_id": None, "processed": 0, "failed": 0}
+    return json_util.loads(path.read_text())
+
+
+def save_checkpoint(path: Path, checkpoint: dict) -> None:
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json_util.dumps(checkpoint))
+    tmp.replace(path)
+
+
+def iter_user_chunks(chunk_size: int, after=None):
+    """Yield lists of mlprofile userIds in ascending order, starting after `after`."""
+    last = after
+    while True:
+        query = {"userId": {"$gt": last}} if last is not None else {}
+        chunk = [
+            doc["userId"]
+            for doc in prepare_data.get_db().mlprofiles.find(query, {"userId": 1}).sort("userId", 1).limit(chunk_size)
+        ]
+        if not chunk:
+            return
+        yield chunk
+        last = chunk[-1]
+
+
+def profile_updates(results: dict, generated_at: datetime) -> list:
+    """
+    UpdateOnes shaped like the backend's MlProfile documents. They do not
+    upsert, so a profile deleted since it was listed is not re-created.
+    """
+    return [
+        UpdateOne(
+            {"userId": user_id},
+            {
+                "$set": {
+                    "payload": {"user_id": str(user_id), "result": result},
+                    "generatedAt": generated_at,
+                    "updatedAt": generated_at,
+                },
+            },
+        )
+        for user_id, result in results.items()
+    ]
+
+
+def score_chunk(user_ids: list, engine: str):
+    """Returns ({user_id: result}, {user_id: error}) for one chunk."""
+    _, batch_cls = get_engine(engine)
+    features, errors = batch_cls(user_ids).prepare_features()
+    if features.empty:
+        return {}, errors
+    return dict(zip(features.index, service.score_many(features))), errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-score every existing mlprofile.")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--engine", default="mongo", help="feature engine used for each chunk")
+    parser.add_argument("--checkpoint", type=Path, default=DEFAULT_CHECKPOINT)
+    parser.add_argument("--restart", action="store_true", help="ignore an existing checkpoint")
+    parser.add_argument("--dry-run", action="store_true", help="score without writing profiles")
+    args = parser.parse_args()
+
+    checkpoint = {"last_user_id": None, "processed": 0, "failed": 0}
+    if not args.restart:
+        checkpoint = load_checkpoint(args.checkpoint)
+        if checkpoint["last_user_id"] is not None:
+            print(f"Resuming after user {checkpoint['last_user_id']} ({checkpoint['processed']} done)")
+
+    run_start = time.perf_counter()
+    run_users = 0
+    for chunk in iter_user_chunks(args.chunk_size, after=checkpoint["last_user_id"]):
+        chunk_start = time.perf_counter()
+        results, errors = score_chunk(chunk, args.engine)
+        if results and not args.dry_run:
+            prepare_data.get_db().mlprofiles.bulk_write(
+                profile_updates(results, datetime.utcnow()), ordered=False
+            )
+
+        checkpoint["last_user_id"] = chunk[-1]
+        checkpoint["processed"] += len(results)
+        checkpoint["failed"] += len(errors)
+        if not args.dry_run:
+            save_checkpoint(args.checkpoint, checkpoint)
+
+        run_users += len(chunk)
+        chunk_rate = len(chunk) / (time.perf_counter() - chunk_start)
+        overall_rate = run_users / (time.perf_counter() - run_start)
+        print(
+            f"[chunk] users={len(chunk)} scored={len(results)} failed={len(errors)} "
+            f"{chunk_rate:.0f} users/s (overall {overall_rate:.0f} users/s)"
+        )
+
+    elapsed = time.perf_counter() - run_start
+    print(
+        f"✓ Done. {checkpoint['processed']} profiles written, {checkpoint['failed']} users failed, "
+        f"{run_users} users this run in {elapsed:.1f}s "
+        f"({run_users / elapsed if elapsed else 0:.0f} users/s)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""
+Parquet snapshots of the collections the features are built from.
+
+    python snapshot.py export                       # append everything new since the last run
+    python snapshot.py export --since 2025-12-01 --until 2025-12-08
+    python snapshot.py features --out features.parquet
+
+`export` streams activities, quizresults, quizzes and mlprofiles in `_id`
+order and writes them under --dir with the schemas in app/snapshot_data.py,
+partitioned by date (activity occurredAt, quiz result timestamp, profile
+generatedAt, quiz `_id` time). The last exported `_id` of each collection is
+kept in <dir>/_snapshot.json after every chunk, so each run appends only
+newer documents and an interrupted run continues where it stopped.
+mlprofiles are updated in place by rescoring, so they are re-exported in full
+every time.
+
+With --since/--until (dates, end exclusive) only that window is exported: its
+date partitions are rewritten from scratch and the `_id` cursor is left alone
+(mlprofiles are always exported in full).
+
+`features` runs the Prepare logic over a snapshot in chunks of users (the
+"snapshot" feature engine) and writes one row of features_final per user.
+"""
+import argparse
+import shutil
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from bson import ObjectId, json_util
+
+APP_DIR = Path(__file__).resolve().parent / "app"
+sys.path.insert(0, str(APP_DIR))
+
+import prepare_data  # noqa: E402
+from snapshot_data import (  # noqa: E402
+    OBJECT_ID,
+    PARTITIONING,
+    SCHEMAS,
+    SNAPSHOT_DIR,
+    TIME_FIELDS,
+    SnapshotBatchPrepare,
+    documents_to_table,
+    get_reader,
+)
+
+COLLECTIONS = ["activities", "quizresults", "quizzes", "mlprofiles"]
+# re-exported in full on every run
+FULL_COLLECTIONS = {"mlprofiles"}
+STATE_FILE = "_snapshot.json"
+
+
+def load_state(snapshot_dir: Path) -> dict:
+    path = snapshot_dir / STATE_FILE
+    return json_util.loads(path.read_text()) if path.exists() else {}
+
+
+def save_state(snapshot_dir: Path, state: dict) -> None:
+    # json_util keeps the cursor's type (ObjectId or string `_id`)
+    path = snapshot_dir / STATE_FILE
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json_util.dumps(state, indent=2))
+    tmp.replace(path)
+
+
+def partition_date(doc: dict, time_field) -> str:
+    value = doc.get(time_field) if time_field else None
+    if not isinstance(value, datetime):
+        value = ObjectId(doc["_id"]).generation_time
+    return value.strftime("%Y-%m-%d")
+
+
+def window_query(collection: str, since: datetime, until: datetime) -> dict:
+    time_field = TIME_FIELDS[collection]
+    if time_field:
+        return {time_field: {"$gte": since, "$lt": until}}
+    return {"_id": {"$gte": ObjectId.from_datetime(since), "$lt": ObjectId.from_datetime(until)}}
+
+
+def iter_chunks(cursor, chunk_size: int):
+    chunk = []
+    for doc in cursor:
+        chunk.append(doc)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def write_chunk(docs: list, collection: str, target: Path, basename: str) -> None:
+    table = documents_to_table(docs, SCHEMAS[collection])
+    dates = [partition_date(doc, TIME_FIELDS[collection]) for doc in docs]
+    table = table.append_column("date", pa.array(dates, pa.string()))
+    ds.write_dataset(
+        table,
+        target,
+        format="parquet",
+        partitioning=PARTITIONING,
+        basename_template=basename + "-{i}.parquet",
+        existing_data_behavior="overwrite_or_ignore",
+    )
+
+
+def drop_partitions(target: Path, since: datetime, until: datetime) -> None:
+    """Remove the date=YYYY-MM-DD partitions inside [since, until)."""
+    day = since
+    while day < until:
+        shutil.rmtree(target / f"date={day:%Y-%m-%d}", ignore_errors=True)
+        day += timedelta(days=1)
+
+
+def export_collection(db, collection: str, snapshot_dir: Path, state: dict, chunk_size: int, window=None) -> int:
+    run_id = uuid.uuid4().hex[:8]
+    target = snapshot_dir / collection
+    full = collection in FULL_COLLECTIONS
+    query = {}
+    if full:
+        # written next to the old snapshot and swapped in once complete
+        target = snapshot_dir / f".{collection}.{run_id}"
+    elif window:
+        query = window_query(collection, *window)
+        drop_partitions(target, *window)
+    elif state.get(collection, {}).get("last_id"):
+        query = {"_id": {"$gt": state[collection]["last_id"]}}
+
+    rows = 0
+    cursor = db[collection].find(query).sort("_id", 1).batch_size(chunk_size)
+    for seq, docs in enumerate(iter_chunks(cursor, chunk_size)):
+        write_chunk(docs, collection, target, f"part-{run_id}-{seq:05d}")
+        rows += len(docs)
+        if not full and not window:
+            state[collection] = {
+                "last_id": docs[-1]["_id"],
+                "rows": state.get(collection, {}).get("rows", 0) + len(docs),
+                "exported_at": datetime.utcnow().isoformat(),
+            }
+            save_state(snapshot_dir, state)
+
+    if full:
+        final = snapshot_dir / collection
+        shutil.rmtree(final, ignore_errors=True)
+        if target.exists():
+            target.rename(final)
+        state[collection] = {"rows": rows, "exported_at": datetime.utcnow().isoformat()}
+        save_state(snapshot_dir, state)
+    return rows
+
+
+def run_export(args) -> None:
+    snapshot_dir = Path(args.dir)
+    snapshot_dir.mkdir(parents=True, exist_ok=True)
+    window = None
+    if args.since or args.until:
+        since = datetime.strptime(args.since, "%Y-%m-%d") if args.since else datetime(1970, 1, 1)
+        until = datetime.strptime(args.until, "%Y-%m-%d") if args.until else datetime.utcnow() + timedelta(days=1)
+        window = (since, until)
+
+    state = load_state(snapshot_dir)
+    db = prepare_data.get_db()
+    for collection in args.collections:
+        start = time.perf_counter()
+        rows = export_collection(db, collection, snapshot_dir, state, args.chunk_size, window)
+        print(f"[ok] {collection}: {rows} documents in {time.perf_counter() - start:.2f}s")
+
+
+def run_features(args) -> None:
+    reader = get_reader(args.dir)
+    user_ids = reader.user_ids()
+    print(f"{len(user_ids)} users in {args.dir}")
+
+    frames, failed = [], 0
+    start = time.perf_counter()
+    for i in range(0, len(user_ids), args.chunk_size):
+        features, errors = SnapshotBatchPrepare(user_ids[i:i + args.chunk_size], args.dir).prepare_features()
+        frames.append(features)
+        failed += len(errors)
+
+    columns = {"userId": pa.array([user_id.binary for frame in frames for user_id in frame.index], OBJECT_ID)}
+    for feature in prepare_data.FEATURES_FINAL:
+        columns[feature] = pa.array([value for frame in frames for value in frame[feature]], pa.float64())
+    table = pa.table(columns)
+    pq.write_table(table, args.out)
+    elapsed = time.perf_counter() - start
+    print(f"✓ Wrote {table.num_rows} users to {args.out} ({failed} failed) in {elapsed:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parquet snapshots of the feature source collections.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    export = sub.add_parser("export", help="snapshot collections to Parquet")
+    export.add_argument("--dir", type=Path, default=SNAPSHOT_DIR)
+    export.add_argument("--collections", nargs="+", choices=COLLECTIONS, default=COLLECTIONS)
+    export.add_argument("--chunk-size", type=int, default=50000, help="documents per written file")
+    export.add_argument("--since", help="YYYY-MM-DD, inclusive")
+    export.add_argument("--until", help="YYYY-MM-DD, exclusive")
+
+    features = sub.add_parser("features", help="compute features_final for every user in a snapshot")
+    features.add_argument("--dir", type=Path, default=SNAPSHOT_DIR)
+    features.add_argument("--out", type=Path, default=Path("features.parquet"))
+    features.add_argument("--chunk-size", type=int, default=5000, help="users per BatchPrepare")
+
+    args = parser.parse_args()
+    if args.command == "export":
+        run_export(args)
+    else:
+        run_features(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+"""
+Synthetic learning platform data at any scale.
+
+Generates users, courses, modules, quizzes, activities and quiz results shaped
+like the backend's documents (see dataset/test/insightify.*.csv): every user
+enrolls in courses and works through their modules in order; each module visit
+is a module_start/module_complete pair followed by one or more quiz attempts
+(quiz_start, quiz_submit with metadata, and a quizresults document). Study
+times, scores, pass/fail and active weekdays vary per user, so the five
+features spread the way real histories do.
+
+History length per user is drawn from a lognormal around --activities-per-user
+(--history-sigma 0 makes it exact), so a run has the long tail of heavy users
+that real platforms have. Documents are written with the shared BulkWriter.
+
+References are stored as hex strings by default, as CSV-imported data stores
+them and as the service receives user ids; --object-ids stores ObjectIds
+instead, like the backend.
+
+Writes to the Mongo in --mongo-uri (MONGO_URI), database --db, and creates the
+indexes the service expects. benchmarks/bench_history.py can instead generate
+into a throwaway in-process mongod (pymongo_inmemory, start_inmemory()).
+
+    python synthetic.py --users 100000 --activities-per-user 60 --db insightify_synth --drop
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List
+
+from bson import ObjectId
+from pymongo import MongoClient
+
+from bulk_writer import BULK_MAX_IN_FLIGHT, BulkWriter
+
+APP_DIR = Path(__file__).resolve().parent / "app"
+
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
+DB_NAME = "insightify_synth"
+START = datetime(2025, 1, 1)
+QUESTIONS_PER_QUIZ = 5
+PASS_SCORE = 70
+# users generated per write round
+USER_CHUNK = 500
+
+
+class IdFactory:
+    """New ids as ObjectIds or as their hex strings."""
+
+    def __init__(self, object_ids: bool):
+        self.object_ids = object_ids
+
+    def __call__(self, when: datetime = None):
+        oid = ObjectId()
+        if when:
+            # dated like the event, so `_id` order follows occurredAt as it does live
+            oid = ObjectId(ObjectId.from_datetime(when).binary[:4] + oid.binary[4:])
+        return oid if self.object_ids else str(oid)
+
+
+def build_catalog(rng: random.Random, new_id: IdFactory, courses: int, modules_per_course: int) -> Dict[str, list]:
+    """Courses, their modules and one quiz per module."""
+    catalog = {"courses": [], "modules": [], "quizzes": [], "course_modules": []}
+    for c in range(courses):
+        course_id = new_id()
+        module_ids = []
+        for m in range(modules_per_course):
+            module_id = new_id()
+            module_ids.append(module_id)
+            catalog["modules"].append({
+                "_id": module_id,
+                "title": f"Module {c * modules_per_course + m + 1}",
+                "content": "Lorem ipsum dolor sit amet, consectetur adipiscing elit.",
+                "__v": 0,
+            })
+            catalog["quizzes"].append({
+                "_id": new_id(),
+                "moduleId": module_id,
+                "maximumDuration": rng.choice([300, 600, 900, 1200]),
+                "questions": [
+                    {
+                        "question": f"Question {q + 1} of module {c * modules_per_course + m + 1}",
+                        "options": [f"Option {o}" for o in "ABCD"],
+                        "answer": rng.randrange(4),
+                        "id": new_id(),
+                    }
+                    for q in range(QUESTIONS_PER_QUIZ)
+                ],
+                "__v": 0,
+            })
+        catalog["courses"].append({
+            "_id": course_id,
+            "title": f"Course {c + 1}",
+            "description": f"Course {c + 1} Lorem Ipsum",
+            "modules": [{"moduleId": module_id, "order": i + 1, "_id": new_id()} for i, module_id in enumerate(module_ids)],
+            "__v": 0,
+        })
+        catalog["course_modules"].append((course_id, module_ids))
+    catalog["max_duration"] = {quiz["moduleId"]: quiz["maximumDuration"] for quiz in catalog["quizzes"]}
+    return catalog
+
+
+def _activity(new_id: IdFactory, user_id, course_id, kind: str, when: datetime, module_id=None, metadata=None) -> dict:
+    doc = {
+        "_id": new_id(when),
+        "user": user_id,
+        "course": course_id,
+        "type": kind,
+        "occurredAt": when,
+        "createdAt": when,
+        "updatedAt": when,
+        "__v": 0,
+    }
+    if module_id is not None:
+        doc["module"] = module_id
+    if metadata is not None:
+        doc["metadata"] = metadata
+    return doc
+
+
+def _next_session(rng: random.Random, when: datetime, weekdays: List[int]) -> datetime:
+    """Jump a few days ahead, landing on one of the user's usual weekdays most of the time."""
+    when += timedelta(days=rng.randint(1, 4))
+    if rng.random() < 0.8:
+        when += timedelta(days=(rng.choice(weekdays) - when.weekday()) % 7)
+    return when.replace(hour=rng.randint(7, 22), minute=rng.randrange(60))
+
+
+def user_history(rng: random.Random, new_id: IdFactory, user_id, catalog: dict, n_activities: int) -> tuple:
+    """(activities, quizresults) for one user, at least n_activities activities long."""
+    ability = rng.gauss(72, 15)
+    pace_minutes = rng.lognormvariate(3.5, 0.6)
+    weekdays = rng.sample(range(7), rng.randint(1, 4))
+    when = START + timedelta(days=rng.randint(0, 180), hours=rng.randint(7, 22))
+
+    activities, results = [], []
+    while len(activities) < n_activities:
+        course_id, module_ids = rng.choice(catalog["course_modules"])
+        activities.append(_activity(new_id, user_id, course_id, "course_enroll", when))
+        for module_id in module_ids:
+            if len(activities) >= n_activities:
+                break
+            activities.append(_activity(new_id, user_id, course_id, "module_start", when, module_id))
+            when += timedelta(minutes=max(1.0, rng.lognormvariate(0, 0.5) * pace_minutes))
+            activities.append(_activity(new_id, user_id, course_id, "module_complete", when, module_id))
+
+            max_duration = catalog["max_duration"][module_id]
+            for _ in range(1 + int(rng.expovariate(2))):
+                when += timedelta(minutes=rng.randint(1, 30))
+                activities.append(_activity(new_id, user_id, course_id, "quiz_start", when, module_id))
+                duration = int(max_duration * min(1.0, rng.uniform(0.1, 1.1)))
+                when += timedelta(seconds=duration)
+                correct = min(QUESTIONS_PER_QUIZ, max(0, round(rng.gauss(ability, 20) / 100 * QUESTIONS_PER_QUIZ)))
+                score = correct * 100 // QUESTIONS_PER_QUIZ
+                result_id = new_id(when)
+                results.append({
+                    "_id": result_id,
+                    "userId": user_id,
+                    "moduleId": module_id,
+                    "score": score,
+                    "totalQuestions": QUESTIONS_PER_QUIZ,
+                    "passed": score >= PASS_SCORE,
+                    "duration": duration,
+                    "examFinishedAt": when,
+                    "timestamp": when,
+                    "createdAt": when,
+                    "updatedAt": when,
+                    "__v": 0,
+                })
+                activities.append(_activity(
+                    new_id, user_id, course_id, "quiz_submit", when, module_id,
+                    {"score": score, "passed": score >= PASS_SCORE, "quizResultId": result_id},
+                ))
+                if score >= PASS_SCORE:
+                    break
+            when = _next_session(rng, when, weekdays)
+    return activities, results
+
+
+def history_length(rng: random.Random, mean: float, sigma: float) -> int:
+    if sigma <= 0:
+        return max(1, int(mean))
+    # lognormal with the requested mean
+    return max(1, int(rng.lognormvariate(-sigma ** 2 / 2, sigma) * mean))
+
+
+def write_catalog(db, catalog: dict) -> None:
+    for collection in ("courses", "modules", "quizzes"):
+        with BulkWriter(db[collection]) as writer:
+            writer.add(catalog[collection])
+
+
+def generate_users(db, rng: random.Random, new_id: IdFactory, catalog: dict, lengths: List[int], in_flight: int) -> list:
+    """Write users with the given history lengths; returns their ids."""
+    user_ids = []
+    writers = {name: BulkWriter(db[name], max_in_flight=in_flight) for name in ("users", "activities", "quizresults")}
+    with writers["users"], writers["activities"], writers["quizresults"]:
+        for start in range(0, len(lengths), USER_CHUNK):
+            users, activities, results = [], [], []
+            for n_activities in lengths[start:start + USER_CHUNK]:
+                user_id = new_id()
+                n = len(user_ids) + 1
+                created = START - timedelta(days=rng.randint(1, 60))
+                users.append({
+                    "_id": user_id,
+                    "displayName": f"learner{n}",
+                    "email": f"learner{n}@example.com",
+                    "password": "$2b$10$synthetic",
+                    "role": "student",
+                    "createdAt": created,
+                    "updatedAt": created,
+                    "__v": 0,
+                })
+                user_activities, user_results = user_history(rng, new_id, user_id, catalog, n_activities)
+                activities.extend(user_activities)
+                results.extend(user_results)
+                user_ids.append(user_id)
+            writers["users"].add(users)
+            writers["activities"].add(activities)
+            writers["quizresults"].add(results)
+    return user_ids
+
+
+def create_indexes(db) -> None:
+    """The indexes the ML service expects (app/indexes.py)."""
+    sys.path.insert(0, str(APP_DIR))
+    from indexes import ensure_indexes
+
+    ensure_indexes(db, create=True)
+
+
+def generate(
+    db,
+    users: int,
+    activities_per_user: float,
+    history_sigma: float = 1.0,
+    courses: int = 10,
+    modules_per_course: int = 8,
+    seed: int = 0,
+    object_ids: bool = False,
+    in_flight: int = BULK_MAX_IN_FLIGHT,
+) -> dict:
+    rng = random.Random(seed)
+    new_id = IdFactory(object_ids)
+    catalog = build_catalog(rng, new_id, courses, modules_per_course)
+    write_catalog(db, catalog)
+    lengths = [history_length(rng, activities_per_user, history_sigma) for _ in range(users)]
+    user_ids = generate_users(db, rng, new_id, catalog, lengths, in_flight)
+    create_indexes(db)
+    return {"user_ids": user_ids, "catalog": catalog}
+
+
+def start_inmemory():
+    """A throwaway mongod (pymongo_inmemory); returns it, started."""
+    from pymongo_inmemory import Mongod
+
+    mongod = Mongod(None)
+    mongod.start()
+    return mongod
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic platform data.")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--activities-per-user", type=float, default=60)
+    parser.add_argument("--history-sigma", type=float, default=1.0, help="lognormal spread of history lengths")
+    parser.add_argument("--courses", type=int, default=10)
+    parser.add_argument("--modules-per-course", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--object-ids", action="store_true", help="store references as ObjectIds, not hex strings")
+    parser.add_argument("--mongo-uri", default=MONGO_URI)
+    parser.add_argument("--db", default=DB_NAME)
+    parser.add_argument("--drop", action="store_true", help="drop the database first")
+    parser.add_argument("--in-flight", type=int, default=BULK_MAX_IN_FLIGHT)
+    args = parser.parse_args()
+
+    client = MongoClient(args.mongo_uri)
+    try:
+        if args.drop:
+            client.drop_database(args.db)
+        db = client[args.db]
+        start = time.perf_counter()
+        generate(
+            db, args.users, args.activities_per_user, args.history_sigma, args.courses,
+            args.modules_per_course, args.seed, args.object_ids, args.in_flight,
+        )
+        elapsed = time.perf_counter() - start
+        counts = {name: db[name].estimated_document_count() for name in ("users", "activities", "quizresults", "quizzes")}
+        print(f"✓ Generated {counts} into '{args.db}' in {elapsed:.1f}s")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    main()
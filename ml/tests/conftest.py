@@ -0,0 +1,149 @@
+"""
+Shared fixtures: an in-memory MongoDB (mongomock) behind prepare_data.get_db()
+and a small seeded learning history.
+
+mongomock lacks the raw-batch cursors instrumentation.py reads through and
+pymongo 4's bulk_write request objects, so those are emulated on top of the
+plain find/aggregate/replace_one it does support.
+"""
+import random
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+from types import SimpleNamespace
+
+import bson
+import mongomock
+import pytest
+from bson import ObjectId
+from bson.codec_options import CodecOptions
+
+ML_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ML_DIR / "app"))
+
+import prepare_data  # noqa: E402
+
+BASE_TIME = datetime(2024, 1, 1)
+
+
+def _find_raw_batches(self, filter=None, projection=None, sort=None, limit=0, **kwargs):
+    cursor = self.find(filter, projection)
+    if sort:
+        cursor = cursor.sort(sort)
+    if limit:
+        cursor = cursor.limit(limit)
+    return [b"".join(bson.encode(doc) for doc in cursor)]
+
+
+def _aggregate_raw_batches(self, pipeline, **kwargs):
+    return [b"".join(bson.encode(doc) for doc in self.aggregate(pipeline))]
+
+
+def _bulk_write(self, requests, ordered=True, **kwargs):
+    upserted = matched = 0
+    for request in requests:
+        write = self.replace_one if type(request).__name__ == "ReplaceOne" else self.update_one
+        result = write(request._filter, request._doc, upsert=request._upsert)
+        upserted += result.upserted_id is not None
+        matched += result.matched_count
+    return SimpleNamespace(upserted_count=upserted, matched_count=matched)
+
+
+@pytest.fixture
+def db(monkeypatch):
+    """Empty database that every feature engine reads through prepare_data.get_db()."""
+    collection = mongomock.collection.Collection
+    monkeypatch.setattr(collection, "find_raw_batches", _find_raw_batches, raising=False)
+    monkeypatch.setattr(collection, "aggregate_raw_batches", _aggregate_raw_batches, raising=False)
+    monkeypatch.setattr(collection, "bulk_write", _bulk_write)
+    monkeypatch.setattr(collection, "codec_options", CodecOptions(), raising=False)
+    client = mongomock.MongoClient()
+    monkeypatch.setattr(prepare_data, "_client", client)
+    return client[prepare_data.MONGO_DB]
+
+
+def add_module(db, n_quizzes: int = 1, maximum_duration=600) -> ObjectId:
+    """A module with `n_quizzes` quizzes; returns the module id."""
+    module = ObjectId()
+    for _ in range(n_quizzes):
+        db.quizzes.insert_one({"moduleId": module, "maximumDuration": maximum_duration})
+    return module
+
+
+def add_module_history(db, user, module, started: datetime, minutes: float, created: datetime = None,
+                       score=70, passed=True, duration=300) -> None:
+    """A module_start/module_complete pair and one quiz result for `module`."""
+    created = created or started
+    completed = started + timedelta(minutes=minutes)
+    db.activities.insert_many([
+        {"user": user, "module": module, "type": "module_start", "occurredAt": started, "createdAt": created},
+        {"user": user, "module": module, "type": "module_complete", "occurredAt": completed, "createdAt": created},
+    ])
+    db.quizresults.insert_one({
+        "userId": user, "moduleId": module, "score": score, "passed": passed,
+        "duration": duration, "timestamp": completed, "createdAt": created,
+    })
+
+
+@pytest.fixture
+def history(db):
+    """Users with a few completed modules each, plus an enrolment activity the features ignore."""
+    rng = random.Random(0)
+    modules = [add_module(db) for _ in range(4)]
+    users = [ObjectId() for _ in range(8)]
+    for user in users:
+        db.activities.insert_one({"user": user, "type": "course_enroll", "occurredAt": BASE_TIME, "createdAt": BASE_TIME})
+        for module in modules[:rng.randint(1, len(modules))]:
+            started = BASE_TIME + timedelta(days=rng.randint(0, 30), hours=rng.random() * 20)
+            add_module_history(
+                db, user, module, started, minutes=rng.uniform(5, 180),
+                score=rng.randint(0, 100), passed=rng.random() > 0.5, duration=rng.randint(10, 600),
+            )
+    return SimpleNamespace(users=users, modules=modules)
+
+
+def prepare_features(user_id) -> list:
+    """Prepare's feature row for one user, as a list in FEATURES_FINAL order."""
+    return prepare_data.Prepare(user_id).prepare_features().iloc[0].tolist()
+
+
+@pytest.fixture
+def module_edge_users(db, history):
+    """Users whose quiz results exercise the module/quiz join edge cases."""
+    names = ("null_and_module", "null_only", "no_module_field", "no_quiz", "two_quizzes", "no_history")
+    users = {name: ObjectId() for name in names}
+    module = history.modules[0]
+    # a quiz without a module: a null moduleId must not join it
+    db.quizzes.insert_one({"maximumDuration": 60})
+
+    add_module_history(db, users["null_and_module"], module, BASE_TIME, minutes=40, score=90)
+    db.quizresults.insert_one({"userId": users["null_and_module"], "moduleId": None, "score": 10, "passed": None, "duration": 50})
+
+    db.quizresults.insert_one({"userId": users["null_only"], "moduleId": None, "score": 60, "passed": True, "duration": 50})
+
+    db.quizresults.insert_one({"userId": users["no_module_field"], "score": 40, "passed": False, "duration": 30})
+
+    add_module_history(db, users["no_quiz"], add_module(db, n_quizzes=0), BASE_TIME, minutes=25)
+
+    add_module_history(db, users["two_quizzes"], add_module(db, n_quizzes=2, maximum_duration=900),
+                       BASE_TIME + timedelta(days=2), minutes=70, duration=450)
+    return users
+
+
+def expected_features(user_id):
+    """Prepare's features, or None when Prepare rejects the user."""
+    try:
+        return prepare_features(user_id)
+    except ValueError:
+        return None
+
+
+def assert_batch_matches_prepare(features, errors: dict, user_ids) -> None:
+    """A batch engine's (features, errors) agree with Prepare user by user."""
+    for user_id in user_ids:
+        want = expected_features(user_id)
+        if want is None:
+            assert user_id in errors, user_id
+        else:
+            assert user_id not in errors, (user_id, errors[user_id])
+            assert features.loc[user_id].tolist() == pytest.approx(want), user_id
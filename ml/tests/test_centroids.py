@@ -0,0 +1,24 @@
+import numpy as np
+import pytest
+
+from centroids import KMEANS_ARTIFACTS, MODELS_DIR, CentroidModel, check_parity
+
+joblib = pytest.importorskip("joblib")
+pytest.importorskip("sklearn")
+
+
+@pytest.mark.parametrize("model_name, scaler_name", sorted(KMEANS_ARTIFACTS.items()))
+def test_matches_sklearn(model_name, scaler_name):
+    model = joblib.load(MODELS_DIR / model_name)
+    scaler = joblib.load(MODELS_DIR / scaler_name)
+    centroids = CentroidModel.from_sklearn(model, scaler)
+    assert check_parity(centroids, model, scaler) < 1e-9
+
+
+def test_check_parity_rejects_mismatched_centers():
+    model = joblib.load(MODELS_DIR / "kmeans_model_37_3n_2.pkl")
+    scaler = joblib.load(MODELS_DIR / "kmeans_scaler_1.pkl")
+    centroids = CentroidModel.from_sklearn(model, scaler)
+    centroids.centers = np.roll(centroids.centers, 1, axis=0)
+    with pytest.raises(ValueError):
+        check_parity(centroids, model, scaler)
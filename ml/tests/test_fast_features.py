@@ -0,0 +1,48 @@
+from datetime import timedelta
+
+import pytest
+from bson import ObjectId
+
+from conftest import BASE_TIME, add_module, add_module_history, prepare_features
+from fast_features import FastBatchPrepare, FastPrepare
+from prepare_data import BatchPrepare
+
+
+@pytest.fixture
+def edge_users(db, history):
+    users = {name: ObjectId() for name in ("empty", "missing_quiz", "two_quizzes", "passed_none", "passed_mixed")}
+
+    add_module_history(db, users["missing_quiz"], add_module(db, n_quizzes=0), BASE_TIME, minutes=25)
+
+    two_quizzes = add_module(db, n_quizzes=2, maximum_duration=900)
+    add_module_history(db, users["two_quizzes"], two_quizzes, BASE_TIME, minutes=70, duration=450)
+    add_module_history(db, users["two_quizzes"], history.modules[1], BASE_TIME + timedelta(days=1),
+                       minutes=30, duration=120, passed=False)
+
+    add_module_history(db, users["passed_none"], history.modules[0], BASE_TIME, minutes=15, passed=None)
+
+    for day, (module, passed) in enumerate(zip(history.modules, (True, None, False, True))):
+        add_module_history(db, users["passed_mixed"], module, BASE_TIME + timedelta(days=day),
+                           minutes=10 + day, score=50 + day, passed=passed)
+    return users
+
+
+def test_fast_prepare_matches_prepare(history, edge_users):
+    for user_id in history.users + list(edge_users.values()):
+        if user_id == edge_users["missing_quiz"]:
+            with pytest.raises(ValueError):
+                prepare_features(user_id)
+            with pytest.raises(ValueError):
+                FastPrepare(user_id).prepare_features()
+            continue
+        assert FastPrepare(user_id).prepare_features().iloc[0].tolist() == pytest.approx(prepare_features(user_id)), user_id
+
+
+def test_fast_batch_matches_batch_prepare(history, edge_users):
+    user_ids = history.users + list(edge_users.values())
+    want, want_errors = BatchPrepare(user_ids).prepare_features()
+    got, got_errors = FastBatchPrepare(user_ids).prepare_features()
+    assert got_errors == want_errors == {edge_users["missing_quiz"]: "Quiz dataframe is empty"}
+    assert list(got.index) == list(want.index)
+    for user_id in want.index:
+        assert got.loc[user_id].tolist() == pytest.approx(want.loc[user_id].tolist()), user_id
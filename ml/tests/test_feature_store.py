@@ -0,0 +1,90 @@
+from datetime import timedelta
+
+import pytest
+from bson import ObjectId
+
+from conftest import BASE_TIME, add_module, add_module_history, assert_batch_matches_prepare, prepare_features
+import feature_store
+from feature_store import FEATURE_STORE_OVERLAP_SECONDS, FeatureStore, StoreBatchPrepare, state_features
+from prepare_data import FEATURES_FINAL
+
+
+def store_features(user_ids) -> dict:
+    states = FeatureStore().sync_many(user_ids)
+    return {user_id: [state_features(states[user_id])[col] for col in FEATURES_FINAL] for user_id in user_ids}
+
+
+def assert_matches_prepare(user_ids):
+    features = store_features(user_ids)
+    for user_id in user_ids:
+        assert features[user_id] == pytest.approx(prepare_features(user_id)), user_id
+
+
+def latest_created(db, user):
+    return max(doc["createdAt"] for doc in db.activities.find({"user": user}))
+
+
+def test_first_sync_matches_prepare(history):
+    assert_matches_prepare(history.users)
+
+
+def test_resync_without_new_documents_is_unchanged(history):
+    first = store_features(history.users)
+    assert store_features(history.users) == first
+
+
+def test_inserts_after_watermark(db, history):
+    store_features(history.users)
+    module = add_module(db)
+    for i, user in enumerate(history.users[:4]):
+        created = latest_created(db, user) + timedelta(days=1)
+        add_module_history(db, user, module, created, minutes=30 + i, created=created, score=10 * i, passed=False)
+    assert_matches_prepare(history.users)
+
+
+def test_inserts_with_older_ids(db, history):
+    """Client-generated ids can sort before documents already applied."""
+    store_features(history.users)
+    user = history.users[0]
+    created = latest_created(db, user) + timedelta(hours=1)
+    old_id = ObjectId.from_datetime(BASE_TIME - timedelta(days=365))
+    module = add_module(db)
+    db.activities.insert_one({
+        "_id": old_id, "user": user, "module": module, "type": "module_start",
+        "occurredAt": created, "createdAt": created,
+    })
+    db.activities.insert_one({
+        "user": user, "module": module, "type": "module_complete",
+        "occurredAt": created + timedelta(minutes=45), "createdAt": created,
+    })
+    assert_matches_prepare([user])
+
+
+def test_late_documents_inside_overlap(db, history):
+    """Documents ingested just before the watermark are applied once; re-read ones are skipped."""
+    user = history.users[1]
+    watermark = latest_created(db, user)
+    store_features([user])
+    late = watermark - timedelta(seconds=FEATURE_STORE_OVERLAP_SECONDS / 2)
+    add_module_history(db, user, add_module(db), late, minutes=20, created=late, score=5)
+    assert_matches_prepare([user])
+    # the late documents and everything else inside the overlap are read again
+    assert_matches_prepare([user])
+
+
+def test_redelivered_documents_count_once(db, history, monkeypatch):
+    """With an overlap spanning the whole history every sync re-reads every document."""
+    monkeypatch.setattr(feature_store, "FEATURE_STORE_OVERLAP_SECONDS", 365 * 24 * 3600)
+    store_features(history.users)
+    user = history.users[2]
+    created = latest_created(db, user) + timedelta(minutes=5)
+    add_module_history(db, user, add_module(db), created, minutes=15, created=created)
+    for _ in range(2):
+        assert_matches_prepare(history.users)
+
+
+def test_module_edge_cases_match_prepare(history, module_edge_users):
+    user_ids = history.users + list(module_edge_users.values())
+    features, errors = StoreBatchPrepare(user_ids).prepare_features()
+    assert_batch_matches_prepare(features, errors, user_ids)
+    assert set(errors) == {module_edge_users["null_only"], module_edge_users["no_quiz"]}
@@ -0,0 +1,18 @@
+import pytest
+
+from conftest import assert_batch_matches_prepare, expected_features
+from prepare_aggregate import AggregateBatchPrepare, AggregatePrepare
+
+
+def test_batch_matches_prepare(history, module_edge_users):
+    user_ids = history.users + list(module_edge_users.values())
+    features, errors = AggregateBatchPrepare(user_ids).prepare_features()
+    assert_batch_matches_prepare(features, errors, user_ids)
+    assert set(errors) == {module_edge_users["null_only"], module_edge_users["no_quiz"]}
+
+
+def test_single_user_matches_prepare(history, module_edge_users):
+    for user_id in [history.users[0], module_edge_users["null_and_module"], module_edge_users["two_quizzes"]]:
+        assert AggregatePrepare(user_id).prepare_features().iloc[0].tolist() == pytest.approx(expected_features(user_id))
+    with pytest.raises(ValueError):
+        AggregatePrepare(module_edge_users["null_only"]).prepare_features()
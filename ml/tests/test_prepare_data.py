@@ -0,0 +1,29 @@
+from bson import ObjectId
+
+from conftest import BASE_TIME, assert_batch_matches_prepare
+from prepare_data import BatchPrepare, FetchData
+
+
+def test_batch_matches_prepare(history, module_edge_users):
+    user_ids = history.users + list(module_edge_users.values())
+    features, errors = BatchPrepare(user_ids).prepare_features()
+    assert_batch_matches_prepare(features, errors, user_ids)
+    assert set(errors) == {module_edge_users["null_only"], module_edge_users["no_quiz"]}
+
+
+def test_batch_of_one_matches_prepare(module_edge_users):
+    for user_id in module_edge_users.values():
+        features, errors = BatchPrepare([user_id]).prepare_features()
+        assert_batch_matches_prepare(features, errors, [user_id])
+
+
+
+def test_freshness_token_sees_results_with_older_ids(db, history):
+    user_id = history.users[0]
+    token = FetchData(user_id).fetch_freshness_token()
+    # another writer's ObjectId can sort before the results already stored
+    db.quizresults.insert_one({
+        "_id": ObjectId.from_datetime(BASE_TIME.replace(year=2000)), "userId": user_id,
+        "moduleId": history.modules[0], "score": 50, "passed": True, "duration": 60,
+    })
+    assert FetchData(user_id).fetch_freshness_token() != token
@@ -0,0 +1,49 @@
+import shutil
+
+import numpy as np
+import pytest
+
+from centroids import MODELS_DIR, CentroidModel, source_digest
+from registry import ModelVersion
+
+pytest.importorskip("joblib")
+pytest.importorskip("sklearn")
+
+SPEC = {"model": "kmeans_model_37_3n_2.pkl", "scaler": "kmeans_scaler_1.pkl", "params": "kmeans_model_37_3n_2.npz"}
+
+
+@pytest.fixture
+def models_dir(tmp_path):
+    for name in SPEC.values():
+        shutil.copy(MODELS_DIR / name, tmp_path / name)
+    return tmp_path
+
+
+def load(models_dir) -> ModelVersion:
+    return ModelVersion.from_spec("kmeans_model_37_3n_2", SPEC, models_dir)
+
+
+def test_current_export_is_used(models_dir):
+    version = load(models_dir)
+    assert version.source == SPEC["params"]
+    assert version.centroids.source_digest == source_digest(models_dir / SPEC["model"], models_dir / SPEC["scaler"])
+
+
+def test_export_without_pickles_is_used(models_dir):
+    (models_dir / SPEC["model"]).unlink()
+    assert load(models_dir).source == SPEC["params"]
+
+
+def test_stale_export_falls_back_to_pickles(models_dir):
+    # retrain: the scaler pickle now differs from the one the export was folded from
+    shutil.copy(MODELS_DIR / "kmeans_scaler.pkl", models_dir / SPEC["scaler"])
+    version = load(models_dir)
+    assert version.source == f"{SPEC['model']}+{SPEC['scaler']}"
+    assert not np.array_equal(version.centroids.mean, CentroidModel.load(models_dir / SPEC["params"]).mean)
+
+
+def test_export_without_digest_falls_back_to_pickles(models_dir):
+    centroids = CentroidModel.load(models_dir / SPEC["params"])
+    centroids.source_digest = None
+    centroids.save(models_dir / SPEC["params"])
+    assert load(models_dir).source == f"{SPEC['model']}+{SPEC['scaler']}"
@@ -0,0 +1,50 @@
+import logging
+
+import pytest
+
+from conftest import prepare_features
+from feature_store import FeatureStore
+from registry import ModelRegistry
+from similar_learners import LearnerIndex, load_index
+
+
+@pytest.fixture(scope="module")
+def registry():
+    return ModelRegistry()
+
+
+def test_history_source_indexes_every_user(history, registry):
+    index = LearnerIndex(registry.active)
+    assert load_index(index, registry, "history") == len(history.users)
+    user_id = str(history.users[0])
+    neighbors = index.search(registry.active, user_id, k=3, n_probe=registry.active.n_clusters)
+    assert len(neighbors) == 3
+    assert user_id not in {neighbor["user_id"] for neighbor in neighbors}
+
+
+def test_history_source_uses_engine_features(history, registry):
+    index = LearnerIndex(registry.active)
+    load_index(index, registry, "history")
+    cluster, slot = index._positions[str(history.users[1])]
+    assert index._partitions[cluster].raw[slot].tolist() == pytest.approx(prepare_features(history.users[1]))
+
+
+def test_store_source_indexes_str_ids(history, registry):
+    FeatureStore().sync_many(history.users)
+    index = LearnerIndex(registry.active)
+    assert load_index(index, registry, "store") == len(history.users)
+    # the same users from another source are not indexed a second time
+    assert load_index(index, registry, "history") == 0
+    assert len(index) == len(history.users)
+    user_id = str(history.users[0])
+    neighbors = index.search(registry.active, user_id, k=len(history.users), n_probe=registry.active.n_clusters)
+    assert len(neighbors) == len(history.users) - 1
+    assert all(isinstance(neighbor["user_id"], str) for neighbor in neighbors)
+    assert user_id not in {neighbor["user_id"] for neighbor in neighbors}
+
+
+def test_empty_source_is_logged(db, registry, caplog):
+    index = LearnerIndex(registry.active)
+    with caplog.at_level(logging.WARNING, logger="uvicorn.error"):
+        assert load_index(index, registry, "store") == 0
+    assert "has no users" in caplog.text